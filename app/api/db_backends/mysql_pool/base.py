@@ -0,0 +1,23 @@
+"""
+MySQL backend taking its connections from the connection pool of the worker
+"""
+from django.db.backends.mysql import base
+
+from api.utils.db_pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    """MySQL database wrapper with pooled connections"""
+
+    def check_connection(self, connection):
+        try:
+            # without reconnecting: PyMySQL would silently open a connection without the session state
+            connection.ping(False)
+        except self.Database.Error:
+            return False
+        return True
+
+    def _set_autocommit(self, autocommit):
+        # reused connections are usually in the right mode already, which the client knows without a round trip
+        if self.connection.get_autocommit() != autocommit:
+            super(DatabaseWrapper, self)._set_autocommit(autocommit)
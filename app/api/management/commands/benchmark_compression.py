@@ -0,0 +1,81 @@
+"""
+Measure the bytes on the wire and the CPU time per request of the GraphQL responses by content encoding
+"""
+import json
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+
+from api.root_schema import SCHEMA
+from api.utils.http import ENCODINGS, IDENTITY
+from api.views import CustomGraphQLView
+
+QUERIES = {
+    'offers': '''query ($first: Int) {
+        offers(first: $first, sort: [CREATED_ON]) {
+            edges { node {
+                id slug { es en } title { es en } shortDescription { es en } price createdOn
+                images { url publicId } materials { id title { es en } }
+                subcategory { id title { es en } parentCategory { id title { es en } } }
+            } }
+        }
+    }''',
+    'categories': '''{
+        categories { id slug { es en } title { es en } subcategories { id slug { es en } title { es en } } }
+    }''',
+}
+
+
+class Command(BaseCommand):
+    help = 'Compare bytes on the wire and CPU time per request of GraphQL responses without compression, ' \
+           'with each content encoding and with the compressed bodies of the response cache. ' \
+           'Runs against the configured database and cache.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50, help='Requests per query and mode')
+        parser.add_argument('--first', type=int, default=50, help='Offers per page')
+
+    def handle(self, *args, **options):
+        modes = [('uncompressed', IDENTITY, False, False), ('uncompressed + cache', IDENTITY, False, True)]
+        for encoding in ENCODINGS:
+            modes.append((encoding, encoding, True, False))
+            modes.append(('{encoding} + cache'.format(encoding=encoding), encoding, True, True))
+
+        self.stdout.write('{query:<12}{mode:<22}{size:>12}{cpu:>16}'.format(
+            query='query', mode='mode', size='bytes', cpu='cpu ms/request'))
+
+        for name, query in QUERIES.items():
+            body = json.dumps([{'query': query, 'variables': {'first': options['first']}}])
+            for label, encoding, compression, response_cache in modes:
+                size, cpu = self.measure(body, encoding, compression, response_cache, options['iterations'])
+                self.stdout.write('{query:<12}{mode:<22}{size:>12}{cpu:>16.3f}'.format(
+                    query=name, mode=label, size=size, cpu=cpu))
+
+    @staticmethod
+    def measure(body, encoding, compression, response_cache, iterations):
+        """
+        Send the same request several times
+        :return: tuple with the response size in bytes and the mean CPU time per request in milliseconds
+        """
+        view = CustomGraphQLView.as_view(schema=SCHEMA, batch=True, response_cache=response_cache,
+                                         conditional_responses=True)
+        factory = RequestFactory()
+
+        def send():
+            request = factory.post('/graphql/', body, content_type='application/json',
+                                   HTTP_ACCEPT_ENCODING=encoding)
+            request.user = AnonymousUser()
+            return view(request)
+
+        with override_settings(GRAPHQL_COMPRESSION=compression):
+            # warm the document cache, and the response cache when it is used
+            response = send()
+
+            started = time.process_time()
+            for _ in range(iterations):
+                response = send()
+            cpu = (time.process_time() - started) * 1000 / iterations
+
+        return len(response.content), cpu
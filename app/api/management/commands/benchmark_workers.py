@@ -0,0 +1,132 @@
+"""
+Measure the throughput and latency of the GraphQL endpoint under each gunicorn worker profile and MySQL driver
+"""
+import json
+import math
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# environment of gunicorn.conf.py and of the settings for each mode
+MODES = {
+    'eventlet+pymysql': {'GUNICORN_PROFILE': 'eventlet', 'DB_DRIVER': 'pymysql'},
+    'eventlet+mysqlclient': {'GUNICORN_PROFILE': 'eventlet', 'DB_DRIVER': 'mysqlclient'},
+    'threads+mysqlclient': {'GUNICORN_PROFILE': 'threads', 'DB_DRIVER': 'mysqlclient'},
+}
+QUERY = '''query ($first: Int) {
+    offers(first: $first, sort: [CREATED_ON]) {
+        edges { node { id slug { es en } title { es en } price images { url } materials { id } } }
+    }
+}'''
+START_TIMEOUT = 30
+
+
+def percentile(values, fraction):
+    """Return the nearest-rank percentile of sorted values"""
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+class Command(BaseCommand):
+    help = 'Start gunicorn with each worker profile and MySQL driver, and measure the requests per second and the ' \
+           'latency percentiles of an offers query at several concurrency levels. Runs against the configured ' \
+           'database, with the response cache disabled.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', default=','.join(MODES), help='Comma separated modes: ' + ', '.join(MODES))
+        parser.add_argument('--concurrency', default='1,10,50,100', help='Comma separated concurrent clients')
+        parser.add_argument('--requests', type=int, default=500, help='Requests per concurrency level')
+        parser.add_argument('--workers', type=int, default=1, help='gunicorn workers')
+        parser.add_argument('--threads', type=int, default=8, help='Threads of each worker in the threads profile')
+        parser.add_argument('--first', type=int, default=20, help='Offers per page')
+        parser.add_argument('--port', type=int, default=8765, help='Port of the benchmarked server')
+
+    def handle(self, *args, **options):
+        modes = options['modes'].split(',')
+        unknown = [mode for mode in modes if mode not in MODES]
+        if unknown:
+            raise CommandError('Unknown modes: {modes}'.format(modes=', '.join(unknown)))
+
+        url = 'http://127.0.0.1:{port}/graphql/'.format(port=options['port'])
+        body = json.dumps([{'query': QUERY, 'variables': {'first': options['first']}}])
+        levels = [int(level) for level in options['concurrency'].split(',')]
+
+        self.stdout.write('{mode:<24}{clients:>8}{rps:>10}{p50:>10}{p99:>10}{errors:>8}'.format(
+            mode='mode', clients='clients', rps='req/s', p50='p50 ms', p99='p99 ms', errors='errors'))
+
+        for mode in modes:
+            server = self.start_server(MODES[mode], options)
+            try:
+                self.wait_until_ready(server, url, body)
+                for clients in levels:
+                    rps, latencies, errors = self.measure(url, body, clients, options['requests'])
+                    self.stdout.write('{mode:<24}{clients:>8}{rps:>10.1f}{p50:>10.1f}{p99:>10.1f}{errors:>8}'.format(
+                        mode=mode, clients=clients, rps=rps, p50=percentile(latencies, 0.5) if latencies else 0,
+                        p99=percentile(latencies, 0.99) if latencies else 0, errors=errors))
+            finally:
+                server.terminate()
+                server.wait()
+
+    @staticmethod
+    def start_server(environment, options):
+        """Start gunicorn with the configuration of the app and the environment of a mode"""
+        environment = dict(os.environ, GRAPHQL_RESPONSE_CACHE='False', GUNICORN_THREADS=str(options['threads']),
+                           **environment)
+        command = [sys.executable, '-c', 'from gunicorn.app.wsgiapp import run; run()', '--config', 'gunicorn.conf.py',
+                   '--bind', '127.0.0.1:{port}'.format(port=options['port']), '--workers', str(options['workers']),
+                   'api.wsgi']
+        return subprocess.Popen(command, cwd=settings.BASE_DIR, env=environment, stdout=subprocess.DEVNULL)
+
+    @staticmethod
+    def wait_until_ready(server, url, body):
+        """Wait for the server to answer, and warm the caches of its workers"""
+        deadline = time.monotonic() + START_TIMEOUT
+        while True:
+            if server.poll() is not None:
+                raise CommandError('gunicorn exited with status {status}'.format(status=server.returncode))
+            try:
+                if requests.post(url, data=body, headers={'Content-Type': 'application/json'}).ok:
+                    break
+            except requests.ConnectionError:
+                pass
+            if time.monotonic() > deadline:
+                raise CommandError('gunicorn did not answer in {seconds} seconds'.format(seconds=START_TIMEOUT))
+            time.sleep(0.2)
+
+        for _ in range(20):
+            requests.post(url, data=body, headers={'Content-Type': 'application/json'})
+
+    @staticmethod
+    def measure(url, body, clients, count):
+        """
+        Send requests from concurrent clients
+        :return: tuple with the requests per second, the sorted latencies of the successful requests in
+        milliseconds and the number of failed requests
+        """
+        local = threading.local()
+
+        def send(_):
+            session = getattr(local, 'session', None)
+            if session is None:
+                session = local.session = requests.Session()
+
+            started = time.perf_counter()
+            try:
+                ok = session.post(url, data=body, headers={'Content-Type': 'application/json'}).ok
+            except requests.RequestException:
+                ok = False
+            return ok, (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as executor:
+            results = list(executor.map(send, range(count)))
+        duration = time.perf_counter() - started
+
+        latencies = sorted(latency for ok, latency in results if ok)
+        return len(latencies) / duration, latencies, len(results) - len(latencies)
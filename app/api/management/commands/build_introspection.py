@@ -0,0 +1,22 @@
+"""
+Write the introspection results of the schemas and their compressed variants
+"""
+from django.core.management.base import BaseCommand
+
+from api.root_schema import SCHEMA, ADMIN_SCHEMA
+from api.utils.introspection import IntrospectionResult, get_output_path
+
+
+class Command(BaseCommand):
+    help = 'Write the introspection results of the public and admin schemas next to GRAPHENE["SCHEMA_OUTPUT"], ' \
+           'served as they are when GRAPHQL_INTROSPECTION_PREBUILT is set'
+
+    def handle(self, *args, **options):
+        for name, schema in (('public', SCHEMA), ('admin', ADMIN_SCHEMA)):
+            path = get_output_path(name)
+            result = IntrospectionResult.from_schema(schema)
+            result.write(path)
+
+            self.stdout.write('{name}: {path} ({sizes})'.format(name=name, path=path, sizes=', '.join(
+                '{encoding} {size} bytes'.format(encoding=encoding, size=len(content))
+                for encoding, content in result.contents.items())))
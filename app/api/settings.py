@@ -37,6 +37,7 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'graphene_django',
     'corsheaders',
+    'api',
     'accounts',
     'offers',
     'contact_info',
@@ -87,9 +88,17 @@ AUTHENTICATION_BACKENDS = ['accounts.backends.EmailBackend']
 # Database
 # https://docs.djangoproject.com/en/3.0/ref/settings/#databases
 
+# MySQL driver: 'mysqlclient' or 'pymysql'. PyMySQL is pure Python, so its sockets yield to the other green threads
+# of the eventlet workers, while mysqlclient blocks the whole worker during each query. See gunicorn.conf.py
+DATABASE_DRIVER = os.environ.get('DB_DRIVER', 'mysqlclient')
+if DATABASE_DRIVER == 'pymysql':
+    import pymysql  # pylint: disable=C0413
+
+    pymysql.install_as_MySQLdb()
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.mysql',
+        'ENGINE': 'api.db_backends.mysql_pool',
         'NAME': os.environ.get('DB_NAME', 'orbita'),
         'USER': os.environ.get('DB_USER', 'orbita'),
         'PASSWORD': os.environ.get('DB_PASSWORD', '123123'),
@@ -98,6 +107,28 @@ DATABASES = {
     }
 }
 
+# Read replicas of the default database, one alias for each host of DB_REPLICA_HOSTS (comma separated)
+for index, replica_host in enumerate(host for host in os.environ.get('DB_REPLICA_HOSTS', '').split(',') if host):
+    DATABASES['replica{index}'.format(index=index + 1)] = dict(DATABASES['default'], HOST=replica_host,
+                                                               TEST={'MIRROR': 'default'})
+
+# The query operations of the GraphQL views read from a healthy replica. Clients that wrote read from the primary
+# for DATABASE_REPLICA_LAG_SECONDS, and replicas that fail are skipped for DATABASE_REPLICA_RETRY_SECONDS
+DATABASE_ROUTERS = ['api.utils.db_router.ReplicaRouter']
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_REPLICA_LAG_SECONDS = int(os.environ.get('DB_REPLICA_LAG_SECONDS', 5))
+DATABASE_REPLICA_RETRY_SECONDS = int(os.environ.get('DB_REPLICA_RETRY_SECONDS', 30))
+DATABASE_PRIMARY_COOKIE = 'read_primary'
+
+# Connection pool of each worker and database: connections kept open, extra connections opened under load and closed
+# once released, seconds to wait for a connection, seconds before a connection is replaced (keep it under the
+# wait_timeout of MySQL) and seconds a connection may stay idle before it is checked with a ping
+DATABASE_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+DATABASE_POOL_MAX_OVERFLOW = int(os.environ.get('DB_POOL_MAX_OVERFLOW', 10))
+DATABASE_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 10))
+DATABASE_POOL_MAX_LIFETIME = int(os.environ.get('DB_POOL_MAX_LIFETIME', 1800))
+DATABASE_POOL_CHECK_AFTER = float(os.environ.get('DB_POOL_CHECK_AFTER', 5))
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -161,7 +192,8 @@ GRAPHENE = {
     'SCHEMA': 'api.root_schema.SCHEMA',  # Where your Graphene schema lives
     'SCHEMA_OUTPUT': 'data/schema.json',
     'MIDDLEWARE': [
-        'graphene_django.debug.DjangoDebugMiddleware',
+        'api.utils.middleware.InstrumentationMiddleware',
+        'api.utils.middleware.SelectedDjangoDebugMiddleware',
     ]
 }
 
@@ -231,10 +263,81 @@ LOGGING = {
 if DEBUG:  # pragma: no cover
     TEMPLATES[0]['DIRS'] = [os.path.join(BASE_DIR, 'api/templates')]
     ROOT_URLCONF = 'api.urls_dev'
+    GRAPHENE['MIDDLEWARE'] = [
+        'api.utils.middleware.InstrumentationMiddleware',
+        'graphene_django.debug.DjangoDebugMiddleware',
+    ]
 
 OFFER_SHORT_DESCRIPTION_MAX_LENGTH = 100
 OFFER_FILTER_RESULT_COUNT = 100
 
+# Words of an offer search that are used, and min length of the words indexed by MySQL (innodb_ft_min_token_size)
+OFFER_SEARCH_MAX_TERMS = int(os.environ.get('OFFER_SEARCH_MAX_TERMS', 10))
+OFFER_SEARCH_MIN_TOKEN_SIZE = int(os.environ.get('OFFER_SEARCH_MIN_TOKEN_SIZE', 3))
+
+# Seconds the facets of the offer lists are cached, they are also invalidated when offers, materials or
+# categories change
+OFFER_FACETS_CACHE_TIMEOUT = int(os.environ.get('OFFER_FACETS_CACHE_TIMEOUT', 60 * 10))
+OFFER_PRICE_FACETS_MAX_BUCKETS = int(os.environ.get('OFFER_PRICE_FACETS_MAX_BUCKETS', 50))
+
+# Max number of parsed and validated GraphQL documents kept by each worker
+GRAPHQL_DOCUMENT_CACHE_SIZE = int(os.environ.get('GRAPHQL_DOCUMENT_CACHE_SIZE', 500))
+
+# Static cost limit of GraphQL operations, unpaginated lists count as QUERY_COST_LIST_SIZE items
+MAX_QUERY_COST = int(os.environ.get('MAX_QUERY_COST', 20000))
+QUERY_COST_LIST_SIZE = int(os.environ.get('QUERY_COST_LIST_SIZE', 10))
+
+# Response cache of the public schema query operations, invalidated when the models they touched change
+GRAPHQL_RESPONSE_CACHE = os.environ.get('GRAPHQL_RESPONSE_CACHE', 'False') != 'False'
+GRAPHQL_RESPONSE_CACHE_TIMEOUT = int(os.environ.get('GRAPHQL_RESPONSE_CACHE_TIMEOUT', 60 * 60))
+
+# Seconds the totalCount of the connections is cached, counts are also invalidated when the models they read change
+CONNECTION_COUNT_CACHE_TIMEOUT = int(os.environ.get('CONNECTION_COUNT_CACHE_TIMEOUT', 60))
+
+# Serve the introspection results written by the build_introspection command instead of computing them
+GRAPHQL_INTROSPECTION_PREBUILT = os.environ.get('GRAPHQL_INTROSPECTION_PREBUILT', 'False') != 'False'
+
+# Compression of the GraphQL responses larger than GRAPHQL_COMPRESSION_MIN_SIZE bytes, levels by encoding
+GRAPHQL_COMPRESSION = os.environ.get('GRAPHQL_COMPRESSION', 'True') != 'False'
+GRAPHQL_COMPRESSION_MIN_SIZE = int(os.environ.get('GRAPHQL_COMPRESSION_MIN_SIZE', 1024))
+GRAPHQL_COMPRESSION_LEVELS = {
+    'gzip': int(os.environ.get('GRAPHQL_GZIP_LEVEL', 6)),
+    'br': int(os.environ.get('GRAPHQL_BROTLI_LEVEL', 5)),
+}
+
+# ETag and Last-Modified headers on the read-only requests of the public schema, 304 when they did not change
+GRAPHQL_CONDITIONAL_RESPONSES = os.environ.get('GRAPHQL_CONDITIONAL_RESPONSES', 'True') != 'False'
+
+# Bearer token of the Prometheus scrapes of /graphql_metrics, which staff sessions can also read. Without a token only
+# staff sessions can. Scrape config, each scrape reads the metrics of the worker that answers it:
+#   - job_name: orbita-api
+#     metrics_path: /graphql_metrics
+#     authorization:
+#       credentials: <GRAPHQL_METRICS_TOKEN>
+#     static_configs:
+#       - targets: ['api:8000']
+GRAPHQL_METRICS_TOKEN = os.environ.get('GRAPHQL_METRICS_TOKEN')
+
+# Max threads (green threads under eventlet) running the queries of a batch concurrently
+GRAPHQL_BATCH_WORKERS = int(os.environ.get('GRAPHQL_BATCH_WORKERS', 4))
+
+# Max threads (green threads under eventlet) running the jobs left for after the requests
+BACKGROUND_WORKERS = int(os.environ.get('BACKGROUND_WORKERS', 1))
+
+# Regenerate the permalinks of the offers of a renamed category after the admin request returns
+CATEGORY_PERMALINKS_BACKGROUND = os.environ.get('CATEGORY_PERMALINKS_BACKGROUND', 'False') != 'False'
+
+# Operations slower than GRAPHQL_SLOW_OPERATION_MS are logged with their field timings when sampled
+GRAPHQL_TRACE_SAMPLE_RATE = float(os.environ.get('GRAPHQL_TRACE_SAMPLE_RATE', 0.1))
+GRAPHQL_SLOW_OPERATION_MS = int(os.environ.get('GRAPHQL_SLOW_OPERATION_MS', 500))
+
+# Automatic persisted queries: in-process LRU size and redis expiration (seconds)
+PERSISTED_QUERY_CACHE_SIZE = int(os.environ.get('PERSISTED_QUERY_CACHE_SIZE', 1000))
+PERSISTED_QUERY_TIMEOUT = int(os.environ.get('PERSISTED_QUERY_TIMEOUT', 60 * 60 * 24 * 30))
+
+# Offers kept by the LRU of each worker for the lookups by slug or permalink
+OFFER_LOOKUP_CACHE_SIZE = int(os.environ.get('OFFER_LOOKUP_CACHE_SIZE', 1000))
+
 cloudinary.config(
     cloud_name=os.environ.get('CLOUD_NAME', 'orbita'),
     api_key=os.environ.get('CLOUD_API_KEY', '566843397419569'),
@@ -0,0 +1,17 @@
+"""
+Settings of the test suite: SQLite databases, the second one a read replica, and a local memory cache.
+Run the tests with `python manage.py test --settings=api.settings_test`
+"""
+from api.settings import *  # noqa pylint: disable=W0401,W0614
+
+DATABASES = {
+    'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': os.path.join(BASE_DIR, 'test.sqlite3')},
+    'replica': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': os.path.join(BASE_DIR, 'test_replica.sqlite3')},
+}
+# the replica is only read by the tests of the router, which enable it
+DATABASE_REPLICAS = []
+
+# build the test databases from the models, the migrations of the MySQL only columns and indexes do not run on SQLite
+MIGRATION_MODULES = {app: None for app in ('auth', 'contenttypes', 'accounts', 'offers', 'contact_info')}
+
+CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
@@ -0,0 +1,481 @@
+"""Tests of the GraphQL views"""
+import gzip
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from hashlib import sha256
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+from django.core.management import call_command
+from django.db import OperationalError, connections
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+
+from accounts.models import User
+from api.root_schema import ADMIN_SCHEMA, SCHEMA
+from api.utils import db_router, introspection
+from api.utils.backend import DOCUMENT_BACKEND, get_query_hash
+from api.utils.cost import QueryCostAnalyzer
+from api.utils.db_pool import ConnectionPool, PooledDatabaseWrapperMixin, PoolTimeout
+from api.utils.metrics import METRICS
+from api.utils.persisted_queries import PERSISTED_QUERIES
+from api.views import CustomGraphQLView, get_introspection_schema, get_metrics
+from contact_info.models import Message
+from offers.models import Offer
+from offers.tests import create_catalog
+
+OFFERS_QUERY = '{ offers(first: 50) { edges { node { id images { url } materials { id } } } } }'
+
+
+class GraphQLViewMixin:
+    """Send requests to the public GraphQL view"""
+    view_options = {}
+
+    def send(self, request):
+        """
+        Send a request to a batch endpoint
+        :return: the response
+        """
+        request.user = AnonymousUser()
+        return CustomGraphQLView.as_view(schema=SCHEMA, batch=True, **self.view_options)(request)
+
+    def post(self, operations, **headers):
+        """Send a batch of operations"""
+        return self.send(RequestFactory().post('/graphql/', json.dumps(operations), content_type='application/json',
+                                               **headers))
+
+    def get(self, query, **headers):
+        """Send a single operation in the query string"""
+        return self.send(RequestFactory().get('/graphql/', {'query': query}, **headers))
+
+
+class GraphQLViewTestCase(GraphQLViewMixin, TestCase):
+    """Send requests to the public GraphQL view, with a catalog of five offers"""
+
+    @classmethod
+    def setUpTestData(cls):
+        create_catalog(5)
+
+
+class QueryCostTest(GraphQLViewTestCase):
+    """Operations over the cost budget, or whose cost can not be measured, are not executed"""
+
+    def test_cost_is_reported(self):
+        response = self.post([{'query': OFFERS_QUERY}])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('cost', json.loads(response.content.decode())[0]['extensions'])
+
+    @override_settings(MAX_QUERY_COST=5)
+    def test_cost_over_budget(self):
+        response = self.post([{'query': OFFERS_QUERY}])
+        self.assertEqual(response.status_code, 403)
+
+        result = json.loads(response.content.decode())[0]
+        self.assertNotIn('data', result)
+        self.assertEqual(result['errors'][0]['code'], 'query-cost-exceeded')
+
+    def test_cost_analysis_failure(self):
+        with mock.patch.object(QueryCostAnalyzer, 'operation_cost', side_effect=TypeError):
+            response = self.post([{'query': OFFERS_QUERY}])
+
+        self.assertEqual(response.status_code, 500)
+        result = json.loads(response.content.decode())[0]
+        self.assertNotIn('data', result)
+        self.assertEqual(result['errors'][0]['code'], 'query-cost-unavailable')
+
+
+class DocumentCacheTest(GraphQLViewTestCase):
+    """Every step of a request reads the parsed documents of the shared LRU backend"""
+
+    def setUp(self):
+        DOCUMENT_BACKEND.clear()
+
+    def test_view_backend(self):
+        self.assertIs(CustomGraphQLView(schema=SCHEMA).get_backend(None), DOCUMENT_BACKEND)
+
+    def test_documents_are_parsed_once(self):
+        self.post([{'query': OFFERS_QUERY}])
+        self.assertEqual(DOCUMENT_BACKEND.stats()['misses'], 1)
+
+        self.post([{'query': OFFERS_QUERY}])
+        stats = DOCUMENT_BACKEND.stats()
+        self.assertEqual(stats['misses'], 1)
+        self.assertGreater(stats['hits'], 0)
+
+
+class ResponseCacheTest(GraphQLViewTestCase):
+    """Cached responses keep the shape of the request, and the extensions of the request that reads them"""
+    view_options = {'response_cache': True}
+
+    def setUp(self):
+        cache.clear()
+
+    def test_batch_and_single_responses(self):
+        batch = json.loads(self.post([{'query': OFFERS_QUERY}]).content.decode())
+        single = json.loads(self.get(OFFERS_QUERY).content.decode())
+
+        self.assertEqual(batch[0]['status'], 200)
+        self.assertNotIn('status', single)
+        self.assertNotIn('id', single)
+        self.assertEqual(single['data'], batch[0]['data'])
+
+    def test_cached_response_extensions(self):
+        first = json.loads(self.get(OFFERS_QUERY).content.decode())
+        with self.assertNumQueries(0):
+            second = json.loads(self.get(OFFERS_QUERY).content.decode())
+
+        self.assertEqual(second['data'], first['data'])
+        self.assertIn('cost', second['extensions'])
+        self.assertIn('timing', second['extensions'])
+
+    def test_invalidation_waits_for_commit(self):
+        with mock.patch('django.db.transaction.on_commit') as on_commit:
+            Offer.objects.first().save()
+            self.get(OFFERS_QUERY)
+            self.assertEqual(on_commit.call_count, 1)
+            with self.assertNumQueries(0):
+                self.get(OFFERS_QUERY)
+
+            on_commit.call_args[0][0]()
+
+        with self.assertNumQueries(3):
+            self.get(OFFERS_QUERY)
+
+
+@override_settings(GRAPHQL_COMPRESSION_MIN_SIZE=0)
+class ConditionalResponseTest(GraphQLViewTestCase):
+    """Compressed bodies are validated and cached by the shape of the request"""
+    view_options = {'response_cache': True, 'conditional_responses': True}
+
+    def setUp(self):
+        cache.clear()
+
+    def test_batch_after_single(self):
+        single = self.get(OFFERS_QUERY, HTTP_ACCEPT_ENCODING='gzip')
+        batch = self.post([{'query': OFFERS_QUERY}], HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(batch['Content-Encoding'], 'gzip')
+        self.assertNotEqual(batch['ETag'], single['ETag'])
+        self.assertIsInstance(json.loads(gzip.decompress(single.content).decode()), dict)
+        self.assertIsInstance(json.loads(gzip.decompress(batch.content).decode()), list)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTest(GraphQLViewTestCase):
+    """
+    Queries read from the replica, unless the client wrote recently or the replica is down, and mutations use the
+    primary. The catalog is only created in the primary, so the offers found tell which database was read.
+    """
+    databases = {'default', 'replica'}
+    mutation = 'mutation { createMessage(name: "Name", email: "name@example.com", topic: "Topic") { ok } }'
+
+    def setUp(self):
+        db_router._replicas_down_until.clear()  # pylint: disable=W0212
+
+    def get_offers(self, **headers):
+        """Return the offers found by a query"""
+        response = self.post([{'query': OFFERS_QUERY}], **headers)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content.decode())[0]['data']['offers']['edges']
+
+    def test_query_reads_replica(self):
+        self.assertEqual(self.get_offers(), [])
+
+    def test_mutation_uses_primary(self):
+        response = self.post([{'query': self.mutation}])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Message.objects.using('default').count(), 1)
+        self.assertEqual(Message.objects.using('replica').count(), 0)
+        self.assertIn(settings.DATABASE_PRIMARY_COOKIE, response.cookies)
+
+    def test_pinned_client_reads_primary(self):
+        cookie = '{name}=1'.format(name=settings.DATABASE_PRIMARY_COOKIE)
+        self.assertEqual(len(self.get_offers(HTTP_COOKIE=cookie)), 5)
+
+    def test_replica_down_reads_primary(self):
+        with mock.patch.object(connections['replica'], 'ensure_connection', side_effect=OperationalError):
+            self.assertEqual(len(self.get_offers()), 5)
+
+        self.assertIn('replica', db_router._replicas_down_until)  # pylint: disable=W0212
+
+
+class MetricsTest(TestCase):
+    """Values that only increase are exported as counters"""
+
+    def test_metric_types(self):
+        lines = METRICS.render().splitlines()
+        self.assertIn('# TYPE graphql_document_cache_hits counter', lines)
+        self.assertIn('# TYPE graphql_document_cache_size gauge', lines)
+        self.assertIn('# TYPE graphql_operation_duration_ms histogram', lines)
+
+    @override_settings(GRAPHQL_METRICS_TOKEN='secret')
+    def test_scrape_token(self):
+        request = RequestFactory().get('/graphql_metrics', HTTP_AUTHORIZATION='Bearer secret')
+        request.user = AnonymousUser()
+        response = get_metrics(request)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('# TYPE graphql_document_cache_hits counter', response.content.decode())
+
+        for authorization in ('Bearer other', 'secret', ''):
+            with self.subTest(authorization=authorization):
+                request = RequestFactory().get('/graphql_metrics', HTTP_AUTHORIZATION=authorization)
+                request.user = AnonymousUser()
+                with self.assertRaises(PermissionDenied):
+                    get_metrics(request)
+
+    def test_without_token(self):
+        request = RequestFactory().get('/graphql_metrics', HTTP_AUTHORIZATION='Bearer ')
+        request.user = AnonymousUser()
+        with self.assertRaises(PermissionDenied):
+            get_metrics(request)
+
+
+class ConnectionPoolTest(TestCase):
+    """The pool reuses released connections, closes the extra ones and replaces the ones that stopped working"""
+
+    def setUp(self):
+        self.pool = ConnectionPool('test', size=2, max_overflow=1, timeout=0.01, max_lifetime=60, check_after=60)
+        self.connect = mock.Mock(side_effect=mock.Mock)
+        self.check = mock.Mock(return_value=True)
+
+    def checkout(self):
+        """Check out a connection of the pool"""
+        return self.pool.checkout(self.connect, self.check)
+
+    def test_reuse(self):
+        connection, reused = self.checkout()
+        self.assertFalse(reused)
+        self.assertEqual(self.pool.stats(), {'opened': 1, 'in_use': 1, 'idle': 0, 'timeouts': 0})
+
+        self.pool.release(connection)
+        self.assertEqual(self.pool.stats(), {'opened': 1, 'in_use': 0, 'idle': 1, 'timeouts': 0})
+
+        self.assertEqual(self.checkout(), (connection, True))
+        self.assertEqual(self.connect.call_count, 1)
+        # recently released connections are not checked
+        self.check.assert_not_called()
+        connection.close.assert_not_called()
+
+    def test_overflow(self):
+        opened = [self.checkout()[0] for _ in range(3)]
+        self.assertEqual(self.pool.stats(), {'opened': 3, 'in_use': 3, 'idle': 0, 'timeouts': 0})
+
+        with self.assertRaises(PoolTimeout):
+            self.checkout()
+        self.assertEqual(self.pool.stats()['timeouts'], 1)
+
+        # the overflow connection is closed once released, the others stay open
+        for connection in opened:
+            self.pool.release(connection)
+        opened[0].close.assert_called_once_with()
+        opened[1].close.assert_not_called()
+        opened[2].close.assert_not_called()
+        self.assertEqual(self.pool.stats(), {'opened': 2, 'in_use': 0, 'idle': 2, 'timeouts': 1})
+
+        # the last released connection is reused first
+        self.assertEqual(self.checkout(), (opened[2], True))
+
+    def test_unusable_connection(self):
+        connection, _ = self.checkout()
+        self.pool.release(connection, checked=False)
+
+        self.check.return_value = False
+        replacement, reused = self.checkout()
+        self.check.assert_called_once_with(connection)
+        connection.close.assert_called_once_with()
+        self.assertIsNot(replacement, connection)
+        self.assertFalse(reused)
+        self.assertEqual(self.pool.stats(), {'opened': 1, 'in_use': 1, 'idle': 0, 'timeouts': 0})
+
+    def test_checked_connection(self):
+        connection, _ = self.checkout()
+        self.pool.release(connection, checked=False)
+
+        self.assertEqual(self.checkout(), (connection, True))
+        self.check.assert_called_once_with(connection)
+        connection.close.assert_not_called()
+
+    def test_not_reusable(self):
+        connection, _ = self.checkout()
+        self.pool.release(connection, reusable=False)
+
+        connection.close.assert_called_once_with()
+        self.assertEqual(self.pool.stats(), {'opened': 0, 'in_use': 0, 'idle': 0, 'timeouts': 0})
+
+    def test_connect_error(self):
+        self.connect.side_effect = OperationalError()
+        for _ in range(4):
+            with self.assertRaises(OperationalError):
+                self.checkout()
+        self.assertEqual(self.pool.stats(), {'opened': 0, 'in_use': 0, 'idle': 0, 'timeouts': 0})
+
+    def test_check_connection(self):
+        wrapper = mock.Mock(Database=sqlite3)
+        connection = sqlite3.connect(':memory:')
+        self.assertTrue(PooledDatabaseWrapperMixin.check_connection(wrapper, connection))
+        connection.close()
+        self.assertFalse(PooledDatabaseWrapperMixin.check_connection(wrapper, connection))
+
+
+class PersistedQueryTest(GraphQLViewTestCase):
+    """Operations may send the sha256 hash of a query registered before instead of the query"""
+
+    def setUp(self):
+        cache.clear()
+        PERSISTED_QUERIES.queries.clear()
+
+    @staticmethod
+    def get_extensions(query_hash):
+        """Return the extensions of an operation sending a persisted query hash"""
+        return {'persistedQuery': {'version': 1, 'sha256Hash': query_hash}}
+
+    def send_operation(self, **operation):
+        """Send one operation and return its response"""
+        return json.loads(self.post([operation]).content.decode())[0]
+
+    def test_unknown_hash(self):
+        result = self.send_operation(extensions=self.get_extensions(get_query_hash(OFFERS_QUERY)))
+
+        self.assertNotIn('data', result)
+        self.assertEqual(result['errors'][0]['code'], 'persisted-query-not-found')
+        self.assertEqual(result['errors'][0]['message'], 'PersistedQueryNotFound')
+
+    def test_hash_mismatch(self):
+        result = self.send_operation(query=OFFERS_QUERY, extensions=self.get_extensions(get_query_hash('{ x }')))
+
+        self.assertNotIn('data', result)
+        self.assertEqual(result['errors'][0]['code'], 'persisted-query-hash-mismatch')
+        self.assertIsNone(PERSISTED_QUERIES.get(get_query_hash('{ x }')))
+
+    def test_register_then_hit(self):
+        extensions = self.get_extensions(get_query_hash(OFFERS_QUERY))
+        registered = self.send_operation(query=OFFERS_QUERY, extensions=extensions)
+        self.assertEqual(len(registered['data']['offers']['edges']), 5)
+
+        self.assertEqual(self.send_operation(extensions=extensions)['data'], registered['data'])
+
+        # other workers find the query in the shared cache
+        PERSISTED_QUERIES.queries.clear()
+        self.assertEqual(self.send_operation(extensions=extensions)['data'], registered['data'])
+
+
+@override_settings(GRAPHQL_BATCH_WORKERS=4)
+class BatchTest(GraphQLViewMixin, TransactionTestCase):
+    """
+    Identical queries of a batch run once, and the other queries run concurrently on the executor threads, each with
+    its own database connection, so the catalog has to be committed
+    """
+
+    def setUp(self):
+        create_catalog(5)
+
+    def test_duplicates_run_once(self):
+        execute = CustomGraphQLView.execute_graphql_request
+        first_offer = '{ offers(first: 1) { edges { node { id } } } }'
+
+        with mock.patch.object(CustomGraphQLView, 'execute_graphql_request', autospec=True,
+                               side_effect=execute) as executed:
+            response = self.post([{'query': OFFERS_QUERY}, {'query': first_offer}, {'query': OFFERS_QUERY}])
+
+        self.assertEqual(executed.call_count, 2)
+        results = json.loads(response.content.decode())
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[0]['data'], results[2]['data'])
+        self.assertEqual(len(results[1]['data']['offers']['edges']), 1)
+
+    def test_responses_keep_batch_order(self):
+        get_operation_response = CustomGraphQLView.get_operation_response
+        threads = set()
+
+        def slow_response(view, request, data, show_graphiql=False):
+            # the first operations finish last
+            threads.add(threading.current_thread().name)
+            time.sleep(0.02 * (5 - int(data['id'])))
+            return get_operation_response(view, request, data, show_graphiql)
+
+        operations = [{'id': str(first), 'query': '{ offers(first: %d) { edges { node { id } } } }' % first}
+                      for first in range(1, 6)]
+        with mock.patch.object(CustomGraphQLView, 'get_operation_response', autospec=True,
+                               side_effect=slow_response):
+            response = self.post(operations)
+
+        self.assertTrue(any(name.startswith('graphql-batch') for name in threads))
+        results = json.loads(response.content.decode())
+        self.assertEqual([result['id'] for result in results], ['1', '2', '3', '4', '5'])
+        self.assertEqual([len(result['data']['offers']['edges']) for result in results], [1, 2, 3, 4, 5])
+
+
+class IntrospectionTest(TestCase):
+    """The introspection results are encoded once, with an ETag for each encoding"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='admin@example.com', fullname='Admin', is_staff=True)
+
+    def setUp(self):
+        introspection._results.clear()  # pylint: disable=W0212
+
+    def get(self, app='public', **headers):
+        """Request the introspection result of a schema"""
+        request = RequestFactory().get('/graphql_introspection_schema', {'app': app}, **headers)
+        request.user = self.user
+        return get_introspection_schema(request)
+
+    @staticmethod
+    def get_content(response):
+        """Return the decoded body of a response"""
+        content = response.content
+        if response.get('Content-Encoding') == 'gzip':
+            content = gzip.decompress(content)
+        return json.loads(content.decode())
+
+    def test_results_match_live_introspection(self):
+        for app, schema in (('public', SCHEMA), ('admin', ADMIN_SCHEMA)):
+            with self.subTest(app=app):
+                self.assertEqual(self.get_content(self.get(app)), {'data': schema.introspect()})
+
+    def test_encodings(self):
+        identity = self.get()
+        etag = '"{digest}"'.format(digest=sha256(identity.content).hexdigest())
+        self.assertFalse(identity.has_header('Content-Encoding'))
+        self.assertEqual(identity['ETag'], etag)
+        self.assertEqual(identity['Vary'], 'Accept-Encoding')
+
+        compressed = self.get(HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertEqual(compressed['ETag'], etag[:-1] + '-gzip"')
+        self.assertEqual(gzip.decompress(compressed.content), identity.content)
+
+    def test_not_modified(self):
+        etag = self.get(HTTP_ACCEPT_ENCODING='gzip')['ETag']
+        response = self.get(HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_prebuilt_results(self):
+        live = self.get(HTTP_ACCEPT_ENCODING='gzip')
+        introspection._results.clear()  # pylint: disable=W0212
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'schema.json')
+            with mock.patch.object(introspection.graphene_settings, 'SCHEMA_OUTPUT', path):
+                call_command('build_introspection', stdout=StringIO())
+                self.assertTrue(os.path.exists(path + '.gz'))
+
+                with override_settings(GRAPHQL_INTROSPECTION_PREBUILT=True), \
+                        mock.patch.object(introspection.IntrospectionResult, 'from_schema') as from_schema:
+                    prebuilt = self.get(HTTP_ACCEPT_ENCODING='gzip')
+
+        from_schema.assert_not_called()
+        self.assertEqual(gzip.decompress(prebuilt.content), gzip.decompress(live.content))
+        self.assertEqual(prebuilt['ETag'], live['ETag'])
@@ -1,16 +1,19 @@
 """
 api URL Configuration
 """
-from django.conf import urls
+from django.conf import settings, urls
 from django.views.decorators.csrf import csrf_exempt
 
 from api import root_schema
-from api.views import CustomGraphQLView, AdminGraphQLView, get_introspection_schema
+from api.views import CustomGraphQLView, AdminGraphQLView, get_introspection_schema, get_metrics
 
 urlpatterns = [
     urls.url(r'^graphql/',
-             csrf_exempt(CustomGraphQLView.as_view(graphiql=False, schema=root_schema.SCHEMA, batch=True, ))),
+             csrf_exempt(CustomGraphQLView.as_view(graphiql=False, schema=root_schema.SCHEMA, batch=True,
+                                                   response_cache=settings.GRAPHQL_RESPONSE_CACHE,
+                                                   conditional_responses=settings.GRAPHQL_CONDITIONAL_RESPONSES))),
     urls.url(r'^graphql_admin/', csrf_exempt(AdminGraphQLView.as_view(graphiql=False, schema=root_schema.ADMIN_SCHEMA,
                                                                       batch=True))),
     urls.url(r'^graphql_introspection_schema', get_introspection_schema),
+    urls.url(r'^graphql_metrics', get_metrics),
 ]
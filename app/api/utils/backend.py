@@ -0,0 +1,95 @@
+"""
+GraphQL backend with a bounded cache of parsed and validated documents
+"""
+from functools import partial
+from hashlib import sha256
+
+from django.conf import settings
+from graphql.backend.base import GraphQLBackend, GraphQLDocument
+from graphql.execution import ExecutionResult, execute
+from graphql.language.base import parse
+from graphql.validation import validate
+
+from api.utils.lru import LRUCache
+from api.utils.metrics import METRICS
+
+
+def get_query_hash(query):
+    """
+    Return the sha256 hex digest of a query string
+    :param query: query string
+    """
+    return sha256(query.encode('utf-8')).hexdigest()
+
+
+def invalid_document_execute(validation_errors, *args, **kwargs):
+    """Execute function of a document that failed validation"""
+    return ExecutionResult(errors=validation_errors, invalid=True)
+
+
+class LRUCachedBackend(GraphQLBackend):
+    """
+    Backend that parses and validates each query once and keeps the resulting documents in a bounded
+    LRU cache keyed by (schema, query hash). Documents from the cache execute without validating again.
+    """
+
+    def __init__(self, max_size=None, executor=None):
+        self.execute_params = {'executor': executor}
+        self.documents = LRUCache(max_size or settings.GRAPHQL_DOCUMENT_CACHE_SIZE)
+
+    def document_from_string(self, schema, request_string):
+        key = (schema, get_query_hash(request_string))
+
+        document = self.documents.get(key)
+        if document is None:
+            document = self.build_document(schema, request_string)
+            self.documents.set(key, document)
+
+        return document
+
+    def build_document(self, schema, request_string):
+        """
+        Parse and validate a query string
+        :param schema: GraphQL schema
+        :param request_string: query string
+        :return: GraphQLDocument ready to execute
+        """
+        document_ast = parse(request_string)
+        validation_errors = validate(schema, document_ast)
+
+        if validation_errors:
+            execute_document = partial(invalid_document_execute, validation_errors)
+        else:
+            execute_document = partial(execute, schema, document_ast, **self.execute_params)
+
+        return GraphQLDocument(
+            schema=schema,
+            document_string=request_string,
+            document_ast=document_ast,
+            execute=execute_document,
+        )
+
+    def stats(self):
+        """Return the cache counters"""
+        return self.documents.stats()
+
+    def clear(self):
+        """Remove every cached document and reset the counters"""
+        self.documents.clear()
+
+
+DOCUMENT_BACKEND = LRUCachedBackend()
+
+
+def document_cache_metrics():
+    """Export the counters of the parsed document cache"""
+    stats = DOCUMENT_BACKEND.stats()
+    return [
+        ('graphql_document_cache_hits', 'Parsed document cache hits', stats['hits']),
+        ('graphql_document_cache_misses', 'Parsed document cache misses', stats['misses']),
+        ('graphql_document_cache_size', 'Parsed documents in cache', stats['size']),
+    ]
+
+
+METRICS.register_collector(document_cache_metrics,
+                           counters=('graphql_document_cache_hits', 'graphql_document_cache_misses'))
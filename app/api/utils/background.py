@@ -0,0 +1,48 @@
+"""
+Executor running slow jobs of a request after it returns
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import transaction
+
+from api.utils.batch import close_connections_after
+
+logger = logging.getLogger(__name__)  # pylint: disable=C0103
+
+_executor = None  # pylint: disable=C0103
+_executor_lock = threading.Lock()  # pylint: disable=C0103
+
+
+def get_executor():
+    """Return the background executor of the worker, created on first use like the batch executor"""
+    global _executor  # pylint: disable=W0603
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.BACKGROUND_WORKERS, thread_name_prefix='background')
+    return _executor
+
+
+def log_errors(function):
+    """Wrap a function to log the exceptions it raises, which nobody waits for in the background"""
+
+    def wrap():
+        try:
+            return function()
+        except Exception:  # pylint: disable=W0703
+            logger.exception('Background job %s failed', getattr(function, '__name__', function))
+            return None
+
+    return wrap
+
+
+def run_in_background(function):
+    """
+    Run a function on the background executor once the current transaction is committed
+    :param function: callable without arguments
+    """
+    job = close_connections_after(log_errors(function))
+    transaction.on_commit(lambda: get_executor().submit(job))
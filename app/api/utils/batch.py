@@ -0,0 +1,55 @@
+"""
+Bounded executor to run independent GraphQL operations of a batch concurrently
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+
+_executor = None  # pylint: disable=C0103
+_executor_lock = threading.Lock()  # pylint: disable=C0103
+
+
+def get_executor():
+    """
+    Return the executor of the worker, created on first use so it is built after gunicorn forks and
+    eventlet patches threading (its threads are green threads under the eventlet worker class).
+    """
+    global _executor  # pylint: disable=W0603
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.GRAPHQL_BATCH_WORKERS,
+                                           thread_name_prefix='graphql-batch')
+    return _executor
+
+
+def close_connections_after(function):
+    """
+    Wrap a function to close the database connections opened by the executor thread that runs it
+    """
+
+    def wrap():
+        try:
+            return function()
+        finally:
+            connections.close_all()
+
+    return wrap
+
+
+def run_concurrently(functions):
+    """
+    Run functions concurrently on the executor. The first one runs in the current thread.
+    :param functions: list of callables without arguments
+    :return: list with the result of each function, in order
+    """
+    if len(functions) <= 1 or settings.GRAPHQL_BATCH_WORKERS <= 1:
+        return [function() for function in functions]
+
+    executor = get_executor()
+    futures = [executor.submit(close_connections_after(function)) for function in functions[1:]]
+    results = [functions[0]()]
+    results.extend(future.result() for future in futures)
+    return results
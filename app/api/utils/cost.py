@@ -0,0 +1,177 @@
+"""
+Static cost analysis of GraphQL operations
+"""
+import logging
+
+from django.conf import settings
+from graphene_django.settings import graphene_settings
+from graphql.error import GraphQLError
+from graphql.language.ast import Field as FieldNode, FragmentDefinition, FragmentSpread, InlineFragment, IntValue, \
+    OperationDefinition, Variable
+from graphql.type.definition import GraphQLList, GraphQLObjectType, GraphQLInterfaceType, get_named_type, \
+    get_nullable_type
+
+from api.utils.exceptions import QueryCostUnavailable
+
+logger = logging.getLogger(__name__)  # pylint: disable=C0103
+
+PAGINATION_ARGUMENTS = ('first', 'last')
+
+
+def is_connection_type(graphql_type):
+    """Check if a type is a relay connection"""
+    return isinstance(graphql_type, GraphQLObjectType) and \
+        'edges' in graphql_type.fields and 'pageInfo' in graphql_type.fields
+
+
+class QueryCostAnalyzer:
+    """
+    Estimate the cost of an operation before it runs.
+    Every resolved object costs 1 and the cost of a field's children is multiplied by the number of items it
+    may return: the `first`/`last` argument of connections and `QUERY_COST_LIST_SIZE` for plain lists.
+    """
+
+    def __init__(self, schema, document_ast, variables=None):
+        self.schema = schema
+        self.variables = variables or {}
+        self.fragments = {}
+        self.operations = []
+
+        for definition in document_ast.definitions:
+            if isinstance(definition, FragmentDefinition):
+                self.fragments[definition.name.value] = definition
+            elif isinstance(definition, OperationDefinition):
+                self.operations.append(definition)
+
+    def get_operation(self, operation_name=None):
+        """
+        Return the operation definition that will be executed
+        :param operation_name: name of the operation
+        :return: OperationDefinition or None
+        """
+        if not operation_name:
+            return self.operations[0] if len(self.operations) == 1 else None
+
+        for operation in self.operations:
+            if operation.name and operation.name.value == operation_name:
+                return operation
+
+        return None
+
+    def get_root_type(self, operation):
+        """Return the root type of an operation"""
+        if operation.operation == 'mutation':
+            return self.schema.get_mutation_type()
+        if operation.operation == 'subscription':
+            return self.schema.get_subscription_type()
+        return self.schema.get_query_type()
+
+    def operation_cost(self, operation):
+        """
+        Return the cost of an operation definition
+        :param operation: OperationDefinition
+        """
+        variables = dict(self.variables)
+        for definition in operation.variable_definitions or []:
+            name = definition.variable.name.value
+            if variables.get(name) is None and isinstance(definition.default_value, IntValue):
+                variables[name] = int(definition.default_value.value)
+
+        return self.selection_set_cost(operation.selection_set, self.get_root_type(operation), variables, set())
+
+    def selection_set_cost(self, selection_set, parent_type, variables, visited_fragments):
+        """Return the cost of a selection set"""
+        cost = 0
+
+        if selection_set is None:
+            return cost
+
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                cost += self.field_cost(selection, parent_type, variables, visited_fragments)
+            elif isinstance(selection, FragmentSpread):
+                name = selection.name.value
+                fragment = self.fragments.get(name)
+                if fragment is None or name in visited_fragments:
+                    continue
+                fragment_type = self.schema.get_type(fragment.type_condition.name.value) or parent_type
+                cost += self.selection_set_cost(fragment.selection_set, fragment_type, variables,
+                                                visited_fragments | {name})
+            elif isinstance(selection, InlineFragment):
+                fragment_type = parent_type
+                if selection.type_condition:
+                    fragment_type = self.schema.get_type(selection.type_condition.name.value) or parent_type
+                cost += self.selection_set_cost(selection.selection_set, fragment_type, variables, visited_fragments)
+
+        return cost
+
+    def field_cost(self, field_node, parent_type, variables, visited_fragments):
+        """Return the cost of a field and its children"""
+        name = field_node.name.value
+        if name.startswith('__') or field_node.selection_set is None:
+            return 0
+
+        field = None
+        if isinstance(parent_type, (GraphQLObjectType, GraphQLInterfaceType)):
+            field = parent_type.fields.get(name)
+
+        if field is None:
+            return 1
+
+        field_type = get_nullable_type(field.type)
+        named_type = get_named_type(field.type)
+        multiplier = 1
+
+        if is_connection_type(named_type):
+            multiplier = self.page_size(field_node, variables)
+        elif isinstance(field_type, GraphQLList) and not is_connection_type(parent_type):
+            multiplier = settings.QUERY_COST_LIST_SIZE
+
+        children_cost = self.selection_set_cost(field_node.selection_set, named_type, variables, visited_fragments)
+        return multiplier * (1 + children_cost)
+
+    def page_size(self, field_node, variables):
+        """Return the number of items a connection field may return"""
+        max_limit = graphene_settings.RELAY_CONNECTION_MAX_LIMIT
+
+        for argument in field_node.arguments or []:
+            if argument.name.value not in PAGINATION_ARGUMENTS:
+                continue
+
+            value = argument.value
+            if isinstance(value, Variable):
+                value = variables.get(value.name.value)
+            elif isinstance(value, IntValue):
+                value = int(value.value)
+            else:
+                value = None
+
+            if isinstance(value, int) and value >= 0:
+                return min(value, max_limit) if max_limit else value
+
+        return max_limit or settings.QUERY_COST_LIST_SIZE
+
+
+def measure_cost(schema, document_ast, variables=None, operation_name=None):
+    """
+    Return the estimated cost of the operation of a document that will be executed
+    :param schema: GraphQL schema
+    :param document_ast: parsed document
+    :param variables: operation variables
+    :param operation_name: name of the operation to execute
+    :return: cost or None if the operation can not be determined
+    :raise QueryCostUnavailable: if the analysis fails, so a broken analyzer rejects operations instead of letting
+    them run without a limit
+    """
+    try:
+        analyzer = QueryCostAnalyzer(schema, document_ast, variables)
+        operation = analyzer.get_operation(operation_name)
+        if operation is None:
+            return None
+
+        return analyzer.operation_cost(operation)
+    except GraphQLError:
+        raise
+    except Exception:
+        logger.exception('Could not measure the cost of the operation %s', operation_name)
+        raise QueryCostUnavailable()
@@ -0,0 +1,55 @@
+"""
+Short-lived cache of queryset counts, invalidated with the response cache tags of the tables they read
+"""
+import json
+
+from django.conf import settings
+from django.db import connections
+
+from api.utils.query_cache import QueryCache
+
+
+def can_estimate_count(queryset):
+    """Check if the database of a queryset gives row estimates"""
+    return connections[queryset.db].vendor == 'mysql'
+
+
+def estimate_count(queryset):
+    """
+    Return the number of rows the database optimizer expects a queryset to return
+    :return: estimate or None when the database gives none
+    """
+    try:
+        plan = json.loads(queryset.order_by().explain(format='json'))
+    except ValueError:
+        return None
+
+    block = plan.get('query_block', {})
+    tables = block.get('nested_loop') or [block]
+    rows = tables[-1].get('table', {}).get('rows_produced_per_join')
+    return int(rows) if rows is not None else None
+
+
+class CountCache(QueryCache):
+    """Cache the counts of querysets, keyed by the SQL of the counted queryset without its ordering"""
+
+    def __init__(self, timeout=None):
+        super(CountCache, self).__init__('count', timeout or settings.CONNECTION_COUNT_CACHE_TIMEOUT)
+
+    def count(self, queryset, estimated=False):
+        """
+        Return the number of rows of a queryset
+        :param queryset: the queryset
+        :param estimated: return the estimate of the database optimizer when it has one
+        """
+        queryset = queryset.order_by()
+        estimated = estimated and can_estimate_count(queryset)
+
+        def compute():
+            count = estimate_count(queryset) if estimated else None
+            return queryset.count() if count is None else count
+
+        return self.get_or_set(queryset, compute, key_parts=(estimated,))
+
+
+COUNT_CACHE = CountCache()
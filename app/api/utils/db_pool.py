@@ -0,0 +1,192 @@
+"""
+Per-worker database connection pools, so requests reuse open connections instead of connecting each time.
+The pools only use threading primitives, which eventlet patches into green ones.
+"""
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+from api.utils.metrics import METRICS
+
+_pools = {}  # pylint: disable=C0103
+_pools_lock = threading.Lock()  # pylint: disable=C0103
+
+
+class PoolTimeout(Exception):
+    """No connection was released before the checkout timeout"""
+
+
+class ConnectionPool:
+    """
+    Bounded pool of open connections.
+    Up to `size` connections are kept open. Under load up to `max_overflow` extra connections are opened and closed
+    once released. When every connection is in use, checkouts wait up to `timeout` seconds.
+    Connections older than `max_lifetime` are replaced, and connections idle for `check_after` seconds are
+    checked before being reused.
+    """
+
+    def __init__(self, name, size, max_overflow, timeout, max_lifetime, check_after):  # pylint: disable=R0913
+        self.name = name
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.check_after = check_after
+        # idle connections as (connection, created time, release time), the last released at the right
+        self.idle = deque()
+        self.created = {}
+        self.opened = 0
+        self.in_use = 0
+        self.timeouts = 0
+        self.condition = threading.Condition()
+
+    def checkout(self, connect, check):
+        """
+        Return an idle connection, or a new one while the pool is not full
+        :param connect: function opening a connection
+        :param check: function returning if a connection still works
+        :return: (connection, True when it was reused)
+        :raise PoolTimeout: if every connection is still in use after `timeout` seconds
+        """
+        started = time.monotonic()
+        deadline = started + self.timeout
+
+        try:
+            with self.condition:
+                while not self.idle and self.opened >= self.size + self.max_overflow:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        raise PoolTimeout('No {name} database connection was released in {timeout} seconds'.format(
+                            name=self.name, timeout=self.timeout))
+                    self.condition.wait(remaining)
+
+                entry = self.idle.pop() if self.idle else None
+                if entry is None:
+                    self.opened += 1
+                self.in_use += 1
+        finally:
+            METRICS.observe('db_pool_wait_ms', (time.monotonic() - started) * 1000, database=self.name)
+
+        if entry is not None:
+            connection, created, released = entry
+            now = time.monotonic()
+            if now - created < self.max_lifetime and (now - released < self.check_after or check(connection)):
+                return connection, True
+            self.close(connection)
+
+        try:
+            connection = connect()
+        except Exception:
+            with self.condition:
+                self.opened -= 1
+                self.in_use -= 1
+                self.condition.notify()
+            raise
+
+        self.created[id(connection)] = time.monotonic()
+        return connection, False
+
+    def release(self, connection, reusable=True, checked=True):
+        """
+        Give a connection back to the pool
+        :param connection: connection returned by `checkout`
+        :param reusable: False to close the connection, when it is left in a transaction
+        :param checked: False to check the connection before it is reused, after an error
+        """
+        now = time.monotonic()
+        created = self.created.get(id(connection), now)
+
+        with self.condition:
+            self.in_use -= 1
+            keep = reusable and self.opened <= self.size and now - created < self.max_lifetime
+            if keep:
+                self.idle.append((connection, created, now if checked else float('-inf')))
+            else:
+                self.opened -= 1
+            self.condition.notify()
+
+        if not keep:
+            self.close(connection)
+
+    def close(self, connection):
+        """Close a connection that leaves the pool, ignoring the errors of broken ones"""
+        self.created.pop(id(connection), None)
+        try:
+            connection.close()
+        except Exception:  # pylint: disable=W0703
+            pass
+
+    def stats(self):
+        """Return the current counters of the pool"""
+        with self.condition:
+            return {'opened': self.opened, 'in_use': self.in_use, 'idle': len(self.idle), 'timeouts': self.timeouts}
+
+
+def get_pool(alias):
+    """Return the connection pool of a database alias, created on first use"""
+    with _pools_lock:
+        pool = _pools.get(alias)
+        if pool is None:
+            pool = _pools[alias] = ConnectionPool(
+                alias, settings.DATABASE_POOL_SIZE, settings.DATABASE_POOL_MAX_OVERFLOW, settings.DATABASE_POOL_TIMEOUT,
+                settings.DATABASE_POOL_MAX_LIFETIME, settings.DATABASE_POOL_CHECK_AFTER)
+    return pool
+
+
+def pool_metrics():
+    """Export the counters of the connection pools"""
+    with _pools_lock:
+        stats = {alias: pool.stats() for alias, pool in _pools.items()}
+
+    metrics = [
+        ('db_pool_connections', 'Open connections of the pool', 'opened'),
+        ('db_pool_in_use', 'Connections of the pool in use', 'in_use'),
+        ('db_pool_idle', 'Idle connections of the pool', 'idle'),
+        ('db_pool_timeouts', 'Checkouts that timed out waiting for a connection', 'timeouts'),
+    ]
+    return [(name, description, values[key], {'database': alias})
+            for name, description, key in metrics for alias, values in sorted(stats.items())]
+
+
+METRICS.histogram('db_pool_wait_ms', 'Time waited for a pooled database connection in milliseconds')
+METRICS.register_collector(pool_metrics, counters=('db_pool_timeouts',))
+
+
+class PooledDatabaseWrapperMixin:
+    """
+    Mixin of Django database wrappers taking their connections from the pool of their alias.
+    Closing the wrapper, at the end of each request, gives its connection back to the pool.
+    """
+    reused_connection = False
+
+    def get_new_connection(self, conn_params):
+        """Check out a connection of the pool"""
+        connect = super(PooledDatabaseWrapperMixin, self).get_new_connection
+        try:
+            connection, self.reused_connection = get_pool(self.alias).checkout(
+                lambda: connect(conn_params), self.check_connection)
+        except PoolTimeout as error:
+            raise self.Database.OperationalError(str(error))
+        return connection
+
+    def init_connection_state(self):
+        """Set the session state of new connections only, reused ones keep it"""
+        if not self.reused_connection:
+            super(PooledDatabaseWrapperMixin, self).init_connection_state()
+
+    def check_connection(self, connection):
+        """Check that a connection still works before reusing it"""
+        try:
+            connection.cursor().execute('SELECT 1')
+        except self.Database.Error:
+            return False
+        return True
+
+    def _close(self):
+        """Give the connection back to the pool, closing it if it is left in a transaction"""
+        if self.connection is not None:
+            get_pool(self.alias).release(self.connection, reusable=self.autocommit and not self.in_atomic_block,
+                                         checked=not self.errors_occurred)
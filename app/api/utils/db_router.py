@@ -0,0 +1,114 @@
+"""
+Database router sending the query operations of the GraphQL views to read replicas
+"""
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)  # pylint: disable=C0103
+
+PRIMARY_DATABASE = DEFAULT_DB_ALIAS
+
+# database of the operation executed by the current thread (green thread under eventlet)
+_state = threading.local()  # pylint: disable=C0103
+# time until which each replica that failed is skipped
+_replicas_down_until = {}  # pylint: disable=C0103
+
+
+def get_healthy_replica():
+    """
+    Return a replica accepting connections, trying them in random order. Replicas that fail are skipped for
+    DATABASE_REPLICA_RETRY_SECONDS.
+    :return: database alias or None when every replica is down
+    """
+    now = time.time()
+    replicas = [alias for alias in settings.DATABASE_REPLICAS if _replicas_down_until.get(alias, 0) <= now]
+    random.shuffle(replicas)
+
+    for alias in replicas:
+        try:
+            connections[alias].ensure_connection()
+            return alias
+        except DatabaseError:
+            _replicas_down_until[alias] = now + settings.DATABASE_REPLICA_RETRY_SECONDS
+            logger.warning('Database replica %s is down, reading from the primary', alias, exc_info=True)
+
+    return None
+
+
+def is_pinned_to_primary(request):
+    """Check if a request comes from a client that wrote recently, whose writes may not have reached the replicas"""
+    return settings.DATABASE_PRIMARY_COOKIE in request.COOKIES
+
+
+def may_read_stale(last_modified):
+    """
+    Check if the replicas may still miss some change
+    :param last_modified: timestamp of the last change of the data read
+    """
+    return bool(settings.DATABASE_REPLICAS) and last_modified is not None and \
+        time.time() - last_modified < settings.DATABASE_REPLICA_LAG_SECONDS
+
+
+def is_reading_replica():
+    """Check if the operation of the current thread reads from a replica"""
+    return getattr(_state, 'alias', PRIMARY_DATABASE) != PRIMARY_DATABASE
+
+
+@contextmanager
+def use_database(alias, written=None):
+    """
+    Route the reads of the current thread to a database
+    :param alias: database alias
+    :param written: dict whose `written` key is set when a write is routed
+    """
+    previous = getattr(_state, 'alias', None), getattr(_state, 'written', None)
+    _state.alias, _state.written = alias, written
+    try:
+        yield
+    finally:
+        _state.alias, _state.written = previous
+
+
+def route_operation(request, operation_type):
+    """
+    Return the routing context of a GraphQL operation: queries read from a healthy replica, unless the client wrote
+    recently, and mutations read and write on the primary
+    :param request: request of the operation, with the `database_state` dict of the view
+    :param operation_type: 'query', 'mutation' or None
+    """
+    alias = None
+    if operation_type == 'query' and settings.DATABASE_REPLICAS and not is_pinned_to_primary(request):
+        alias = get_healthy_replica()
+
+    return use_database(alias or PRIMARY_DATABASE, getattr(request, 'database_state', None))
+
+
+class ReplicaRouter:
+    """
+    Send the reads of the routed operations to their database and every write to the primary.
+    Reads outside the GraphQL views (commands, admin, migrations) are not routed and use the primary.
+    """
+
+    @staticmethod
+    def db_for_read(model, **hints):  # pylint: disable=W0613
+        """Return the database of the operation of the current thread"""
+        return getattr(_state, 'alias', None)
+
+    @staticmethod
+    def db_for_write(model, **hints):  # pylint: disable=W0613
+        """Return the primary, remembering that the operation wrote"""
+        written = getattr(_state, 'written', None)
+        if written is not None:
+            written['written'] = True
+        return PRIMARY_DATABASE
+
+    @staticmethod
+    def allow_relation(obj1, obj2, **hints):  # pylint: disable=W0613
+        """Replicas hold the same rows as the primary"""
+        return True
@@ -13,3 +13,44 @@ class BaseError(GraphQLError):
 
     def __init__(self, nodes=None, stack=None, source=None, positions=None, locations=None):
         super(BaseError, self).__init__(self.__class__.message, nodes, stack, source, positions, locations)
+
+
+class PersistedQueryNotFound(BaseError):
+    """
+    Exception for an unknown persisted query hash. The message follows the automatic persisted queries protocol,
+    the client must send the query again together with its hash to register it.
+    """
+    message = 'PersistedQueryNotFound'
+    code = 'persisted-query-not-found'
+
+
+class PersistedQueryHashMismatch(BaseError):
+    """
+    Exception for a persisted query registration whose hash is not the sha256 of the query
+    """
+    message = _('Provided sha256 hash does not match the query.')
+    code = 'persisted-query-hash-mismatch'
+
+
+class QueryCostExceeded(BaseError):
+    """
+    Exception for an operation whose estimated cost is over the `MAX_QUERY_COST` budget
+    """
+    message = _('Query cost exceeds the maximum allowed.')
+    code = 'query-cost-exceeded'
+
+
+class QueryCostUnavailable(BaseError):
+    """
+    Exception for an operation whose cost could not be measured, which is rejected rather than run without a limit
+    """
+    message = _('Query cost could not be measured.')
+    code = 'query-cost-unavailable'
+
+
+class InvalidCursor(BaseError):
+    """
+    Exception for a pagination cursor that does not belong to the current pagination mode or sort
+    """
+    message = _('Invalid cursor for the current sort.')
+    code = 'invalid-cursor'
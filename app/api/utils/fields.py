@@ -0,0 +1,13 @@
+"""
+Model fields shared by the apps
+"""
+from django_mysql.models import EnumField as MySQLEnumField
+
+
+class EnumField(MySQLEnumField):
+    """ENUM column on MySQL, and a varchar column on the other databases, like the SQLite databases of the tests"""
+
+    def db_type(self, connection):
+        if connection.vendor == 'mysql':
+            return super(EnumField, self).db_type(connection)
+        return 'varchar({length})'.format(length=max(len(str(value)) for value, _ in self.flatchoices))
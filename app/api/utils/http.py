@@ -0,0 +1,118 @@
+"""
+HTTP helpers: conditional requests and content encoding negotiation
+"""
+import gzip
+
+from django.utils.http import parse_etags, parse_http_date_safe
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None  # pylint: disable=C0103
+
+IDENTITY = 'identity'
+GZIP = 'gzip'
+BROTLI = 'br'
+
+# Encodings offered to clients, by preference
+ENCODINGS = (BROTLI, GZIP) if brotli is not None else (GZIP,)
+
+
+def get_matching_etag(request, etags):
+    """
+    Return the ETag of a response that matches the If-None-Match header of a request
+    :param request: the request
+    :param etags: list with the ETags of the response
+    :return: the matching ETag, '*' or None
+    """
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if not if_none_match:
+        return None
+
+    requested = [value[2:] if value.startswith('W/') else value for value in parse_etags(if_none_match)]
+    if '*' in requested:
+        return '*'
+    return next((etag for etag in etags if etag in requested), None)
+
+
+def is_not_modified(request, etag, last_modified=None):
+    """
+    Check the conditional headers of a request against the validators of its response.
+    If-Modified-Since is only used when the request has no If-None-Match.
+    :param request: the request
+    :param etag: ETag of the response, or list of the ETags of its encodings
+    :param last_modified: timestamp of the last modification of the response
+    """
+    if request.META.get('HTTP_IF_NONE_MATCH'):
+        return get_matching_etag(request, etag if isinstance(etag, (list, tuple)) else [etag]) is not None
+
+    if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return if_modified_since is not None and last_modified is not None and int(last_modified) <= if_modified_since
+
+
+def get_encoded_etag(etag, encoding):
+    """Return the ETag of the representation of a response in an encoding"""
+    if encoding == IDENTITY:
+        return etag
+    return '{etag}-{encoding}"'.format(etag=etag[:-1], encoding=encoding)
+
+
+def get_etag_variants(etag):
+    """Return the ETags of every encoding of a response"""
+    return [etag] + [get_encoded_etag(etag, encoding) for encoding in ENCODINGS]
+
+
+def get_accepted_encodings(request):
+    """
+    Parse the Accept-Encoding header of a request
+    :return: dict with the quality of each accepted encoding
+    """
+    encodings = {}
+    for item in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        encoding, _, params = item.strip().partition(';')
+        if not encoding:
+            continue
+
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        encodings[encoding.strip().lower()] = quality
+
+    return encodings
+
+
+def choose_encoding(request, encodings=ENCODINGS):
+    """
+    Return the preferred encoding accepted by the client among some encodings
+    :param request: the request
+    :param encodings: available encodings, by preference
+    :return: an encoding, or 'identity'
+    """
+    accepted = get_accepted_encodings(request)
+
+    best, best_quality = IDENTITY, 0.0
+    for encoding in encodings:
+        quality = accepted.get(encoding, accepted.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+
+    return best
+
+
+def compress(content, encoding, level=None):
+    """
+    Compress content with an encoding
+    :param content: bytes
+    :param encoding: 'gzip' or 'br'
+    :param level: compression level, the highest by default
+    :return: compressed bytes
+    """
+    if encoding == GZIP:
+        return gzip.compress(content, compresslevel=9 if level is None else level)
+    if encoding == BROTLI:
+        return brotli.compress(content, quality=11 if level is None else level)
+    return content
@@ -0,0 +1,119 @@
+"""
+Introspection results of the schemas, encoded and compressed once per process
+"""
+import json
+import os
+import threading
+from hashlib import sha256
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from graphene_django.settings import graphene_settings
+
+from api.utils.http import ENCODINGS, IDENTITY, choose_encoding, compress, get_encoded_etag, get_matching_etag
+
+FILE_EXTENSIONS = {'gzip': '.gz', 'br': '.br'}
+
+
+class IntrospectionResult:
+    """Encoded introspection result of a schema with its compressed variants"""
+
+    def __init__(self, contents):
+        """
+        :param contents: dict with the content of each encoding, 'identity' at least
+        """
+        self.contents = contents
+        etag = '"{digest}"'.format(digest=sha256(contents[IDENTITY]).hexdigest())
+        self.etags = {encoding: get_encoded_etag(etag, encoding) for encoding in contents}
+
+    @classmethod
+    def from_schema(cls, schema):
+        """Introspect a schema and compress the result"""
+        content = json.dumps({'data': schema.introspect()}, separators=(',', ':')).encode('utf-8')
+        contents = {IDENTITY: content}
+        for encoding in ENCODINGS:
+            contents[encoding] = compress(content, encoding)
+        return cls(contents)
+
+    @classmethod
+    def from_files(cls, path):
+        """
+        Load a result written by `write`
+        :param path: path of the uncompressed result
+        :return: IntrospectionResult or None if it was not written
+        """
+        if not os.path.exists(path):
+            return None
+
+        contents = {}
+        for encoding, extension in [(IDENTITY, '')] + list(FILE_EXTENSIONS.items()):
+            if os.path.exists(path + extension):
+                with open(path + extension, 'rb') as file:
+                    contents[encoding] = file.read()
+        return cls(contents)
+
+    def write(self, path):
+        """
+        Write the result and its compressed variants next to it
+        :param path: path of the uncompressed result
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        for encoding, content in self.contents.items():
+            with open(path + FILE_EXTENSIONS.get(encoding, ''), 'wb') as file:
+                file.write(content)
+
+    def get_response(self, request):
+        """Return the result in the best encoding accepted by the client, or a 304 if the client has it"""
+        matching_etag = get_matching_etag(request, list(self.etags.values()))
+        if matching_etag is not None:
+            response = HttpResponseNotModified()
+            response['ETag'] = matching_etag if matching_etag != '*' else self.etags[IDENTITY]
+        else:
+            encoding = choose_encoding(request, [encoding for encoding in ENCODINGS if encoding in self.contents])
+            response = HttpResponse(self.contents[encoding], content_type='application/json')
+            response['ETag'] = self.etags[encoding]
+            if encoding != IDENTITY:
+                response['Content-Encoding'] = encoding
+
+        response['Vary'] = 'Accept-Encoding'
+        return response
+
+
+def get_output_path(name):
+    """Return the path of the prebuilt result of a schema, next to GRAPHENE['SCHEMA_OUTPUT']"""
+    path = graphene_settings.SCHEMA_OUTPUT
+    if name == 'public':
+        return path
+
+    root, extension = os.path.splitext(path)
+    return '{root}_{name}{extension}'.format(root=root, name=name, extension=extension)
+
+
+_results = {}  # pylint: disable=C0103
+_results_lock = threading.Lock()  # pylint: disable=C0103
+
+
+def get_introspection(name, schema):
+    """
+    Return the introspection result of a schema, loaded from the prebuilt files when
+    GRAPHQL_INTROSPECTION_PREBUILT is set, or computed on first use
+    :param name: name of the schema, 'public' or 'admin'
+    :param schema: the schema
+    """
+    result = _results.get(name)
+    if result is not None:
+        return result
+
+    with _results_lock:
+        result = _results.get(name)
+        if result is None:
+            if settings.GRAPHQL_INTROSPECTION_PREBUILT:
+                result = IntrospectionResult.from_files(get_output_path(name))
+            if result is None:
+                result = IntrospectionResult.from_schema(schema)
+            _results[name] = result
+
+    return result
@@ -0,0 +1,84 @@
+"""
+Helpers to batch database lookups with DataLoaders
+"""
+from abc import ABCMeta, abstractmethod
+from collections import defaultdict
+
+from promise import Promise
+from promise.dataloader import DataLoader
+
+
+def get_loader(info, loader_class):
+    """
+    Return the instance of a loader class registered in the request.
+    Loaders live in `info.context` so they batch and cache lookups of a single request only.
+    :param info: Schema info
+    :param loader_class: DataLoader subclass
+    :return: loader instance
+    """
+    context = info.context
+    loaders = getattr(context, 'loaders', None)
+
+    if loaders is None:
+        loaders = {}
+        setattr(context, 'loaders', loaders)
+
+    if loader_class not in loaders:
+        loaders[loader_class] = loader_class()
+
+    return loaders[loader_class]
+
+
+def get_prefetched(instance, name):
+    """
+    Return the instances prefetched with `prefetch_related` for a relation, if any.
+    :param instance: model instance
+    :param name: prefetch cache name of the relation, e.g. `image_set`
+    :return: list of related instances or None
+    """
+    cache = getattr(instance, '_prefetched_objects_cache', {})
+    if name not in cache:
+        return None
+
+    return list(cache[name])
+
+
+class ModelLoader(DataLoader):
+    """
+    Load model instances by primary key.
+    Subclasses must define the `model` attribute.
+    """
+    model = None
+
+    def batch_load_fn(self, keys):  # pylint: disable=E0202
+        instances = self.model.objects.in_bulk(keys)
+        return Promise.resolve([instances.get(key) for key in keys])
+
+
+class RelatedListLoader(DataLoader, metaclass=ABCMeta):
+    """
+    Load a list of related instances grouped by a foreign key.
+    Subclasses must define `get_queryset` and the `key_field` attribute.
+    """
+    key_field = None
+
+    @abstractmethod
+    def get_queryset(self, keys):
+        """
+        Return the queryset with the related instances of all keys
+        :param keys: foreign key values
+        """
+
+    def get_value(self, instance):
+        """
+        Return the value stored in the list for an instance
+        :param instance: related instance
+        """
+        return instance
+
+    def batch_load_fn(self, keys):  # pylint: disable=E0202
+        grouped = defaultdict(list)
+        for instance in self.get_queryset(keys):
+            grouped[getattr(instance, self.key_field)].append(self.get_value(instance))
+
+        return Promise.resolve([grouped.get(key, []) for key in keys])
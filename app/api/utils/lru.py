@@ -0,0 +1,70 @@
+"""
+In-process LRU cache shared by the helpers that keep per-worker caches
+"""
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Bounded, thread safe, least recently used cache with hit/miss counters
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Return the value of a key and mark it as recently used
+        :param key: cache key
+        :param default: value returned when the key is not cached
+        """
+        with self.lock:
+            if key not in self.items:
+                self.misses += 1
+                return default
+
+            self.items.move_to_end(key)
+            self.hits += 1
+            return self.items[key]
+
+    def set(self, key, value):
+        """
+        Store a value and evict the least recently used keys over `max_size`
+        :param key: cache key
+        :param value: value to store
+        """
+        with self.lock:
+            self.items[key] = value
+            self.items.move_to_end(key)
+            while len(self.items) > self.max_size:
+                self.items.popitem(last=False)
+
+    def delete(self, key):
+        """
+        Remove a key from the cache
+        :param key: cache key
+        """
+        with self.lock:
+            self.items.pop(key, None)
+
+    def clear(self):
+        """Remove every key and reset the counters"""
+        with self.lock:
+            self.items.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Return the cache counters"""
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self.items),
+                'max_size': self.max_size,
+            }
@@ -0,0 +1,130 @@
+"""
+In-process metrics of the GraphQL endpoints, exported in the Prometheus text format.
+Each gunicorn worker keeps its own metrics.
+"""
+import threading
+from bisect import bisect_left
+
+DURATION_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class Histogram:
+    """Cumulative histogram with fixed upper bounds"""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0
+        self.count = 0
+
+    def observe(self, value):
+        """Add a value to the histogram"""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def samples(self):
+        """Return the cumulative (upper bound, count) pairs, ending with +Inf"""
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            yield bound, cumulative
+
+
+class MetricsRegistry:
+    """Registry of labeled histograms and of collectors of current values"""
+
+    def __init__(self):
+        self.histograms = {}
+        self.descriptions = {}
+        self.collectors = []
+        self.counters = set()
+        self.lock = threading.Lock()
+
+    def histogram(self, name, description, buckets=DURATION_BUCKETS):
+        """
+        Declare a histogram
+        :param name: metric name
+        :param description: help text
+        :param buckets: upper bounds
+        """
+        with self.lock:
+            self.histograms.setdefault(name, ({}, buckets))
+            self.descriptions[name] = description
+
+    def observe(self, name, value, **labels):
+        """
+        Add a value to a declared histogram
+        :param name: metric name
+        :param value: observed value
+        :param labels: metric labels
+        """
+        series, buckets = self.histograms[name]
+        key = tuple(sorted(labels.items()))
+
+        with self.lock:
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def register_collector(self, collector, counters=()):
+        """
+        Register a function returning a list of (name, description, value) or (name, description, value, labels)
+        to export with the histograms. The values of a name must be listed together.
+        :param collector: callable without arguments
+        :param counters: names of the values that only increase, exported as counters instead of gauges
+        """
+        self.collectors.append(collector)
+        self.counters.update(counters)
+
+    @staticmethod
+    def format_labels(labels, **extra):
+        """Return the Prometheus representation of labels"""
+        items = list(labels) + sorted(extra.items())
+        if not items:
+            return ''
+
+        return '{%s}' % ','.join('{key}="{value}"'.format(
+            key=key, value=str(value).replace('\\', '\\\\').replace('"', '\\"')) for key, value in items)
+
+    def render(self):
+        """Return every metric in the Prometheus text format"""
+        lines = []
+
+        with self.lock:
+            for name, (series, _) in sorted(self.histograms.items()):
+                lines.append('# HELP {name} {help}'.format(name=name, help=self.descriptions[name]))
+                lines.append('# TYPE {name} histogram'.format(name=name))
+                for labels, histogram in sorted(series.items()):
+                    for bound, count in histogram.samples():
+                        lines.append('{name}_bucket{labels} {count}'.format(
+                            name=name, labels=self.format_labels(labels, le=bound), count=count))
+                    lines.append('{name}_sum{labels} {total}'.format(
+                        name=name, labels=self.format_labels(labels), total=histogram.total))
+                    lines.append('{name}_count{labels} {count}'.format(
+                        name=name, labels=self.format_labels(labels), count=histogram.count))
+
+        described = set()
+        for collector in self.collectors:
+            for metric in collector():
+                name, description, value = metric[:3]
+                if name not in described:
+                    lines.append('# HELP {name} {help}'.format(name=name, help=description))
+                    lines.append('# TYPE {name} {type}'.format(
+                        name=name, type='counter' if name in self.counters else 'gauge'))
+                    described.add(name)
+
+                labels = sorted(metric[3].items()) if len(metric) > 3 else ()
+                lines.append('{name}{labels} {value}'.format(name=name, labels=self.format_labels(labels), value=value))
+
+        return '\n'.join(lines) + '\n'
+
+
+METRICS = MetricsRegistry()
+
+METRICS.histogram('graphql_resolver_duration_ms', 'Resolver latency by field in milliseconds')
+METRICS.histogram('graphql_operation_duration_ms', 'Operation execution time in milliseconds')
+METRICS.histogram('graphql_operation_sql_queries', 'SQL queries run by each operation', buckets=COUNT_BUCKETS)
+METRICS.histogram('graphql_operation_sql_duration_ms', 'SQL time of each operation in milliseconds')
@@ -0,0 +1,97 @@
+"""
+Graphene middlewares to instrument the execution of GraphQL operations
+"""
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+from graphene_django.debug import DjangoDebugMiddleware
+from graphql.language.ast import Field as FieldNode
+from graphql.type.definition import GraphQLEnumType, GraphQLScalarType, get_named_type
+from promise import Promise
+
+from api.utils.metrics import METRICS
+
+
+class SQLTracker:
+    """
+    Context manager that counts the SQL queries run in the current thread and their total time
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.stack = None
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+    def __enter__(self):
+        self.stack = ExitStack()
+        for connection in connections.all():
+            self.stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        return self.stack.__exit__(*exc_info)
+
+
+class InstrumentationMiddleware:
+    """
+    Record the latency of every field that resolves an object or a list. Leaf fields are not timed.
+    When the context carries a `graphql_trace` list, the path and duration of each timed field is appended to it.
+    """
+
+    def resolve(self, next, root, info, **args):  # pylint: disable=W0622
+        named_type = get_named_type(info.return_type)
+        if isinstance(named_type, (GraphQLScalarType, GraphQLEnumType)):
+            return next(root, info, **args)
+
+        started = time.perf_counter()
+        result = next(root, info, **args)
+
+        if isinstance(result, Promise) and result.is_pending:
+            def on_resolve(value):
+                self.record(info, started)
+                return value
+
+            return result.then(on_resolve)
+
+        self.record(info, started)
+        return result
+
+    @staticmethod
+    def record(info, started):
+        """Record the duration of a field"""
+        duration = (time.perf_counter() - started) * 1000
+        METRICS.observe('graphql_resolver_duration_ms', duration,
+                        field='{type}.{field}'.format(type=info.parent_type.name, field=info.field_name))
+
+        trace = getattr(info.context, 'graphql_trace', None)
+        if trace is not None:
+            trace.append(('.'.join(str(key) for key in info.path or ()), round(duration, 3)))
+
+
+class SelectedDjangoDebugMiddleware(DjangoDebugMiddleware):
+    """
+    Capture SQL with DjangoDebugMiddleware only for the operations that select the `_debug` field
+    """
+
+    def resolve(self, next, root, info, **args):  # pylint: disable=W0622
+        context = info.context
+        if getattr(context, 'debug_operation', None) is not info.operation:
+            context.debug_operation = info.operation
+            context.debug_selected = any(
+                isinstance(selection, FieldNode) and selection.name.value == '_debug'
+                for selection in info.operation.selection_set.selections
+            )
+
+        if not context.debug_selected:
+            return next(root, info, **args)
+
+        return super(SelectedDjangoDebugMiddleware, self).resolve(next, root, info, **args)
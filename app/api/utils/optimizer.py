@@ -0,0 +1,104 @@
+"""
+Helpers to optimize querysets from the GraphQL selection set
+"""
+from graphql.language.ast import Field as FieldNode, FragmentSpread, InlineFragment
+
+
+def collect_fields(info, selection_set, fields=None):
+    """
+    Collect the fields of a selection set, expanding fragments.
+    :param info: Schema info
+    :param selection_set: AST selection set
+    :param fields: dict to fill, keyed by field name
+    :return: dict with the list of AST field nodes selected for each field name
+    """
+    if fields is None:
+        fields = {}
+
+    if selection_set is None:
+        return fields
+
+    for selection in selection_set.selections:
+        if isinstance(selection, FieldNode):
+            fields.setdefault(selection.name.value, []).append(selection)
+        elif isinstance(selection, FragmentSpread):
+            fragment = info.fragments.get(selection.name.value)
+            if fragment is not None:
+                collect_fields(info, fragment.selection_set, fields)
+        elif isinstance(selection, InlineFragment):
+            collect_fields(info, selection.selection_set, fields)
+
+    return fields
+
+
+def get_selected_fields(info, path=()):
+    """
+    Return the fields selected under a path of the current field.
+    :param info: Schema info
+    :param path: field names to follow from the current field, e.g. ('edges', 'node')
+    :return: dict with the list of AST field nodes selected for each field name
+    """
+    nodes = info.field_asts
+    for name in path:
+        fields = {}
+        for node in nodes:
+            collect_fields(info, node.selection_set, fields)
+        nodes = fields.get(name, [])
+
+    fields = {}
+    for node in nodes:
+        collect_fields(info, node.selection_set, fields)
+    return fields
+
+
+class QuerysetOptimizer:
+    """
+    Declarative queryset optimizer.
+    Subclasses map the GraphQL field names of a type to the model columns they read (`only_fields`),
+    and to the `select_related` and `prefetch_related` lookups they need.
+    """
+    node_path = ()
+    required_fields = ('id',)
+    only_fields = {}
+    select_related = {}
+    prefetch_related = {}
+
+    @classmethod
+    def optimize(cls, queryset, info):
+        """
+        Return the queryset with the lookups needed by the selected fields
+        :param queryset: Current queryset
+        :param info: Schema info
+        :type queryset: django.db.models.QuerySet
+        :return: optimized queryset
+        """
+        selected = get_selected_fields(info, cls.node_path)
+
+        only = list(cls.required_fields)
+        defer_columns = True
+        select_related = []
+        prefetch_related = []
+
+        for name in selected:
+            if name.startswith('__'):
+                continue
+
+            if name not in cls.only_fields:
+                # An unknown field could read any column, so nothing is deferred
+                defer_columns = False
+            else:
+                only.extend(column for column in cls.only_fields[name] if column not in only)
+
+            select_related.extend(cls.select_related.get(name, ()))
+            prefetch_related.extend(cls.prefetch_related.get(name, ()))
+
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+
+        if defer_columns and selected:
+            queryset = queryset.only(*only)
+
+        return queryset
@@ -0,0 +1,277 @@
+"""
+Keyset pagination and counts on demand for Django connection fields
+"""
+import base64
+import json
+import operator
+from functools import reduce
+
+import graphene
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Q
+from graphene.relay import Connection, PageInfo
+from graphene_django.filter import DjangoFilterConnectionField
+from graphene_django.utils import maybe_queryset
+from graphql_relay.connection.arrayconnection import get_offset_with_default, offset_to_cursor
+
+from api.utils.counts import COUNT_CACHE
+from api.utils.exceptions import InvalidCursor
+
+KEYSET_CURSOR_PREFIX = 'keyset'
+# Argument set by the connection field when a filter argument was given
+FILTERED_ARGUMENT = '_filtered'
+
+
+def get_sort_keys(queryset):
+    """
+    Return the sort keys of a queryset, ended by the primary key so they identify each row
+    :return: list of (field name, descending)
+    """
+    ordering = queryset.query.order_by or queryset.query.get_meta().ordering or ()
+
+    keys = []
+    for item in ordering:
+        if not isinstance(item, str) or item == '?':
+            raise InvalidCursor()
+        name = item.lstrip('-')
+        keys.append(('id' if name == 'pk' else name, item.startswith('-')))
+
+    if 'id' not in [name for name, _ in keys]:
+        keys.append(('id', False))
+    return keys
+
+
+def after_query(name, descending, value):
+    """
+    Return the condition of the rows placed after a value of a sort key. NULLs sort before every value,
+    as MySQL and SQLite do.
+    :return: Q or None when no row can be placed after the value
+    """
+    if descending:
+        if value is None:
+            return None
+        return Q(**{'{name}__lt'.format(name=name): value}) | Q(**{'{name}__isnull'.format(name=name): True})
+
+    if value is None:
+        return Q(**{'{name}__isnull'.format(name=name): False})
+    return Q(**{'{name}__gt'.format(name=name): value})
+
+
+def keyset_query(keys, values):
+    """
+    Return the condition of the rows placed after a row: (k1, k2, ...) > (v1, v2, ...) in the order of the keys
+    :param keys: list of (field name, descending)
+    :param values: values of the keys in the row
+    """
+    queries = []
+    equal = Q()
+
+    for (name, descending), value in zip(keys, values):
+        query = after_query(name, descending, value)
+        if query is not None:
+            queries.append(equal & query)
+
+        if value is None:
+            equal &= Q(**{'{name}__isnull'.format(name=name): True})
+        else:
+            equal &= Q(**{name: value})
+
+    return reduce(operator.or_, queries) if queries else Q(pk__in=[])
+
+
+class KeysetCursor:
+    """Cursor holding the sort key values of a row"""
+
+    def __init__(self, queryset, keys):
+        self.model = queryset.model
+        self.keys = keys
+        self.signature = ['-' + name if descending else name for name, descending in keys]
+
+    def get_field(self, name):
+        """Return the model field of a key, or None for annotations"""
+        try:
+            return self.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None
+
+    def encode(self, instance):
+        """Return the cursor of a row"""
+        values = []
+        for name, _ in self.keys:
+            value = getattr(instance, name)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+
+        data = json.dumps([KEYSET_CURSOR_PREFIX, self.signature, values], separators=(',', ':'))
+        return base64.b64encode(data.encode('utf-8')).decode('ascii')
+
+    def decode(self, cursor):
+        """
+        Return the sort key values of a cursor
+        :raise InvalidCursor: if the cursor was not built for the same sort
+        """
+        try:
+            prefix, signature, values = json.loads(base64.b64decode(cursor).decode('utf-8'))
+        except (TypeError, ValueError):
+            raise InvalidCursor()
+
+        if prefix != KEYSET_CURSOR_PREFIX or signature != self.signature or len(values) != len(self.keys):
+            raise InvalidCursor()
+
+        decoded = []
+        for (name, _), value in zip(self.keys, values):
+            field = self.get_field(name)
+            try:
+                decoded.append(field.to_python(value) if field is not None and value is not None else value)
+            except Exception:  # pylint: disable=W0703
+                raise InvalidCursor()
+        return decoded
+
+
+class CountableConnection(Connection):
+    """Connection with a `totalCount` field, counted only when it is selected"""
+
+    class Meta:
+        """Meta class"""
+        abstract = True
+
+    total_count = graphene.Int(
+        estimated=graphene.Boolean(description='Return the estimate of the database for unfiltered lists'),
+        description='Number of items of the list')
+
+    def resolve_total_count(self, info, estimated=False):
+        """Resolve total_count from the count cache"""
+        queryset = getattr(self, 'count_queryset', None)
+        if queryset is None:
+            return self.length
+        return COUNT_CACHE.count(queryset, estimated=estimated and not self.filtered)
+
+
+class KeysetFilterConnectionField(DjangoFilterConnectionField):
+    """
+    DjangoFilterConnectionField with an opt-in keyset pagination mode.
+    With `keyset: true` cursors hold the values of the sort keys of a row and pages are read with
+    `WHERE (keys) > (cursor values) ORDER BY keys LIMIT n`, so every page costs the same as the first one.
+    Neither mode counts the rows unless `totalCount` is selected or a page is read with `last`.
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('keyset', graphene.Boolean(
+            description='Paginate with cursors holding the sort values of the rows instead of offsets'))
+        super(KeysetFilterConnectionField, self).__init__(*args, **kwargs)
+
+    @classmethod
+    def resolve_queryset(cls, connection, iterable, info, args, filtering_args,  # pylint: disable=R0913
+                         filterset_class):
+        args[FILTERED_ARGUMENT] = any(args.get(name) is not None for name in filtering_args)
+        return super(KeysetFilterConnectionField, cls).resolve_queryset(
+            connection, iterable, info, args, filtering_args, filterset_class)
+
+    @classmethod
+    def resolve_connection(cls, connection, args, iterable, max_limit=None):
+        queryset = maybe_queryset(iterable)
+        if args.get('keyset'):
+            result = cls.resolve_keyset_connection(connection, args, queryset, max_limit)
+        else:
+            result = cls.resolve_offset_connection(connection, args, queryset, max_limit)
+
+        result.iterable = iterable
+        result.count_queryset = queryset
+        result.filtered = args.get(FILTERED_ARGUMENT, True)
+        return result
+
+    @classmethod
+    def resolve_offset_connection(cls, connection, args, queryset, max_limit=None):
+        """
+        Return a page of offset cursors, like DjangoConnectionField does, reading one extra row to know if there is a
+        next page instead of counting the rows. Only pages read with `last` need the count.
+        """
+        start = get_offset_with_default(args.get('after'), -1) + 1
+        if args.get('offset'):
+            start += args['offset']
+        before = args.get('before')
+        end = get_offset_with_default(before, None) if before else None
+        first = args.get('first')
+        last = args.get('last')
+
+        if last is not None:
+            count = COUNT_CACHE.count(queryset)
+            upper = min(end, count) if end is not None else count
+            end = min(upper, start + first) if first is not None else upper
+            begin = max(start, end - last)
+            nodes = list(queryset[begin:end]) if end > begin else []
+            has_next_page = first is not None and end < upper
+        else:
+            first = first if first is not None else max_limit
+            stop = start + first if first is not None else end
+            begin = start
+            if stop is None:
+                nodes = list(queryset[begin:])
+                has_next_page = False
+            elif end is not None and stop >= end:
+                nodes = list(queryset[begin:end]) if end > begin else []
+                has_next_page = False
+            else:
+                nodes = list(queryset[begin:stop + 1])
+                has_next_page = len(nodes) > stop - begin
+                nodes = nodes[:stop - begin]
+
+        edges = [connection.Edge(node=node, cursor=offset_to_cursor(begin + index)) for index, node in enumerate(nodes)]
+        page_info = PageInfo(
+            start_cursor=edges[0].cursor if edges else None,
+            end_cursor=edges[-1].cursor if edges else None,
+            has_previous_page=last is not None and begin > start,
+            has_next_page=has_next_page,
+        )
+
+        result = connection(edges=edges, page_info=page_info)
+        result.length = None
+        return result
+
+    @classmethod
+    def resolve_keyset_connection(cls, connection, args, queryset, max_limit=None):
+        """Return a page of keyset cursors"""
+        if args.get('offset') is not None:
+            raise InvalidCursor()
+
+        keys = get_sort_keys(queryset)
+        cursor = KeysetCursor(queryset, keys)
+        queryset = cls.load_keys(queryset, keys, cursor)
+
+        backwards = 'last' in args and 'first' not in args
+        limit = args.get('last' if backwards else 'first') or max_limit
+        reference = args.get('before' if backwards else 'after')
+
+        if backwards:
+            keys = [(name, not descending) for name, descending in keys]
+        queryset = queryset.order_by(*['-' + name if descending else name for name, descending in keys])
+
+        if reference:
+            queryset = queryset.filter(keyset_query(keys, cursor.decode(reference)))
+
+        nodes = list(queryset[:limit + 1] if limit is not None else queryset)
+        has_more = limit is not None and len(nodes) > limit
+        nodes = nodes[:limit] if limit is not None else nodes
+        if backwards:
+            nodes.reverse()
+
+        edges = [connection.Edge(node=node, cursor=cursor.encode(node)) for node in nodes]
+        page_info = PageInfo(
+            start_cursor=edges[0].cursor if edges else None,
+            end_cursor=edges[-1].cursor if edges else None,
+            has_previous_page=has_more if backwards else bool(reference),
+            has_next_page=bool(reference) if backwards else has_more,
+        )
+
+        result = connection(edges=edges, page_info=page_info)
+        result.length = None
+        return result
+
+    @staticmethod
+    def load_keys(queryset, keys, cursor):
+        """Make sure the sort keys are loaded when the queryset only loads some fields"""
+        field_names, defer = queryset.query.deferred_loading
+        if defer or not field_names:
+            return queryset
+
+        names = [name for name, _ in keys if cursor.get_field(name) is not None]
+        return queryset.only(*set(field_names).union(names))
@@ -0,0 +1,124 @@
+"""
+Registry of automatic persisted queries
+"""
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+
+from api.utils.backend import get_query_hash
+from api.utils.exceptions import PersistedQueryNotFound, PersistedQueryHashMismatch
+from api.utils.lru import LRUCache
+from api.utils.metrics import METRICS
+
+PERSISTED_QUERY_VERSION = 1
+
+
+class PersistedQueryRegistry:
+    """
+    Store query strings by their sha256 hash in the default cache (redis),
+    with an in-process LRU in front of it.
+    """
+    key_prefix = 'graphql:apq'
+
+    def __init__(self, max_size=None, timeout=None):
+        self.queries = LRUCache(max_size or settings.PERSISTED_QUERY_CACHE_SIZE)
+        self.timeout = timeout or settings.PERSISTED_QUERY_TIMEOUT
+
+    def get_cache_key(self, query_hash):
+        """Return the shared cache key of a query hash"""
+        return '{prefix}:{hash}'.format(prefix=self.key_prefix, hash=query_hash)
+
+    def get(self, query_hash):
+        """
+        Return the query registered for a hash
+        :param query_hash: sha256 hex digest of the query
+        :return: query string or None
+        """
+        query = self.queries.get(query_hash)
+        if query is None:
+            query = cache.get(self.get_cache_key(query_hash))
+            if query is not None:
+                self.queries.set(query_hash, query)
+
+        return query
+
+    def register(self, query_hash, query):
+        """
+        Register a query under its hash
+        :param query_hash: sha256 hex digest sent by the client
+        :param query: query string
+        """
+        if get_query_hash(query) != query_hash:
+            raise PersistedQueryHashMismatch()
+
+        if self.queries.get(query_hash) is None:
+            cache.set(self.get_cache_key(query_hash), query, timeout=self.timeout)
+            self.queries.set(query_hash, query)
+
+
+PERSISTED_QUERIES = PersistedQueryRegistry()
+
+
+def persisted_query_metrics():
+    """Export the counters of the in-process persisted query LRU"""
+    stats = PERSISTED_QUERIES.queries.stats()
+    return [
+        ('graphql_persisted_query_lru_hits', 'Persisted query LRU hits', stats['hits']),
+        ('graphql_persisted_query_lru_misses', 'Persisted query LRU misses', stats['misses']),
+    ]
+
+
+METRICS.register_collector(persisted_query_metrics,
+                           counters=('graphql_persisted_query_lru_hits', 'graphql_persisted_query_lru_misses'))
+
+
+def get_persisted_query_hash(request, data):
+    """
+    Return the persisted query hash sent in the request extensions, if any
+    :param request: the request
+    :param data: request data of the operation
+    :return: sha256 hash or None
+    """
+    extensions = request.GET.get('extensions') or data.get('extensions')
+
+    if isinstance(extensions, str):
+        try:
+            extensions = json.loads(extensions)
+        except ValueError:
+            return None
+
+    if not isinstance(extensions, dict):
+        return None
+
+    persisted_query = extensions.get('persistedQuery')
+    if not isinstance(persisted_query, dict) or persisted_query.get('version') != PERSISTED_QUERY_VERSION:
+        return None
+
+    return persisted_query.get('sha256Hash')
+
+
+def resolve_persisted_query(request, data):
+    """
+    Fill the query of an operation that only sent its persisted query hash, and register the
+    query of an operation that sent both.
+    :param request: the request
+    :param data: request data of the operation
+    :return: request data with the query
+    """
+    query_hash = get_persisted_query_hash(request, data)
+    if not query_hash:
+        return data
+
+    query = request.GET.get('query') or data.get('query')
+    if query:
+        PERSISTED_QUERIES.register(query_hash, query)
+        return data
+
+    query = PERSISTED_QUERIES.get(query_hash)
+    if query is None:
+        raise PersistedQueryNotFound()
+
+    data = dict(data.items())
+    data['query'] = query
+    return data
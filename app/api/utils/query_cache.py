@@ -0,0 +1,67 @@
+"""
+Cache of results computed from querysets, invalidated with the response cache tags of the tables they read
+"""
+import json
+from hashlib import sha256
+
+from django.apps import apps
+from django.core.cache import cache
+
+from api.utils.db_router import is_reading_replica, may_read_stale
+from api.utils.response_cache import RESPONSE_CACHE, model_tag
+
+
+def get_queryset_tags(queryset, models=()):
+    """
+    Return the cache tags of the models whose tables a queryset reads
+    :param queryset: the queryset
+    :param models: other models the results depend on
+    """
+    tables = {model._meta.db_table: model for model in apps.get_models()}
+    read_tables = {join.table_name for join in queryset.query.alias_map.values()}
+    read_tables.add(queryset.model._meta.db_table)
+
+    tags = {model_tag(tables[table]) for table in read_tables if table in tables}
+    tags.update(model_tag(model) for model in models)
+    return sorted(tags)
+
+
+class QueryCache:
+    """
+    Cache results by the SQL of the queryset they are computed from, which normalizes the filters that built it.
+    Entries are stored with the versions of the tags of the tables read, and expire after a timeout.
+    """
+
+    def __init__(self, key_prefix, timeout):
+        self.key_prefix = key_prefix
+        self.timeout = timeout
+
+    def get_key(self, queryset, *key_parts):
+        """
+        Return the cache key of a result
+        :param queryset: queryset the result is computed from
+        :param key_parts: other JSON serializable values the result depends on
+        """
+        sql, params = queryset.query.sql_with_params()
+        key_data = json.dumps([queryset.db, sql, [str(param) for param in params], key_parts], separators=(',', ':'))
+        return '{prefix}:{hash}'.format(prefix=self.key_prefix, hash=sha256(key_data.encode('utf-8')).hexdigest())
+
+    def get_or_set(self, queryset, compute, key_parts=(), models=()):
+        """
+        Return a cached result, computing and storing it when it is missing or stale
+        :param queryset: queryset the result is computed from
+        :param compute: callable without arguments returning the result
+        :param key_parts: other JSON serializable values the result depends on
+        :param models: other models whose changes must invalidate the result
+        """
+        key = self.get_key(queryset, *key_parts)
+        versions = RESPONSE_CACHE.get_versions(get_queryset_tags(queryset, models))
+
+        entry = cache.get(key)
+        if entry is not None and entry['versions'] == versions:
+            return entry['value']
+
+        value = compute()
+        if not (is_reading_replica() and may_read_stale(RESPONSE_CACHE.get_last_modified(versions))):
+            cache.set(key, {'value': value, 'versions': versions}, timeout=self.timeout)
+        return value
@@ -0,0 +1,274 @@
+"""
+Response cache of GraphQL query operations, invalidated by model tags
+"""
+import json
+import time
+from functools import partial
+from hashlib import sha256
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from graphql.backend.cache import get_unique_schema_id
+from graphql.language.ast import Field as FieldNode, FragmentDefinition, FragmentSpread, InlineFragment
+from graphql.language.printer import print_ast
+from graphql.type.definition import GraphQLObjectType, GraphQLInterfaceType, get_named_type
+
+from api.utils.backend import get_query_hash
+
+# Models whose rows are also rendered when a type of another model is selected, e.g. the offers of a category
+MODEL_DEPENDENCIES = {}
+
+
+def model_tag(model):
+    """Return the cache tag of a model"""
+    return model._meta.label_lower
+
+
+def register_cache_dependencies(model, *models):
+    """
+    Declare that the data rendered for a model also depends on other models
+    :param model: model of a GraphQL type
+    :param models: models whose changes must invalidate the responses of that type
+    """
+    MODEL_DEPENDENCIES.setdefault(model, set()).update(models)
+
+
+def get_type_models(graphql_type):
+    """
+    Return the django models of a GraphQL type: the model of a DjangoObjectType, or the `cache_models` of the
+    object types built from the data of some models, like aggregates
+    """
+    graphene_type = getattr(graphql_type, 'graphene_type', None)
+    meta = getattr(graphene_type, '_meta', None)
+    model = getattr(meta, 'model', None)
+    if model is not None:
+        return [model]
+    return list(getattr(graphene_type, 'cache_models', ()))
+
+
+def collect_models(schema, selection_set, parent_type, fragments, models, visited_fragments=frozenset()):
+    """
+    Collect the models of every type selected in a selection set
+    :param schema: GraphQL schema
+    :param selection_set: AST selection set
+    :param parent_type: type of the selection set
+    :param fragments: fragment definitions of the document, by name
+    :param models: set to fill with the models found
+    """
+    models.update(get_type_models(parent_type))
+
+    if selection_set is None:
+        return
+
+    for selection in selection_set.selections:
+        if isinstance(selection, FieldNode):
+            fields = getattr(parent_type, 'fields', {}) \
+                if isinstance(parent_type, (GraphQLObjectType, GraphQLInterfaceType)) else {}
+            field = fields.get(selection.name.value)
+            if field is not None:
+                collect_models(schema, selection.selection_set, get_named_type(field.type), fragments, models,
+                               visited_fragments)
+        elif isinstance(selection, FragmentSpread):
+            name = selection.name.value
+            fragment = fragments.get(name)
+            if fragment is not None and name not in visited_fragments:
+                fragment_type = schema.get_type(fragment.type_condition.name.value) or parent_type
+                collect_models(schema, fragment.selection_set, fragment_type, fragments, models,
+                               visited_fragments | {name})
+        elif isinstance(selection, InlineFragment):
+            fragment_type = parent_type
+            if selection.type_condition:
+                fragment_type = schema.get_type(selection.type_condition.name.value) or parent_type
+            collect_models(schema, selection.selection_set, fragment_type, fragments, models, visited_fragments)
+
+
+def get_operation_tags(schema, document_ast, operation_name=None):
+    """
+    Return the tags of the models touched by a query operation
+    :param schema: GraphQL schema
+    :param document_ast: parsed document
+    :param operation_name: name of the operation to execute
+    :return: sorted list of tags
+    """
+    fragments = {}
+    operations = []
+    for definition in document_ast.definitions:
+        if isinstance(definition, FragmentDefinition):
+            fragments[definition.name.value] = definition
+        elif definition.operation == 'query':
+            if not operation_name or (definition.name and definition.name.value == operation_name):
+                operations.append(definition)
+
+    models = set()
+    for operation in operations:
+        collect_models(schema, operation.selection_set, schema.get_query_type(), fragments, models)
+
+    for model in list(models):
+        models.update(MODEL_DEPENDENCIES.get(model, ()))
+
+    return sorted(model_tag(model) for model in models)
+
+
+class ResponseCache:
+    """
+    Cache the encoded responses of query operations in the default cache (redis).
+    Each entry keeps the version of the tags it was computed with. Invalidating a tag replaces its version,
+    so every entry tagged with it becomes stale at once.
+    """
+    key_prefix = 'graphql:response'
+    tag_prefix = 'graphql:tag'
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout or settings.GRAPHQL_RESPONSE_CACHE_TIMEOUT
+
+    @staticmethod
+    def get_document_hash(document):
+        """Return the hash of the normalized query of a document, computed once per document"""
+        normalized_hash = getattr(document, 'normalized_hash', None)
+        if normalized_hash is None:
+            normalized_hash = get_query_hash(print_ast(document.document_ast))
+            document.normalized_hash = normalized_hash
+        return normalized_hash
+
+    def get_key(self, document, variables=None, operation_name=None, operation_id=None,  # pylint: disable=R0913
+                batch=False):
+        """
+        Return the cache key of an operation
+        :param document: GraphQLDocument of the operation
+        :param variables: operation variables
+        :param operation_name: name of the operation to execute
+        :param operation_id: batch id of the operation
+        :param batch: the response belongs to a batch, and carries its `id` and `status`
+        """
+        key_data = json.dumps([
+            get_unique_schema_id(document.schema),
+            self.get_document_hash(document),
+            variables or {},
+            operation_name,
+            operation_id,
+            batch,
+        ], sort_keys=True, separators=(',', ':'))
+        return '{prefix}:{hash}'.format(prefix=self.key_prefix, hash=sha256(key_data.encode('utf-8')).hexdigest())
+
+    def get_tag_key(self, tag):
+        """Return the cache key of a tag version"""
+        return '{prefix}:{tag}'.format(prefix=self.tag_prefix, tag=tag)
+
+    @staticmethod
+    def new_version():
+        """Return a new tag version made of the current time and a random suffix"""
+        return '{time:.6f}:{suffix}'.format(time=time.time(), suffix=uuid4().hex)
+
+    @staticmethod
+    def get_last_modified(versions):
+        """
+        Return the time of the latest change of some tags
+        :param versions: dict with the version of each tag
+        :return: timestamp or None
+        """
+        return max((float(version.split(':')[0]) for version in versions.values()), default=None)
+
+    def get_versions(self, tags):
+        """
+        Return the current version of some tags. Tags without a version get a new one, so a version never repeats
+        even when the cache is flushed.
+        :param tags: list of tags
+        :return: dict with the version of each tag
+        """
+        keys = {self.get_tag_key(tag): tag for tag in tags}
+        versions = cache.get_many(list(keys))
+
+        missing = {key: self.new_version() for key in keys if key not in versions}
+        if missing:
+            cache.set_many(missing, timeout=None)
+            versions.update(missing)
+
+        return {tag: versions[key] for key, tag in keys.items()}
+
+    def get(self, key):
+        """
+        Return a cached response if none of its tags were invalidated after it was stored
+        :param key: operation cache key
+        :return: response data or None
+        """
+        entry = cache.get(key)
+        if entry is None:
+            return None
+
+        if self.get_versions(entry['versions']) != entry['versions']:
+            return None
+
+        return entry['response']
+
+    def set(self, key, response, versions):
+        """
+        Store a response
+        :param key: operation cache key
+        :param response: response data, without the extensions of the request that computed it
+        :param versions: tag versions read before the operation was executed
+        """
+        cache.set(key, {'response': response, 'versions': versions}, timeout=self.timeout)
+
+    def get_encoded_key(self, etag, encoding, shape):
+        """Return the cache key of the compressed body of a response"""
+        return '{prefix}:{encoding}:{shape}:{etag}'.format(prefix=self.key_prefix, encoding=encoding, shape=shape,
+                                                           etag=etag.strip('"'))
+
+    def get_encoded(self, etag, encoding, shape):
+        """
+        Return the compressed body of a response
+        :param etag: ETag of the response, derived from the tag versions it was computed with
+        :param encoding: content encoding
+        :param shape: 'batch' for a list of responses, 'single' for the response of a single operation
+        :return: bytes or None
+        """
+        return cache.get(self.get_encoded_key(etag, encoding, shape))
+
+    def set_encoded(self, etag, encoding, shape, content):
+        """
+        Store the compressed body of a response. A change of the tags changes the ETag, so it needs no versions.
+        :param etag: ETag of the response
+        :param encoding: content encoding
+        :param shape: 'batch' for a list of responses, 'single' for the response of a single operation
+        :param content: compressed bytes
+        """
+        cache.set(self.get_encoded_key(etag, encoding, shape), content, timeout=self.timeout)
+
+    def invalidate(self, *tags):
+        """
+        Make stale every response tagged with any of the tags
+        :param tags: list of tags
+        """
+        cache.set_many({self.get_tag_key(tag): self.new_version() for tag in tags}, timeout=None)
+
+
+RESPONSE_CACHE = ResponseCache()
+
+
+def invalidate_models(*models):
+    """
+    Invalidate the cached responses that touched some models
+    :param models: model classes
+    """
+    RESPONSE_CACHE.invalidate(*[model_tag(model) for model in models])
+
+
+def connect_cache_invalidation(sender, *models):
+    """
+    Invalidate the cached responses of some models each time an instance of sender is saved or deleted.
+    The tags change once the transaction is committed, so no request caches the data it replaces meanwhile.
+    :param sender: model class sending the signals
+    :param models: models to invalidate, sender itself by default
+    """
+    models = models or (sender,)
+
+    # pylint: disable=W0613
+    def invalidate(sender, **kwargs):
+        transaction.on_commit(partial(invalidate_models, *models), using=kwargs.get('using'))
+
+    dispatch_uid = 'response_cache_{sender}'.format(sender=model_tag(sender))
+    post_save.connect(invalidate, sender=sender, weak=False, dispatch_uid=dispatch_uid)
+    post_delete.connect(invalidate, sender=sender, weak=False, dispatch_uid=dispatch_uid)
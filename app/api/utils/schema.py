@@ -6,6 +6,7 @@ from __future__ import unicode_literals
 
 from collections import OrderedDict
 
+from django.db import transaction
 from django.forms import model_to_dict
 from graphene import Enum, List, ID, Field, InputField
 from graphene.types.utils import yank_fields_from_attrs
@@ -14,6 +15,7 @@ from graphene_django.forms.mutation import BaseDjangoFormMutation, DjangoFormMut
 from graphene_django.types import ErrorType
 
 from api.utils.exceptions import BaseError
+from api.utils.response_cache import invalidate_models
 
 
 def django_choice_to_type(type_name, django_choices):
@@ -68,8 +70,9 @@ class EditDjangoModelFormMutation(DjangoModelFormMutation):
 
 class BulkDjangoFormMutation(BaseDjangoFormMutation):
     """
-    Extends BaseDjangoFormMutation to handle multiple ids.
-     It creates one form instance for each id
+    Extends BaseDjangoFormMutation to handle multiple ids, in one transaction.
+     It creates one form instance for each id, unless the Meta of the mutation names in bulk_operation a
+     queryset-level operation of its form class, called with bulk_arguments to mutate every instance at once
     """
 
     class Meta:
@@ -81,7 +84,7 @@ class BulkDjangoFormMutation(BaseDjangoFormMutation):
 
     # pylint: disable=W0221
     @classmethod
-    def __init_subclass_with_meta__(cls, form_class=None, model=None,
+    def __init_subclass_with_meta__(cls, form_class=None, model=None, bulk_operation=None, bulk_arguments=(),
                                     only_fields=(), exclude_fields=(), **options):
         if not form_class:
             raise Exception('form_class is required for BulkDjangoFormMutation')
@@ -102,6 +105,8 @@ class BulkDjangoFormMutation(BaseDjangoFormMutation):
             _as=Field,
         )
         _meta.model = model
+        _meta.bulk_operation = bulk_operation
+        _meta.bulk_arguments = tuple(bulk_arguments)
 
         input_fields = yank_fields_from_attrs(
             input_fields,
@@ -116,6 +121,30 @@ class BulkDjangoFormMutation(BaseDjangoFormMutation):
     def mutate_and_get_payload(cls, root, info, **input):
         pks = input.pop("ids", None)
         errors = []
+
+        with transaction.atomic():
+            if cls._meta.bulk_operation:
+                success_ids = cls.bulk_mutate(pks, errors)
+            else:
+                success_ids = cls.mutate_each(root, info, pks, errors, **input)
+
+        if success_ids:
+            transaction.on_commit(lambda: invalidate_models(cls._meta.model))
+
+        if errors:
+            return cls(success_ids=success_ids, errors=errors)
+
+        return cls(success_ids=success_ids)
+
+    # pylint: disable=W0622
+    @classmethod
+    def mutate_each(cls, root, info, pks, errors, **input):
+        """
+        Validate a form and mutate its instance for each id
+        :param pks: ids to mutate
+        :param errors: list to fill with the errors of the invalid forms
+        :return: list of mutated ids
+        """
         success_ids = []
 
         # pylint: disable=C0103
@@ -135,10 +164,32 @@ class BulkDjangoFormMutation(BaseDjangoFormMutation):
             except cls._meta.model.DoesNotExist:
                 pass
 
-        if errors:
-            return cls(success_ids=success_ids, errors=errors)
+        return success_ids
 
-        return cls(success_ids=success_ids)
+    @classmethod
+    def bulk_mutate(cls, pks, errors):
+        """
+        Mutate the instances of every existing id with the bulk operation of the form class. Missing ids are skipped,
+        as the forms of the ids that do not exist are.
+        :param pks: ids to mutate
+        :param errors: list to fill with the error of the operation
+        :return: list of mutated ids, in the order they were given
+        """
+        model = cls._meta.model
+        existing_ids = list(model._default_manager.select_for_update().filter(pk__in=pks).values_list('pk', flat=True))
+        if not existing_ids:
+            return []
+
+        operation = getattr(cls._meta.form_class, cls._meta.bulk_operation)
+        try:
+            with transaction.atomic():
+                operation(model._default_manager.filter(pk__in=existing_ids), *cls._meta.bulk_arguments)
+        except BaseError as error:
+            errors.append(ErrorType(field='__all__', messages=[str(error.message)]))
+            return []
+
+        ids = {str(pk): pk for pk in existing_ids}
+        return list(OrderedDict.fromkeys(ids[str(pk)] for pk in pks if str(pk) in ids))
 
     @classmethod
     def get_form_kwargs(cls, root, info, **input_fields):
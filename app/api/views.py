@@ -1,15 +1,37 @@
 """Api views"""
+import copy
+import hmac
+import json
 import logging
+import random
+import time
+from collections import OrderedDict
+from functools import partial
+from hashlib import sha256
 
 from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.exceptions import PermissionDenied
-from django.http import JsonResponse
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
 from django_redis.cache import DJANGO_REDIS_LOGGER
 from graphene_django.views import GraphQLView
+from graphql.error import GraphQLError
 
 from api.root_schema import SCHEMA, ADMIN_SCHEMA
-from api.utils.exceptions import BaseError
+from api.utils.backend import DOCUMENT_BACKEND
+from api.utils.batch import run_concurrently
+from api.utils.cost import measure_cost
+from api.utils.db_router import is_pinned_to_primary, may_read_stale, route_operation
+from api.utils.exceptions import BaseError, QueryCostExceeded, QueryCostUnavailable
+from api.utils.http import IDENTITY, choose_encoding, compress, get_encoded_etag, get_etag_variants, \
+    get_matching_etag, is_not_modified
+from api.utils.introspection import get_introspection
+from api.utils.metrics import METRICS
+from api.utils.middleware import SQLTracker
+from api.utils.persisted_queries import resolve_persisted_query
+from api.utils.response_cache import RESPONSE_CACHE, get_operation_tags
 
 logger = logging.getLogger((DJANGO_REDIS_LOGGER or __name__))  # pylint: disable=C0103
 
@@ -26,42 +48,386 @@ class AdminRequiredMixin(LoginRequiredMixin):
 
 class CustomGraphQLView(GraphQLView):
     """Modified GraphQLView to handle error code"""
+    response_cache = False
+    conditional_responses = False
 
-    def check_depth(self, request, query):
-        """Check if the query have a valid depth"""
+    def __init__(self, response_cache=False, conditional_responses=False, **kwargs):
+        super(CustomGraphQLView, self).__init__(**kwargs)
+        self.response_cache = self.response_cache or response_cache
+        self.conditional_responses = self.conditional_responses or conditional_responses
 
-        backend = self.get_backend(request)
-        document = backend.document_from_string(self.schema, query)
-        ast = document.document_ast
-        for definition in ast.definitions:
-            # We are only interested in queries
-            if definition.operation != 'query':
-                continue
+    def get_backend(self, request):
+        """
+        Share the parsed and validated documents between the validators, the batch, the cost check, the response
+        cache and the execution
+        """
+        return DOCUMENT_BACKEND
 
-            depth = measure_depth(definition.selection_set)
-            if depth > settings.MAX_QUERY_DEPTH:  # set your depth max here
-                return False
+    def check_cost(self, request, query, variables, operation_name):
+        """
+        Measure the cost of the operation to execute and reject it when it is over the budget
+        :return: operation cost
+        """
+        document = self.get_backend(request).document_from_string(self.schema, query)
+        cost = measure_cost(self.schema, document.document_ast, variables, operation_name)
 
-        return True
+        if cost is not None:
+            request.graphql_extensions['cost'] = {'requested': cost, 'maximum': settings.MAX_QUERY_COST}
+            if cost > settings.MAX_QUERY_COST:
+                raise QueryCostExceeded()
+
+        return cost
+
+    def dispatch(self, request, *args, **kwargs):
+        """
+        Route the operations of the request to the database replicas, and keep the clients that wrote reading from
+        the primary until their writes reach the replicas
+        """
+        request.database_state = {'written': False}
+        response = self.dispatch_conditional(request, *args, **kwargs)
+
+        if request.database_state['written']:
+            response.set_cookie(settings.DATABASE_PRIMARY_COOKIE, '1', max_age=settings.DATABASE_REPLICA_LAG_SECONDS,
+                                httponly=True)
+        return response
+
+    def dispatch_conditional(self, request, *args, **kwargs):
+        """
+        Answer read-only requests with an ETag and a Last-Modified date computed from the versions of the models
+        their operations touch, and answer the revalidation of an unchanged response with a 304 without executing it.
+        Responses are compressed in the encoding preferred by the client.
+        """
+        if request.method == 'GET':
+            # the query string carries a single operation, even on batch endpoints
+            self.batch = False
+
+        encoding = choose_encoding(request) if settings.GRAPHQL_COMPRESSION else IDENTITY
+
+        validators = None
+        if self.conditional_responses and request.method in ('GET', 'POST'):
+            validators = self.get_validators(request)
+
+        if validators is None:
+            return self.encode_response(super(CustomGraphQLView, self).dispatch(request, *args, **kwargs), encoding)
+
+        etag, last_modified = validators
+        etags = get_etag_variants(etag)
+        if is_not_modified(request, etags, last_modified):
+            response = HttpResponseNotModified()
+            patch_vary_headers(response, ('Accept-Encoding',))
+            # the client keeps the representation it revalidated
+            matching_etag = get_matching_etag(request, etags)
+            if matching_etag in etags:
+                etag = matching_etag
+        else:
+            shape = self.get_request_shape(request)
+            response = self.get_encoded_cached_response(etag, encoding, shape)
+            if response is None:
+                request.graphql_errors = []
+                response = self.encode_response(
+                    super(CustomGraphQLView, self).dispatch(request, *args, **kwargs), encoding)
+                if response.status_code != 200 or request.graphql_errors:
+                    return response
+
+                if self.response_cache and response.has_header('Content-Encoding'):
+                    RESPONSE_CACHE.set_encoded(etag, encoding, shape, response.content)
+            etag = get_encoded_etag(etag, response.get('Content-Encoding', IDENTITY))
+
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+    def get_encoded_cached_response(self, etag, encoding, shape):
+        """Return a response with the compressed body stored for an ETag and a request shape, if any"""
+        if not self.response_cache or encoding == IDENTITY:
+            return None
+
+        content = RESPONSE_CACHE.get_encoded(etag, encoding, shape)
+        if content is None:
+            return None
+
+        response = HttpResponse(content, content_type='application/json')
+        response['Content-Encoding'] = encoding
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+    @staticmethod
+    def encode_response(response, encoding):
+        """
+        Compress the body of a response when it is large enough
+        :param response: HttpResponse
+        :param encoding: encoding accepted by the client
+        :return: the response
+        """
+        if not settings.GRAPHQL_COMPRESSION:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if encoding == IDENTITY or response.has_header('Content-Encoding') or \
+                len(response.content) < settings.GRAPHQL_COMPRESSION_MIN_SIZE:
+            return response
+
+        response.content = compress(response.content, encoding, settings.GRAPHQL_COMPRESSION_LEVELS[encoding])
+        response['Content-Encoding'] = encoding
+        return response
+
+    def get_validators(self, request):
+        """
+        Compute the validators of the response of a request without executing it
+        :return: tuple with the ETag and the last modification timestamp, or None when the request is not read-only
+        """
+        try:
+            data = self.get_request_data(request)
+            shape = self.get_request_shape(request)
+            keys = []
+            tags = set()
+
+            for entry in data if isinstance(data, list) else [data]:
+                entry = resolve_persisted_query(request, entry)
+                query, variables, operation_name, operation_id = self.get_graphql_params(request, entry)
+                document = self.get_backend(request).document_from_string(self.schema, query)
+                if document.get_operation_type(operation_name) != 'query':
+                    return None
+
+                keys.append(RESPONSE_CACHE.get_key(document, variables, operation_name, operation_id, self.batch))
+                tags.update(get_operation_tags(self.schema, document.document_ast, operation_name))
+        except Exception:  # pylint: disable=W0703
+            # the execution reports the errors of the request
+            return None
+
+        versions = RESPONSE_CACHE.get_versions(sorted(tags))
+        last_modified = RESPONSE_CACHE.get_last_modified(versions)
+        if may_read_stale(last_modified) and not is_pinned_to_primary(request):
+            # the replicas may answer with the data before the change
+            return None
+
+        validator = json.dumps([shape, keys, versions], sort_keys=True, separators=(',', ':'))
+
+        etag = '"{hash}"'.format(hash=sha256(validator.encode('utf-8')).hexdigest())
+        return etag, last_modified
+
+    def get_request_shape(self, request):
+        """
+        Return the shape of the response body of a request
+        :return: 'batch' when the response is a list with the response of each operation, 'single' otherwise
+        """
+        return 'batch' if self.batch and isinstance(self.get_request_data(request), list) else 'single'
+
+    def get_request_data(self, request):
+        """Parse the body of the request once"""
+        if 'graphql_data' not in request.__dict__:
+            request.graphql_data = super(CustomGraphQLView, self).parse_body(request)
+        return request.graphql_data
+
+    def parse_body(self, request):
+        """Execute the operations of a batch before the parent view collects their responses one by one"""
+        data = self.get_request_data(request)
+
+        if self.batch and isinstance(data, list) and len(data) > 1:
+            request.graphql_batch_responses = iter(self.execute_batch(request, data))
+
+        return data
+
+    def execute_batch(self, request, data):
+        """
+        Execute the operations of a batch. Identical queries run once, consecutive queries run concurrently
+        and mutations run one after another in their position.
+        :param request: the request
+        :param data: list with the request data of each operation
+        :return: list with the response of each operation
+        """
+        # resolve the lazy user once, before the request is shared by the executor threads
+        getattr(request.user, 'pk', None)
+
+        keys = []
+        operations = OrderedDict()
+        mutations = 0
+        for index, entry in enumerate(data):
+            if self.get_operation_type(request, entry) == 'query':
+                # queries separated by a mutation may see different data
+                key = json.dumps([mutations, entry.get('query'), entry.get('variables'), entry.get('operationName'),
+                                  entry.get('id'), entry.get('extensions')], sort_keys=True)
+            else:
+                key = index
+                mutations += 1
+            keys.append(key)
+            operations.setdefault(key, entry)
+
+        responses = {}
+        queries = []
+
+        def run_queries():
+            results = run_concurrently([
+                partial(self.get_operation_response, copy.copy(request), operations[key]) for key in queries
+            ])
+            responses.update(zip(queries, results))
+            del queries[:]
+
+        for key, entry in operations.items():
+            if isinstance(key, int):
+                run_queries()
+                responses[key] = self.get_operation_response(copy.copy(request), entry)
+            else:
+                queries.append(key)
+        run_queries()
+
+        return [responses[key] for key in keys]
+
+    def get_operation_type(self, request, data):
+        """
+        Return the type of an operation without executing it
+        :return: 'query', 'mutation' or None if the operation is invalid
+        """
+        try:
+            data = resolve_persisted_query(request, data)
+            query, _, operation_name, _ = self.get_graphql_params(request, data)
+            document = self.get_backend(request).document_from_string(self.schema, query)
+            return document.get_operation_type(operation_name)
+        except Exception:  # pylint: disable=W0703
+            return None
 
     def get_response(self, request, data, show_graphiql=False):
+        """Return the response of an operation, already executed when it belongs to a batch"""
+        responses = getattr(request, 'graphql_batch_responses', None)
+        if responses is not None:
+            return next(responses)
+
+        return self.get_operation_response(request, data, show_graphiql)
+
+    def get_operation_response(self, request, data, show_graphiql=False):
         """Override get response to handle a high level cache"""
-        query, _, _, _ = self.get_graphql_params(request, data)
+        request.graphql_started = time.perf_counter()
+        request.graphql_extensions = {}
+        request.graphql_result = None
 
         try:
-            if not self.check_depth(request, query):
-                # return response as None and 403 status_code
-                return None, 403
-        except Exception:  # pylint: disable=W0703
+            data = resolve_persisted_query(request, data)
+        except BaseError as error:
+            return self.get_error_response(request, data, error)
+
+        query, variables, operation_name, _ = self.get_graphql_params(request, data)
+
+        try:
+            if query:
+                self.check_cost(request, query, variables, operation_name)
+        except QueryCostExceeded as error:
+            return self.get_error_response(request, data, error, status_code=403)
+        except QueryCostUnavailable as error:
+            return self.get_error_response(request, data, error, status_code=500)
+        except GraphQLError:
+            # syntax errors are reported by the execution
             pass
 
-        return super(CustomGraphQLView, self).get_response(request, data, show_graphiql)
+        if not (self.response_cache and query):
+            return super(CustomGraphQLView, self).get_response(request, data, show_graphiql)
+
+        return self.get_cached_response(request, data, show_graphiql)
+
+    def get_cached_response(self, request, data, show_graphiql=False):
+        """
+        Return the response of a query operation from the response cache, or execute it and cache the result
+        when it has no errors
+        """
+        query, variables, operation_name, operation_id = self.get_graphql_params(request, data)
+
+        try:
+            document = self.get_backend(request).document_from_string(self.schema, query)
+        except Exception:  # pylint: disable=W0703
+            document = None
+
+        if document is None or document.get_operation_type(operation_name) != 'query':
+            return super(CustomGraphQLView, self).get_response(request, data, show_graphiql)
+
+        key = RESPONSE_CACHE.get_key(document, variables, operation_name, operation_id, self.batch)
+        response = RESPONSE_CACHE.get(key)
+        if response is not None:
+            # the extensions describe this request, not the one that computed the response
+            return self.json_encode(request, dict(response), pretty=show_graphiql), 200
+
+        versions = RESPONSE_CACHE.get_versions(get_operation_tags(self.schema, document.document_ast, operation_name))
+        response, status_code = super(CustomGraphQLView, self).get_response(request, data, show_graphiql)
+
+        result = getattr(request, 'graphql_result', None)
+        stale = may_read_stale(RESPONSE_CACHE.get_last_modified(versions)) and not is_pinned_to_primary(request)
+        if status_code == 200 and result is not None and not result.errors and not stale:
+            RESPONSE_CACHE.set(key, request.graphql_response, versions)
+
+        return response, status_code
+
+    def get_error_response(self, request, data, error, status_code=200):
+        """
+        Build the response of an operation that fails before its execution
+        :param request: the request
+        :param data: request data of the operation
+        :param error: error to report
+        :param status_code: response status code
+        :return: tuple with the encoded response and its status code
+        """
+        response = {'errors': [self.format_error(error)]}
+
+        if self.batch:
+            response['id'] = data.get('id')
+            response['status'] = status_code
+
+        return self.json_encode(request, response), status_code
+
+    def execute_graphql_request(self, request, data, query, variables, operation_name, show_graphiql=False):
+        """Measure the operation, and keep its execution result in the request"""
+        sampled = random.random() < settings.GRAPHQL_TRACE_SAMPLE_RATE
+        request.graphql_trace = [] if sampled else None
+        started = time.perf_counter()
+
+        try:
+            document = self.get_backend(request).document_from_string(self.schema, query)
+            operation_type = document.get_operation_type(operation_name) or 'invalid'
+        except Exception:  # pylint: disable=W0703
+            operation_type = 'invalid'
+
+        with SQLTracker() as sql, route_operation(request, operation_type):
+            request.graphql_result = super(CustomGraphQLView, self).execute_graphql_request(
+                request, data, query, variables, operation_name, show_graphiql)
+
+        errors = getattr(request, 'graphql_errors', None)
+        if errors is not None and request.graphql_result is not None and request.graphql_result.errors:
+            errors.extend(request.graphql_result.errors)
+
+        duration = (time.perf_counter() - started) * 1000
+        METRICS.observe('graphql_operation_duration_ms', duration, operation=operation_type)
+        METRICS.observe('graphql_operation_sql_queries', sql.count, operation=operation_type)
+        METRICS.observe('graphql_operation_sql_duration_ms', sql.duration * 1000, operation=operation_type)
+
+        if sampled and duration > settings.GRAPHQL_SLOW_OPERATION_MS:
+            logger.warning('Slow GraphQL operation %s (%s): %.1fms, %d SQL queries in %.1fms, slowest fields: %s',
+                           operation_name, operation_type, duration, sql.count, sql.duration * 1000,
+                           sorted(request.graphql_trace, key=lambda item: item[1], reverse=True)[:10])
+
+        return request.graphql_result
+
+    def json_encode(self, request, d, pretty=False):
+        """Add the extensions collected for the operation to its response, and keep the response without them"""
+        request.graphql_response = dict(d)
+        extensions = request.__dict__.pop('graphql_extensions', None)
+        if extensions is not None:
+            started = request.__dict__.pop('graphql_started')
+            extensions['timing'] = {'duration': round((time.perf_counter() - started) * 1000, 3)}
+            d['extensions'] = extensions
+
+        return super(CustomGraphQLView, self).json_encode(request, d, pretty)
+
+    def get_context(self, request):
+        """Start every executed operation with an empty data loader registry"""
+        request.loaders = {}
+        return request
 
     @staticmethod
     def format_error(error):
         formatted_error = GraphQLView.format_error(error)
         if hasattr(error, 'original_error') and isinstance(error.original_error, BaseError):
             formatted_error['code'] = error.original_error.code
+        elif isinstance(error, BaseError):
+            formatted_error['code'] = error.code
 
         return formatted_error
 
@@ -70,31 +436,33 @@ class AdminGraphQLView(AdminRequiredMixin, CustomGraphQLView):
     """View only available to staff members"""
 
 
+def is_metrics_scrape(request):
+    """Check if a request sends the bearer token of the Prometheus scrapes, GRAPHQL_METRICS_TOKEN"""
+    token = settings.GRAPHQL_METRICS_TOKEN
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    return bool(token) and hmac.compare_digest(authorization, 'Bearer {token}'.format(token=token))
+
+
+def get_metrics(request):
+    """
+    Endpoint for get the GraphQL metrics of the worker in the Prometheus text format, read by the Prometheus scrapes
+    and by staff members
+    """
+
+    if is_metrics_scrape(request) or request.user.is_authenticated and request.user.is_staff:
+        return HttpResponse(METRICS.render(), content_type='text/plain; version=0.0.4')
+
+    raise PermissionDenied()
+
+
 def get_introspection_schema(request):
     """
     Endpoint for get the introspection schema
     """
 
     if request.user.is_authenticated and request.user.is_staff:
-        app = request.GET.get('app')
-
-        schema = ADMIN_SCHEMA if app == 'admin' else SCHEMA
-        data = {'data': schema.introspect()}
-        return JsonResponse(
-            data,
-            json_dumps_params={'separators': (',', ':')},
-            status=200
-        )
+        if request.GET.get('app') == 'admin':
+            return get_introspection('admin', ADMIN_SCHEMA).get_response(request)
+        return get_introspection('public', SCHEMA).get_response(request)
 
     raise PermissionDenied()
-
-
-def measure_depth(selection_set, level=1):
-    """Calculate measure depth"""
-    max_depth = level
-    for field in selection_set.selections:
-        if field.selection_set:
-            new_depth = measure_depth(field.selection_set, level=level + 1)
-            if new_depth > max_depth:
-                max_depth = new_depth
-    return max_depth
@@ -0,0 +1,5 @@
+"""Application initialization"""
+
+# Set configuration class for contact_info app
+# pylint: disable=C0103
+default_app_config = 'contact_info.apps.ContactInfoConfig'
@@ -1,5 +1,19 @@
+"""
+Contact info app definition
+"""
 from django.apps import AppConfig
 
 
 class ContactInfoConfig(AppConfig):
+    """
+    Contact info app config
+    """
     name = 'contact_info'
+
+    def ready(self):
+        super(ContactInfoConfig, self).ready()
+        from api.utils.response_cache import connect_cache_invalidation
+        from contact_info.models import ContactInfo, Manufacturer
+
+        connect_cache_invalidation(ContactInfo)
+        connect_cache_invalidation(Manufacturer)
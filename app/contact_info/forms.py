@@ -75,10 +75,11 @@ class AdminDeleteManufacturerForm(ModelForm):
         model = Manufacturer
         fields = []
 
-    def delete(self):
-        """Delete manufacturer"""
-        Image.remove(self.instance.logo_public_id)
-        self.instance.delete()
+    @staticmethod
+    def bulk_delete(queryset):
+        """Delete manufacturers and their logos"""
+        Image.remove_many(queryset.values_list('logo_public_id', flat=True))
+        queryset.delete()
 
 
 class AdminDeleteMessageForm(ModelForm):
@@ -91,6 +92,7 @@ class AdminDeleteMessageForm(ModelForm):
         model = Message
         fields = []
 
-    def delete(self):
-        """Delete message"""
-        self.instance.delete()
+    @staticmethod
+    def bulk_delete(queryset):
+        """Delete messages"""
+        queryset.delete()
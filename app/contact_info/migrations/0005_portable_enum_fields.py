@@ -0,0 +1,19 @@
+# Generated by Django 2.2.3 on 2026-10-18 00:14
+
+import api.utils.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contact_info', '0004_auto_20200731_1123'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='message',
+            name='status',
+            field=api.utils.fields.EnumField(choices=[('UNREAD', 'This message has not been read'), ('READ', 'This message has been read')], default='UNREAD', help_text='Message status'),
+        ),
+    ]
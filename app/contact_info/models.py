@@ -1,7 +1,8 @@
 from django.db import models
-from django_mysql.models import EnumField
 from djchoices import DjangoChoices, ChoiceItem
 
+from api.utils.fields import EnumField
+
 
 class ContactInfo(models.Model):
     """Model for site contact info"""
@@ -90,19 +90,7 @@ class AdminDeleteManufacturerMutation(LoginRequiredMutation, BulkDjangoFormMutat
         """Meta Class"""
         model = Manufacturer
         form_class = AdminDeleteManufacturerForm
-
-    @classmethod
-    def perform_mutate(cls, form, info):
-        """
-        Factory method of this mutation
-        :type form: AdminDeleteManufacturerForm
-        :param form: Django form
-        :param info: Schema info
-        :return: instance of this class
-        """
-        manufacturer_id = form.instance.id
-        form.delete()
-        return manufacturer_id
+        bulk_operation = 'bulk_delete'
 
 
 class MessageType(DjangoObjectType):
@@ -122,19 +110,7 @@ class AdminDeleteMessageMutation(LoginRequiredMutation, BulkDjangoFormMutation):
         """Meta Class"""
         model = Message
         form_class = AdminDeleteMessageForm
-
-    @classmethod
-    def perform_mutate(cls, form, info):
-        """
-        Factory method of this mutation
-        :type form: AdminDeleteMessageForm
-        :param form: Django form
-        :param info: Schema info
-        :return: instance of this class
-        """
-        message_id = form.instance.id
-        form.delete()
-        return message_id
+        bulk_operation = 'bulk_delete'
 
 
 class AdminMessageQuery:
@@ -1,4 +1,18 @@
 import multiprocessing
+import os
 
-workers = multiprocessing.cpu_count() * 2 + 1
-worker_class = 'eventlet'
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+
+# Worker profile:
+# - 'eventlet' serves the requests of each worker on green threads. mysqlclient blocks the whole worker while it
+#   waits for MySQL, so this profile uses the pure Python PyMySQL driver, whose sockets eventlet makes cooperative
+# - 'threads' serves the requests of each worker on GUNICORN_THREADS threads and keeps the mysqlclient driver
+profile = os.environ.get('GUNICORN_PROFILE', 'eventlet')
+
+if profile == 'threads':
+    worker_class = 'gthread'
+    threads = int(os.environ.get('GUNICORN_THREADS', 8))
+else:
+    worker_class = 'eventlet'
+    worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+    raw_env = ['DB_DRIVER={driver}'.format(driver=os.environ.get('DB_DRIVER', 'pymysql'))]
@@ -0,0 +1,5 @@
+"""Application initialization"""
+
+# Set configuration class for offers app
+# pylint: disable=C0103
+default_app_config = 'offers.apps.OffersConfig'
@@ -1,5 +1,33 @@
+"""
+Offers app definition
+"""
 from django.apps import AppConfig
 
 
 class OffersConfig(AppConfig):
+    """
+    Offers app config
+    """
     name = 'offers'
+
+    def ready(self):
+        super(OffersConfig, self).ready()
+        from django.db.models.signals import post_save, post_delete
+        from api.utils.response_cache import connect_cache_invalidation, register_cache_dependencies
+        from offers.category_tree import invalidate_category_tree
+        from offers.search import index_offer
+        from offers.models import Category, Offer, Image, Material, OffersMaterial
+
+        connect_cache_invalidation(Offer)
+        connect_cache_invalidation(Image, Offer)
+        connect_cache_invalidation(OffersMaterial, Offer)
+        connect_cache_invalidation(Category)
+        connect_cache_invalidation(Material)
+
+        # Categories render their offers and the materials of those offers
+        register_cache_dependencies(Category, Offer)
+
+        post_save.connect(invalidate_category_tree, sender=Category, dispatch_uid='category_tree')
+        post_delete.connect(invalidate_category_tree, sender=Category, dispatch_uid='category_tree')
+
+        post_save.connect(index_offer, sender=Offer, dispatch_uid='offer_search')
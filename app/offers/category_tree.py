@@ -0,0 +1,122 @@
+"""
+Category tree of the catalog, loaded in one query and cached by each worker
+"""
+import threading
+from collections import defaultdict
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+
+from api.utils.db_router import PRIMARY_DATABASE
+from offers.models import Category
+
+
+class CategoryTree:
+    """Every category indexed by id and slug, with the children of each one ordered by `order`"""
+
+    def __init__(self, categories):
+        categories = sorted(categories, key=lambda category: (category.order, category.id))
+
+        self.categories = {category.id: category for category in categories}
+        self.slugs_es = {category.slug_es: category for category in categories}
+        self.slugs_en = {category.slug_en: category for category in categories}
+        self.children = defaultdict(list)
+
+        for category in categories:
+            self.children[category.parent_category_id].append(category)
+            parent = self.categories.get(category.parent_category_id)
+            if parent is not None:
+                Category.parent_category.field.set_cached_value(category, parent)
+
+    @property
+    def roots(self):
+        """Return the parent categories"""
+        return self.children.get(None, [])
+
+    def get_children(self, category_id):
+        """Return the subcategories of a category"""
+        return self.children.get(category_id, [])
+
+    def get(self, id=None, slug_es=None, slug_en=None):  # pylint: disable=W0622
+        """
+        Return a category by id or slug
+        :return: Category or None
+        """
+        if id is not None:
+            return self.categories.get(id)
+        if slug_es is not None:
+            return self.slugs_es.get(slug_es)
+        if slug_en is not None:
+            return self.slugs_en.get(slug_en)
+        return None
+
+
+class CategoryTreeCache:
+    """
+    Keep the category tree of the worker behind a version shared through the default cache (redis).
+    Category saves and deletes replace the version, so every worker rebuilds its tree on the next read.
+    """
+    version_key = 'offers:category_tree:version'
+
+    def __init__(self):
+        self.tree = None
+        self.version = None
+        # changes made by this worker, to refresh the trees kept by the requests in progress
+        self.local_version = 0
+        self.lock = threading.Lock()
+
+    def get_version(self):
+        """Return the current version of the tree"""
+        version = cache.get(self.version_key)
+        if version is None:
+            version = uuid4().hex
+            cache.add(self.version_key, version, timeout=None)
+            version = cache.get(self.version_key) or version
+        return version
+
+    def get(self, context=None):
+        """
+        Return the current category tree. The version is checked once per request.
+        :param context: request the tree is read for
+        :return: CategoryTree
+        """
+        memo = getattr(context, 'category_tree', None)
+        if memo is not None and memo[0] == self.local_version:
+            return memo[1]
+
+        local_version = self.local_version
+        version = self.get_version()
+        with self.lock:
+            if self.tree is None or self.version != version:
+                # the tree is kept until the next change, it must not miss the changes the replicas lag behind
+                self.tree = CategoryTree(Category.objects.using(PRIMARY_DATABASE))
+                self.version = version
+            tree = self.tree
+
+        if context is not None:
+            context.category_tree = (local_version, tree)
+        return tree
+
+    def invalidate(self):
+        """Make every worker rebuild its tree once the current transaction is committed"""
+        transaction.on_commit(self.bump_version)
+
+    def bump_version(self):
+        """Replace the version of the tree"""
+        self.local_version += 1
+        self.tree = None
+        cache.set(self.version_key, uuid4().hex, timeout=None)
+
+
+CATEGORY_TREE = CategoryTreeCache()
+
+
+def get_category_tree(context=None):
+    """Return the current category tree"""
+    return CATEGORY_TREE.get(context)
+
+
+def invalidate_category_tree(sender, **kwargs):  # pylint: disable=W0613
+    """Signal receiver invalidating the category tree"""
+    CATEGORY_TREE.invalidate()
@@ -14,3 +14,21 @@ class CategoryDoesNotExist(BaseError):
 
     message = _('Category does not exist.')
     code = 'invalid-category'
+
+
+class OfferDoesNotExist(BaseError):
+    """
+    Exception for an offer lookup without exactly one of id, permalink or slug
+    """
+
+    message = _('Offer does not exist.')
+    code = 'invalid-offer'
+
+
+class InvalidPriceBuckets(BaseError):
+    """
+    Exception for a price histogram with less than one bucket or more than `OFFER_PRICE_FACETS_MAX_BUCKETS`
+    """
+
+    message = _('Invalid number of price buckets.')
+    code = 'invalid-price-buckets'
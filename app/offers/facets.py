@@ -0,0 +1,123 @@
+"""
+Facets of the offer lists: aggregates of the offers matching a set of filters, cached by query
+"""
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Count, Value
+from django.db.models.functions import Coalesce
+
+from api.utils.query_cache import QueryCache
+from offers.exceptions import InvalidPriceBuckets
+from offers.filters import OfferFilter
+from offers.models import Category, Material, Offer
+
+FACETS_CACHE = QueryCache('offers:facets', settings.OFFER_FACETS_CACHE_TIMEOUT)
+
+# Offers grouped by currency and price bucket, each bucket of the (high - low) / buckets prices of its currency.
+# Offers without a price get a NULL bucket.
+PRICE_HISTOGRAM_SQL = """
+SELECT o.currency_key, b.low, b.high,
+       CASE WHEN o.price IS NULL THEN NULL
+            WHEN b.high = b.low THEN 0
+            WHEN o.price >= b.high THEN %s
+            ELSE FLOOR((o.price - b.low) * %s / (b.high - b.low)) END AS bucket,
+       COUNT(*)
+FROM ({offers}) o
+LEFT JOIN (
+    SELECT p.currency_key, MIN(p.price) AS low, MAX(p.price) AS high
+    FROM ({offers}) p
+    WHERE p.price IS NOT NULL
+    GROUP BY p.currency_key
+) b ON b.currency_key = o.currency_key
+GROUP BY o.currency_key, b.low, b.high, bucket
+"""
+
+
+def filter_offers(queryset, data):
+    """
+    Apply the filters of the offers connection to a queryset
+    :param queryset: offers queryset
+    :param data: values of the OfferFilter arguments
+    :return: filtered queryset
+    """
+    filterset = OfferFilter(data={name: value for name, value in data.items() if value is not None},
+                            queryset=queryset)
+    if not filterset.form.is_valid():
+        raise ValidationError(filterset.form.errors.as_json())
+    return filterset.qs
+
+
+def get_material_facets(queryset, data):
+    """
+    Return the materials of the offers matching some filters, with the number of offers of each one.
+    The `materials` filter is ignored, so the counts show what selecting another material would give.
+    :param queryset: offers queryset
+    :param data: values of the OfferFilter arguments
+    :return: list of Material annotated with `offer_count`, most used first
+    """
+    data = {name: value for name, value in data.items() if name != 'materials'}
+    offer_ids = filter_offers(queryset, data).order_by().values('id')
+
+    materials = Material.objects.filter(offersmaterial__offer_id__in=offer_ids) \
+        .annotate(offer_count=Count('offersmaterial')).order_by('-offer_count', 'id')
+    return FACETS_CACHE.get_or_set(materials, lambda: list(materials), key_parts=('materials',),
+                                   models=(Offer, Material, Category))
+
+
+def get_price_histogram(offers, buckets):
+    """
+    Run the price histogram query of some offers
+    :param offers: offers queryset
+    :param buckets: number of buckets of each currency
+    :return: dict with the `currencies` list and the number of offers `without_price`
+    """
+    offers = offers.order_by().annotate(currency_key=Coalesce('currency', Value(''))).values('currency_key', 'price')
+    sql, params = offers.query.sql_with_params()
+
+    with connections[offers.db].cursor() as cursor:
+        cursor.execute(PRICE_HISTOGRAM_SQL.format(offers=sql), [buckets - 1, buckets] + list(params) * 2)
+        rows = cursor.fetchall()
+
+    currencies = {}
+    without_price = 0
+    for currency, low, high, bucket, count in rows:
+        if bucket is None:
+            without_price += count
+            continue
+
+        facet = currencies.setdefault(currency, {
+            'currency': currency or None, 'min': low, 'max': high, 'count': 0, 'counts': [0] * buckets,
+        })
+        facet['count'] += count
+        facet['counts'][min(int(bucket), buckets - 1)] += count
+
+    for facet in currencies.values():
+        width = (facet['max'] - facet['min']) / buckets
+        facet['buckets'] = [
+            {'min': facet['min'] + width * index, 'max': facet['min'] + width * (index + 1), 'count': count}
+            for index, count in enumerate(facet.pop('counts'))
+        ]
+
+    return {
+        'currencies': sorted(currencies.values(), key=lambda facet: facet['currency'] or ''),
+        'without_price': without_price,
+    }
+
+
+def get_price_facets(queryset, data, buckets):
+    """
+    Return the price range and histogram of each currency of the offers matching some filters, in one query.
+    The price filters are ignored, so the ranges show every price that can be selected.
+    :param queryset: offers queryset
+    :param data: values of the OfferFilter arguments
+    :param buckets: number of buckets of each currency
+    :return: dict with the `currencies` list and the number of offers `without_price`
+    """
+    if not 1 <= buckets <= settings.OFFER_PRICE_FACETS_MAX_BUCKETS:
+        raise InvalidPriceBuckets()
+
+    data = {name: value for name, value in data.items() if name not in ('price_gte', 'price_lte')}
+    offers = filter_offers(queryset, data)
+    return FACETS_CACHE.get_or_set(offers.order_by(), lambda: get_price_histogram(offers, buckets),
+                                   key_parts=('prices', buckets), models=(Offer, Category))
@@ -4,6 +4,7 @@ from django.db.models import Q
 
 from api.utils.filters import IDFilter
 from offers.models import Offer, Material
+from offers.search import search_offers
 
 
 class OfferFilter(django_filters.FilterSet):
@@ -25,6 +26,7 @@ class OfferFilter(django_filters.FilterSet):
                                                          label='FilterByMaterial',
                                                          queryset=Material.objects.all())
     recommended = django_filters.BooleanFilter(field_name='recommended', label='FilterByRecommended')
+    search = django_filters.CharFilter(method='filter_by_search', label='Search')
 
     @classmethod
     def filter_by_parent_category(cls, queryset, name, value):
@@ -49,6 +51,17 @@ class OfferFilter(django_filters.FilterSet):
         :type queryset: django.db.models.QuerySet
         :return: QuerySet with the filter applied
         """
-        title_query = Q(title_es__icontains=value) | Q(title_en__icontains=value)
-        description_query = Q(description_es__icontains=value) | Q(description_en__icontains=value)
-        return queryset.filter(title_query | description_query)
+        return search_offers(queryset, value)
+
+    @classmethod
+    def filter_by_search(cls, queryset, name, value):
+        """
+        Filter offer by the words of its titles and descriptions, ignoring case and accents, and annotate the
+        relevance of each offer as `search_score` to sort by it.
+        :param queryset: Current queryset
+        :param name: Field name. Expected to be `search`
+        :param value: Field value
+        :type queryset: django.db.models.QuerySet
+        :return: QuerySet with the filter applied
+        """
+        return search_offers(queryset, value, rank=True)
@@ -1,10 +1,13 @@
 """Forms for offer app"""
+from django.db import transaction
 from django.db.models import Q
 from django.forms import ModelForm, forms
+from django.utils import timezone
 from django.utils.text import slugify
 from django.utils.translation import ugettext_lazy as _
 
 from offers.models import Offer, Category, Image, OffersMaterial, Material
+from offers.permalinks import schedule_permalinks_regeneration
 
 INVALID_CATEGORY_NAME = _('Category name already exist')
 INVALID_CATEGORY = _('Category doest exist')
@@ -62,18 +65,15 @@ class AdminCreateCategoryForm(ModelForm):
             self.instance.description_en = self.data['description'].en
 
     def save(self, commit=True):
-        """Save form"""
+        """Save form, regenerating the permalinks of the category offers when its slug changed"""
+
+        slugs = (self.instance.slug_es, self.instance.slug_en)
 
-        category = super(AdminCreateCategoryForm, self).save(commit=commit)
+        with transaction.atomic():
+            category = super(AdminCreateCategoryForm, self).save(commit=commit)
 
-        if category.parent_category is None:
-            for subcategory in category.category_set.all():
-                subcategory.save()
-                for offer in subcategory.offer_set.all():
-                    offer.save()
-        else:
-            for offer in category.offer_set.all():
-                offer.save()
+            if (category.slug_es, category.slug_en) != slugs:
+                schedule_permalinks_regeneration(category.id)
 
         return category
 
@@ -113,26 +113,15 @@ class AdminDeleteCategoryForm(ModelForm):
         model = Category
         fields = []
 
-    def delete(self):
-        """Delete offer"""
-        Image.remove(self.instance.poster_public_id)
-
-        if not self.instance.parent_category:
-            for subcategory in self.instance.category_set.all():
-                Image.remove(subcategory.poster_public_id)
-
-            for offer in Offer.objects.filter(subcategory__parent_category_id=self.instance.id):
-                images = Image.objects.filter(offer_id=offer.id)
-                for image in images:
-                    Image.remove(public_id=image.public_id)
+    @staticmethod
+    def bulk_delete(queryset):
+        """Delete categories with their subcategories, and the posters and offer images of all of them"""
 
-        else:
-            for offer in Offer.objects.filter(subcategory_id=self.instance.id):
-                images = Image.objects.filter(offer_id=offer.id)
-                for image in images:
-                    Image.remove(public_id=image.public_id)
-
-        self.instance.delete()
+        categories = Category.objects.filter(Q(id__in=queryset) | Q(parent_category__in=queryset))
+        public_ids = list(categories.values_list('poster_public_id', flat=True))
+        public_ids.extend(Image.objects.filter(offer__subcategory__in=categories).values_list('public_id', flat=True))
+        Image.remove_many(public_ids)
+        queryset.delete()
 
 
 class AdminCreateOfferForm(ModelForm):
@@ -236,26 +225,24 @@ class AdminControlOfferForm(ModelForm):
         model = Offer
         fields = []
 
-    def activate(self, activate):
-        """Activate offer"""
-
-        self.instance.on_sale = activate
-        self.instance.save()
+    @staticmethod
+    def bulk_activate(queryset, activate):
+        """Activate offers with one update"""
 
-    def recommend(self, recommend):
-        """Recommend offer"""
+        queryset.update(on_sale=activate, updated_on=timezone.now())
 
-        self.instance.recommended = recommend
-        self.instance.save()
+    @staticmethod
+    def bulk_recommend(queryset, recommend):
+        """Recommend offers with one update"""
 
-    def delete(self):
-        """Delete offer"""
+        queryset.update(recommended=recommend, updated_on=timezone.now())
 
-        images = Image.objects.filter(offer_id=self.instance.id)
-        for image in images:
-            Image.remove(public_id=image.public_id)
+    @staticmethod
+    def bulk_delete(queryset):
+        """Delete offers and their images"""
 
-        self.instance.delete()
+        Image.remove_many(Image.objects.filter(offer__in=queryset).values_list('public_id', flat=True))
+        queryset.delete()
 
 
 class AdminCreateMaterialForm(ModelForm):
@@ -303,7 +290,8 @@ class AdminDeleteMaterialForm(ModelForm):
         model = Material
         fields = []
 
-    def delete(self):
-        """Delete material"""
+    @staticmethod
+    def bulk_delete(queryset):
+        """Delete materials"""
 
-        self.instance.delete()
+        queryset.delete()
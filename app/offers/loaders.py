@@ -0,0 +1,59 @@
+"""DataLoaders of offer app"""
+from collections import OrderedDict, defaultdict
+
+from django.db.models import F
+from promise import Promise
+
+from api.utils.loaders import ModelLoader, RelatedListLoader
+from offers.models import Category, Image, OffersMaterial
+
+
+class CategoryLoader(ModelLoader):
+    """Load categories by id"""
+    model = Category
+
+
+class ImagesByOfferLoader(RelatedListLoader):
+    """Load the images of offers"""
+    key_field = 'offer_id'
+
+    def get_queryset(self, keys):
+        return Image.objects.filter(offer_id__in=keys).order_by('id')
+
+
+class MaterialsByOfferLoader(RelatedListLoader):
+    """Load the materials of offers"""
+    key_field = 'offer_id'
+
+    def get_queryset(self, keys):
+        return OffersMaterial.objects.filter(offer_id__in=keys).select_related('material').order_by('id')
+
+    def get_value(self, instance):
+        return instance.material
+
+
+class MaterialsBySubcategoryLoader(RelatedListLoader):
+    """
+    Load the distinct materials used by the offers of subcategories.
+    """
+    key_field = 'category_id'
+    category_lookup = 'offer__subcategory_id'
+
+    def get_queryset(self, keys):
+        lookup = {'{lookup}__in'.format(lookup=self.category_lookup): keys}
+        return OffersMaterial.objects.filter(**lookup).annotate(category_id=F(self.category_lookup)) \
+            .select_related('material').order_by('material_id')
+
+    def batch_load_fn(self, keys):  # pylint: disable=E0202
+        grouped = defaultdict(OrderedDict)
+        for offers_material in self.get_queryset(keys):
+            grouped[offers_material.category_id][offers_material.material_id] = offers_material.material
+
+        return Promise.resolve([list(grouped[key].values()) for key in keys])
+
+
+class MaterialsByParentCategoryLoader(MaterialsBySubcategoryLoader):
+    """
+    Load the distinct materials used by the offers of parent categories.
+    """
+    category_lookup = 'offer__subcategory__parent_category_id'
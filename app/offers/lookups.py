@@ -0,0 +1,68 @@
+"""
+Lookups of single offers on sale by their unique slugs and permalinks, kept in an LRU of each worker
+"""
+import operator
+from functools import reduce
+
+from django.conf import settings
+from django.db.models import Q
+
+from api.utils.db_router import is_reading_replica, may_read_stale
+from api.utils.lru import LRUCache
+from api.utils.metrics import METRICS
+from api.utils.response_cache import RESPONSE_CACHE, model_tag
+from offers.models import Offer
+
+
+class OfferLookupCache:
+    """
+    Keep the offers found by slug or permalink with the version of the offers response cache tag.
+    Every offer save or delete replaces the version, so every worker drops its entries on the next lookup.
+    """
+
+    def __init__(self, max_size=None):
+        self.offers = LRUCache(max_size or settings.OFFER_LOOKUP_CACHE_SIZE)
+
+    def get(self, **lookup):
+        """
+        Return the offer on sale matching any of some unique fields
+        :param lookup: unique field names and their values
+        :raise Offer.DoesNotExist: if no offer on sale matches
+        """
+        key = tuple(sorted(lookup.items()))
+        versions = RESPONSE_CACHE.get_versions([model_tag(Offer)])
+
+        entry = self.offers.get(key)
+        if entry is not None and entry[0] == versions:
+            return entry[1]
+
+        query = reduce(operator.or_, (Q(**{name: value}) for name, value in lookup.items()))
+        offer = Offer.objects.filter(on_sale=True).get(query)
+        if not (is_reading_replica() and may_read_stale(RESPONSE_CACHE.get_last_modified(versions))):
+            self.offers.set(key, (versions, offer))
+        return offer
+
+    def get_by_slug(self, slug, lang):
+        """Return the offer on sale with a slug in a language"""
+        return self.get(**{'slug_{lang}'.format(lang=lang): slug})
+
+    def get_by_permalink(self, permalink, lang=None):
+        """Return the offer on sale with a permalink in a language, or in any language"""
+        languages = [lang] if lang else [language for language, _ in Offer.LanguageChoices.choices]
+        return self.get(**{'permalink_{lang}'.format(lang=language): permalink for language in languages})
+
+
+OFFER_LOOKUPS = OfferLookupCache()
+
+
+def offer_lookup_metrics():
+    """Export the counters of the offer lookup LRU"""
+    stats = OFFER_LOOKUPS.offers.stats()
+    return [
+        ('offer_lookup_cache_hits', 'Offer lookup LRU hits, stale entries included', stats['hits']),
+        ('offer_lookup_cache_misses', 'Offer lookup LRU misses', stats['misses']),
+        ('offer_lookup_cache_size', 'Offers in the lookup LRU', stats['size']),
+    ]
+
+
+METRICS.register_collector(offer_lookup_metrics, counters=('offer_lookup_cache_hits', 'offer_lookup_cache_misses'))
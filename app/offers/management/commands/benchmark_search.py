@@ -0,0 +1,96 @@
+"""
+Compare the offer search with the former `icontains` title_description filter over a generated catalog
+"""
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from offers.models import Category, Offer, OfferSearch
+from offers.search import get_search_document, search_offers
+
+WORDS = (
+    'mesa', 'silla', 'sofá', 'cama', 'lámpara', 'espejo', 'armario', 'estante', 'cocina', 'baño', 'jardín', 'madera',
+    'metal', 'vidrio', 'algodón', 'cuero', 'café', 'camión', 'table', 'chair', 'couch', 'bed', 'lamp', 'mirror',
+    'wardrobe', 'shelf', 'kitchen', 'bathroom', 'garden', 'wood', 'glass', 'cotton', 'leather', 'coffee', 'truck',
+    'nuevo', 'usado', 'grande', 'pequeño', 'rojo', 'azul', 'new', 'used', 'large', 'small', 'red', 'blue',
+)
+SEARCHES = ('café', 'cafe', 'mesa madera', 'leather couch', 'lámpara azul pequeño', 'xyz')
+
+
+class Command(BaseCommand):
+    help = 'Generate a catalog of offers and compare the time of the search filter with the former icontains ' \
+           'filter. Offers are created in the configured database and deleted afterwards unless --keep is given.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--offers', type=int, default=100000, help='Offers to generate')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs of each search')
+        parser.add_argument('--keep', action='store_true', help='Keep the generated offers')
+
+    def handle(self, *args, **options):
+        parent = Category.objects.create(title_es='Benchmark', title_en='Benchmark')
+        subcategory = Category.objects.create(title_es='Search', title_en='Search', parent_category=parent)
+
+        try:
+            self.generate(subcategory, options['offers'])
+            queryset = Offer.objects.filter(subcategory=subcategory)
+
+            self.stdout.write('{search:<24}{variant:<12}{results:>10}{ms:>12}'.format(
+                search='search', variant='variant', results='results', ms='ms/query'))
+            for value in SEARCHES:
+                variants = (
+                    ('icontains', lambda value=value: self.legacy_filter(queryset, value)),
+                    ('search', lambda value=value: search_offers(queryset, value)),
+                    ('ranked', lambda value=value: search_offers(queryset, value, rank=True).order_by('-search_score')),
+                )
+                for variant, build in variants:
+                    results, duration = self.measure(build, options['repeat'])
+                    self.stdout.write('{search:<24}{variant:<12}{results:>10}{ms:>12.1f}'.format(
+                        search=value, variant=variant, results=results, ms=duration))
+        finally:
+            if not options['keep']:
+                parent.delete()
+
+    def generate(self, subcategory, count):
+        """Create offers with random titles and descriptions, and index them"""
+        generator = random.Random(0)
+        batch_size = 1000
+
+        for start in range(0, count, batch_size):
+            offers = Offer.objects.bulk_create([
+                Offer(title_es=' '.join(generator.sample(WORDS, 3)), title_en=' '.join(generator.sample(WORDS, 3)),
+                      description_es=' '.join(generator.choice(WORDS) for _ in range(30)),
+                      description_en=' '.join(generator.choice(WORDS) for _ in range(30)),
+                      subcategory=subcategory)
+                for _ in range(min(batch_size, count - start))
+            ])
+            if offers and offers[0].id is None:
+                offers = Offer.objects.filter(subcategory=subcategory).order_by('-id')[:len(offers)]
+
+            OfferSearch.objects.bulk_create([OfferSearch(offer_id=offer.id, **get_search_document(offer))
+                                             for offer in offers])
+            self.stdout.write('{count} offers'.format(count=start + len(offers)), ending='\r')
+        self.stdout.write('')
+
+    @staticmethod
+    def legacy_filter(queryset, value):
+        """The former title_description filter"""
+        title_query = Q(title_es__icontains=value) | Q(title_en__icontains=value)
+        description_query = Q(description_es__icontains=value) | Q(description_en__icontains=value)
+        return queryset.filter(title_query | description_query)
+
+    @staticmethod
+    def measure(build, repeat):
+        """
+        Run the count and the first page of a search several times
+        :return: tuple with the number of results and the mean time in milliseconds
+        """
+        results = 0
+        started = time.perf_counter()
+        for _ in range(repeat):
+            queryset = build()
+            results = queryset.count()
+            list(queryset[:settings.OFFER_FILTER_RESULT_COUNT])
+        return results, (time.perf_counter() - started) * 1000 / repeat
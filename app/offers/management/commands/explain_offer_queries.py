@@ -0,0 +1,69 @@
+"""
+Show the query plans of the canonical offer list queries
+"""
+import re
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from offers.filters import OfferFilter
+from offers.models import Category, Material, Offer
+from offers.search import get_offer_ordering
+
+FULL_SCAN_PATTERNS = {
+    'mysql': re.compile(r'"access_type": "ALL"'),
+    'sqlite': re.compile(r'\bSCAN (TABLE )?\w+(?! USING)( |$)', re.MULTILINE),
+}
+
+
+class Command(BaseCommand):
+    help = 'Run EXPLAIN on the queries of the public offer lists and flag the ones scanning a whole table'
+
+    def handle(self, *args, **options):
+        vendor = connections[Offer.objects.db].vendor
+        full_scans = 0
+
+        for name, data, sort in self.get_queries():
+            queryset = Offer.objects.filter(on_sale=True).order_by(*get_offer_ordering(sort, data.get('search')))
+            queryset = OfferFilter(data, queryset).qs
+
+            plan = queryset.explain(format='json') if vendor == 'mysql' else queryset.explain()
+            pattern = FULL_SCAN_PATTERNS.get(vendor)
+            full_scan = bool(pattern and pattern.search(plan))
+            full_scans += full_scan
+
+            self.stdout.write(self.style.WARNING('{name}: FULL SCAN'.format(name=name)) if full_scan
+                              else self.style.SUCCESS(name))
+            self.stdout.write(plan)
+            self.stdout.write('')
+
+        self.stdout.write('{count} queries with full scans'.format(count=full_scans))
+
+    @staticmethod
+    def get_queries():
+        """
+        Return the canonical queries of the Offers connection
+        :return: list of (name, filter data, sort)
+        """
+        parent_category = Category.objects.filter(parent_category=None).values_list('id', flat=True).first() or 0
+        subcategory = Category.objects.exclude(parent_category=None).values_list('id', flat=True).first() or 0
+        material = Material.objects.values_list('id', flat=True).first()
+        sort = Offer.SortChoices
+
+        queries = [
+            ('offers by created_on', {}, [sort.created_on]),
+            ('offers by updated_on', {}, [sort.updated_on]),
+            ('offers by price', {}, [sort.price]),
+            ('offers in a price range', {'price_gte': 10, 'price_lte': 100}, [sort.price]),
+            ('recommended offers', {'recommended': True}, [sort.created_on]),
+            ('subcategory offers by created_on', {'subcategory': subcategory}, [sort.created_on]),
+            ('subcategory offers by price', {'subcategory': subcategory}, [sort.price]),
+            ('subcategory offers in a price range', {'subcategory': subcategory, 'price_gte': 10, 'price_lte': 100},
+             [sort.price]),
+            ('parent category offers', {'parent_category': parent_category}, [sort.created_on]),
+            ('offer search by relevance', {'search': 'mesa'}, [sort.relevance, sort.created_on]),
+        ]
+        if material is not None:
+            queries.append(('offers by material', {'materials': [material]}, [sort.created_on]))
+
+        return queries
@@ -0,0 +1,70 @@
+# Generated by Django 2.2.3 on 2020-08-15 10:21
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+WORD_RE = re.compile(r'[^\W_]+')
+
+
+def normalize_search_text(*texts):
+    """Join texts, lowercase them and strip their accents and punctuation, as offers.search does"""
+    text = unicodedata.normalize('NFKD', ' '.join(text for text in texts if text))
+    text = ''.join(character for character in text if not unicodedata.combining(character)).casefold()
+    return ' '.join(WORD_RE.findall(text))
+
+
+def create_fulltext_indexes(apps, schema_editor):
+    """Add the FULLTEXT indexes of the search table on MySQL"""
+    if schema_editor.connection.vendor != 'mysql':
+        return
+
+    # index stopwords too, so every word of a query can be required
+    schema_editor.execute('SET SESSION innodb_ft_enable_stopword = 0')
+    schema_editor.execute('ALTER TABLE offers_offersearch ADD FULLTEXT INDEX offers_search_title_body (title, body)')
+    schema_editor.execute('ALTER TABLE offers_offersearch ADD FULLTEXT INDEX offers_search_title (title)')
+
+
+def drop_fulltext_indexes(apps, schema_editor):
+    """Drop the FULLTEXT indexes of the search table on MySQL"""
+    if schema_editor.connection.vendor != 'mysql':
+        return
+
+    schema_editor.execute('ALTER TABLE offers_offersearch DROP INDEX offers_search_title_body')
+    schema_editor.execute('ALTER TABLE offers_offersearch DROP INDEX offers_search_title')
+
+
+def populate_search(apps, schema_editor):
+    """Index the existing offers"""
+    Offer = apps.get_model('offers', 'Offer')
+    OfferSearch = apps.get_model('offers', 'OfferSearch')
+
+    queryset = Offer.objects.only('id', 'title_es', 'title_en', 'description_es', 'description_en')
+    OfferSearch.objects.bulk_create(
+        [OfferSearch(offer_id=offer.id, title=normalize_search_text(offer.title_es, offer.title_en),
+                     body=normalize_search_text(offer.description_es, offer.description_en))
+         for offer in queryset.iterator()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('offers', '0006_offer_recommended'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OfferSearch',
+            fields=[
+                ('offer', models.OneToOneField(help_text='Related offer', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search', serialize=False, to='offers.Offer')),
+                ('title', models.TextField(help_text='Normalized spanish and english titles')),
+                ('body', models.TextField(help_text='Normalized spanish and english descriptions')),
+            ],
+        ),
+        migrations.RunPython(create_fulltext_indexes, drop_fulltext_indexes),
+        migrations.RunPython(populate_search, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 2.2.3 on 2020-08-16 18:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('offers', '0007_offersearch'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='offer',
+            index=models.Index(fields=['on_sale', 'created_on'], name='offer_sale_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='offer',
+            index=models.Index(fields=['on_sale', 'updated_on'], name='offer_sale_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='offer',
+            index=models.Index(fields=['on_sale', 'price'], name='offer_sale_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='offer',
+            index=models.Index(fields=['on_sale', 'subcategory', 'created_on'], name='offer_sale_sub_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='offer',
+            index=models.Index(fields=['on_sale', 'subcategory', 'price'], name='offer_sale_sub_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='offer',
+            index=models.Index(fields=['on_sale', 'recommended', 'created_on'], name='offer_sale_rec_created_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 2.2.3 on 2026-10-18 00:14
+
+import api.utils.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('offers', '0008_offer_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='offer',
+            name='currency',
+            field=api.utils.fields.EnumField(blank=True, choices=[('CUC', 'Cuban Convertible Peso'), ('USD', 'US Dollar'), ('CUP', 'Cuban Peso')], default='CUC', help_text='Currency type', null=True),
+        ),
+    ]
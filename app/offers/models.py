@@ -1,10 +1,11 @@
 from django.conf import settings
 from django.db import models
 from django.utils.text import slugify
-from django_mysql.models import EnumField
 from djchoices import DjangoChoices, ChoiceItem
 from cloudinary import api as cloudinary_api
 
+from api.utils.fields import EnumField
+
 
 class Category(models.Model):
     """Offer's categories model. Each offer belongs to a category"""
@@ -47,6 +48,17 @@ class Category(models.Model):
         self.slug_es = slug_es
         self.slug_en = slug_en
 
+    def get_permalink_prefix(self, language):
+        """
+        Return the path of the permalinks of the offers of a subcategory, made of its parent and its own slug
+        :param language: `es` or `en`
+        """
+        category_data = getattr(self, 'slug_{language}'.format(language=language)).split('_')
+        return '/{parent_category_slug}/{subcategory_slug}/'.format(
+            parent_category_slug=category_data[0],
+            subcategory_slug=category_data[1],
+        )
+
 
 class Offer(models.Model):
     """Offer definition"""
@@ -58,6 +70,14 @@ class Offer(models.Model):
         price = ChoiceItem("price", 'Sort by price')
         created_on = ChoiceItem("created_on", 'Sort by created_on')
         updated_on = ChoiceItem("updated_on", 'sort by updated_on')
+        relevance = ChoiceItem("relevance", 'Sort by relevance to the search filter')
+
+    class LanguageChoices(DjangoChoices):
+        """
+        Languages of the slugs and permalinks
+        """
+        es = ChoiceItem('es', 'Spanish')
+        en = ChoiceItem('en', 'English')
 
     class CurrencyChoices(DjangoChoices):
         """
@@ -88,9 +108,57 @@ class Offer(models.Model):
     subcategory = models.ForeignKey(Category, help_text='Related category', on_delete=models.CASCADE)
     recommended = models.BooleanField(default=False, help_text='Offer is recommended')
 
+    class Meta:
+        """Model meta-class data"""
+        # access paths of the public offer lists: on sale offers, optionally in a subcategory, sorted by SortChoices
+        indexes = [
+            models.Index(fields=['on_sale', 'created_on'], name='offer_sale_created_idx'),
+            models.Index(fields=['on_sale', 'updated_on'], name='offer_sale_updated_idx'),
+            models.Index(fields=['on_sale', 'price'], name='offer_sale_price_idx'),
+            models.Index(fields=['on_sale', 'subcategory', 'created_on'], name='offer_sale_sub_created_idx'),
+            models.Index(fields=['on_sale', 'subcategory', 'price'], name='offer_sale_sub_price_idx'),
+            models.Index(fields=['on_sale', 'recommended', 'created_on'], name='offer_sale_rec_created_idx'),
+        ]
+
+    # fields whose saved values are remembered to know which ones a save changes
+    TRACKED_FIELDS = ('title_es', 'title_en', 'description_es', 'description_en', 'subcategory_id')
+    # fields the slugs and permalinks are generated from, and the generated fields
+    SLUG_SOURCE_FIELDS = ('title_es', 'title_en', 'subcategory_id')
+    SLUG_FIELDS = ('slug_es', 'slug_en', 'permalink_es', 'permalink_en')
+
+    def __init__(self, *args, **kwargs):
+        super(Offer, self).__init__(*args, **kwargs)
+        # saved values of the tracked fields, None until the offer is loaded or saved
+        self._saved_values = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(Offer, cls).from_db(db, field_names, values)
+        instance.remember_saved_values()
+        return instance
+
+    def remember_saved_values(self):
+        """Remember the current values of the tracked fields as the saved ones"""
+        self._saved_values = {name: self.__dict__[name] for name in self.TRACKED_FIELDS if name in self.__dict__}
+
+    def has_changed(self, *names):
+        """
+        Check if some tracked fields changed since the offer was loaded or saved. Fields never loaded did not change.
+        :param names: tracked field names
+        """
+        if self._saved_values is None:
+            return True
+
+        return any(name in self.__dict__ and (name not in self._saved_values or
+                                              self._saved_values[name] != self.__dict__[name])
+                   for name in names)
+
     # pylint: disable=W1113,W0221
     def save(self, *args, **kwargs):
-        """Create Offer"""
+        """
+        Create or update Offer. Slugs and permalinks need the offer id: updates generate them before their single
+        write, only when a title or the subcategory changed, and creates write them after the insert.
+        """
 
         self.generate_short_description()
 
@@ -98,11 +166,18 @@ class Offer(models.Model):
         if self.price is None:
             self.currency = None
 
-        super(Offer, self).save(*args, **kwargs)
+        creating = self.id is None
+        if not creating and (self.slug_es is None or self.has_changed(*self.SLUG_SOURCE_FIELDS)):
+            self.generate_slug_and_permalink()
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = set(kwargs['update_fields']).union(self.SLUG_FIELDS)
 
-        self.generate_slug_and_permalink()
+        super(Offer, self).save(*args, **kwargs)
+        self.remember_saved_values()
 
-        super(Offer, self).save()
+        if creating:
+            self.generate_slug_and_permalink()
+            super(Offer, self).save(update_fields=self.SLUG_FIELDS)
 
     def generate_slug_and_permalink(self):
         """
@@ -112,16 +187,12 @@ class Offer(models.Model):
         unique_title_en = "{slug}-{id}".format(slug=self.title_en, id=self.id)
         unique_slug_es = slugify(unique_title_es)
         unique_slug_en = slugify(unique_title_en)
-        category_data_es = self.subcategory.slug_es.split('_')
-        category_data_en = self.subcategory.slug_en.split('_')
-        permalink_es = '/{parent_category_slug}/{subcategory_slug}/{offer_slug}.html'.format(
-            parent_category_slug=category_data_es[0],
-            subcategory_slug=category_data_es[1],
+        permalink_es = '{prefix}{offer_slug}.html'.format(
+            prefix=self.subcategory.get_permalink_prefix('es'),
             offer_slug=unique_slug_es
         )
-        permalink_en = '/{parent_category_slug}/{subcategory_slug}/{offer_slug}.html'.format(
-            parent_category_slug=category_data_en[0],
-            subcategory_slug=category_data_en[1],
+        permalink_en = '{prefix}{offer_slug}.html'.format(
+            prefix=self.subcategory.get_permalink_prefix('en'),
             offer_slug=unique_slug_en
         )
 
@@ -162,6 +233,9 @@ class Image(models.Model):
     public_id = models.CharField(max_length=150, help_text='Image public_id')
     offer = models.ForeignKey(Offer, help_text='Related offer', on_delete=models.CASCADE)
 
+    # max public ids of a delete request of the storage api
+    REMOVE_BATCH_SIZE = 100
+
     @staticmethod
     def remove(public_id):
         """Remove image from storage"""
@@ -169,6 +243,14 @@ class Image(models.Model):
         if public_id:
             cloudinary_api.delete_resources(public_id)
 
+    @classmethod
+    def remove_many(cls, public_ids):
+        """Remove images from storage, with one request for each batch of them"""
+
+        public_ids = [public_id for public_id in public_ids if public_id]
+        for start in range(0, len(public_ids), cls.REMOVE_BATCH_SIZE):
+            cloudinary_api.delete_resources(public_ids[start:start + cls.REMOVE_BATCH_SIZE])
+
 
 class Material(models.Model):
     """Material model"""
@@ -186,3 +268,15 @@ class OffersMaterial(models.Model):
     class Meta:
         """Model meta-class data"""
         unique_together = ('offer', 'material')
+
+
+class OfferSearch(models.Model):
+    """
+    Normalized text of an offer, kept in sync with it and indexed for full-text search.
+    Spanish and English texts are lowercased and stripped of accents and punctuation.
+    """
+
+    offer = models.OneToOneField(Offer, primary_key=True, related_name='search', on_delete=models.CASCADE,
+                                 help_text='Related offer')
+    title = models.TextField(help_text='Normalized spanish and english titles')
+    body = models.TextField(help_text='Normalized spanish and english descriptions')
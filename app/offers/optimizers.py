@@ -0,0 +1,31 @@
+"""Queryset optimizers of offer app"""
+from django.db.models import Prefetch
+
+from api.utils.optimizer import QuerysetOptimizer
+from offers.models import Image, OffersMaterial
+
+
+class OfferConnectionOptimizer(QuerysetOptimizer):
+    """Optimizer for the offers returned by the `Offers` connection"""
+    node_path = ('edges', 'node')
+    only_fields = {
+        'id': ('id',),
+        'price': ('price',),
+        'onSale': ('on_sale',),
+        'createdOn': ('created_on',),
+        'updatedOn': ('updated_on',),
+        'recommended': ('recommended',),
+        'title': ('title_es', 'title_en'),
+        'description': ('description_es', 'description_en'),
+        'shortDescription': ('short_description_es', 'short_description_en'),
+        'slug': ('slug_es', 'slug_en'),
+        'permalink': ('permalink_es', 'permalink_en'),
+        'subcategory': ('subcategory',),
+        'images': (),
+        'materials': (),
+    }
+    prefetch_related = {
+        'images': (Prefetch('image_set', queryset=Image.objects.order_by('id')),),
+        'materials': (Prefetch('offersmaterial_set',
+                               queryset=OffersMaterial.objects.select_related('material').order_by('id')),),
+    }
@@ -0,0 +1,66 @@
+"""
+Set-based regeneration of the slugs and permalinks that depend on a category
+"""
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, CharField, Value, When
+from django.db.models.functions import Concat
+
+from api.utils.background import run_in_background
+from api.utils.response_cache import invalidate_models
+from offers.category_tree import CATEGORY_TREE
+from offers.models import Category, Offer
+
+
+def permalink_expression(subcategories, language):
+    """
+    Return the expression of the permalinks of the offers of some subcategories in a language
+    :param subcategories: list of Category
+    :param language: `es` or `en`
+    """
+    prefix = Case(*[When(subcategory_id=subcategory.id, then=Value(subcategory.get_permalink_prefix(language)))
+                    for subcategory in subcategories], output_field=CharField())
+    return Concat(prefix, 'slug_{language}'.format(language=language), Value('.html'), output_field=CharField())
+
+
+def regenerate_permalinks(category_id):
+    """
+    Regenerate in one transaction the slugs of the subcategories of a category and the permalinks of its offers:
+    one UPDATE for the subcategories and one for the offers, whatever their number.
+    Bulk updates send no signals, so the category tree and the cached responses are invalidated here.
+    :param category_id: id of the renamed or moved category
+    """
+    with transaction.atomic():
+        category = Category.objects.filter(id=category_id).first()
+        if category is None:
+            return
+
+        if category.parent_category_id is None:
+            subcategories = list(category.category_set.all())
+            for subcategory in subcategories:
+                subcategory.generate_slug()
+            Category.objects.bulk_update(subcategories, ['slug_es', 'slug_en'])
+        else:
+            subcategories = [category]
+
+        if subcategories:
+            Offer.objects.filter(subcategory__in=subcategories).update(
+                permalink_es=permalink_expression(subcategories, 'es'),
+                permalink_en=permalink_expression(subcategories, 'en'),
+            )
+
+        CATEGORY_TREE.invalidate()
+        transaction.on_commit(partial(invalidate_models, Category, Offer))
+
+
+def schedule_permalinks_regeneration(category_id):
+    """
+    Regenerate the permalinks of a category now, or in the background once the current transaction is committed
+    when CATEGORY_PERMALINKS_BACKGROUND is set
+    """
+    if settings.CATEGORY_PERMALINKS_BACKGROUND:
+        run_in_background(partial(regenerate_permalinks, category_id))
+    else:
+        regenerate_permalinks(category_id)
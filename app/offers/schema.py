@@ -1,14 +1,24 @@
 """Schema for offer app"""
 import graphene
 from graphene_django import DjangoObjectType
-from graphene_django.filter import DjangoFilterConnectionField
+from graphene_django.filter.utils import get_filtering_args_from_filterset
 
+from api.utils.loaders import get_loader, get_prefetched
+from api.utils.pagination import CountableConnection, KeysetFilterConnectionField
 from api.utils.schema import django_choice_to_type
-from offers.exceptions import CategoryDoesNotExist
+from offers.exceptions import CategoryDoesNotExist, OfferDoesNotExist
+from offers.facets import get_material_facets, get_price_facets
 from offers.filters import OfferFilter
+from offers.category_tree import get_category_tree
+from offers.lookups import OFFER_LOOKUPS
+from offers.loaders import CategoryLoader, ImagesByOfferLoader, MaterialsByOfferLoader, \
+    MaterialsBySubcategoryLoader, MaterialsByParentCategoryLoader
 from offers.models import Category, Offer, Image, Material, OffersMaterial
+from offers.optimizers import OfferConnectionOptimizer
+from offers.search import get_offer_ordering
 
 SortChoices = django_choice_to_type('SortChoices', Offer.SortChoices)  # pylint: disable=C0103
+LanguageChoices = django_choice_to_type('LanguageChoices', Offer.LanguageChoices)  # pylint: disable=C0103
 
 
 class LanguageType(graphene.ObjectType):
@@ -61,14 +71,39 @@ class OfferType(DjangoObjectType):
         model = Offer
         fields = ('id', 'price', 'subcategory', 'on_sale', 'created_on', 'updated_on', 'recommended',)
         use_connection = True
+        connection_class = CountableConnection
+
+    @classmethod
+    def get_queryset(cls, queryset, info):
+        """Add the lookups needed by the selected fields to every offers connection"""
+        return OfferConnectionOptimizer.optimize(queryset, info)
 
     def resolve_images(self, info, **kwargs):
         """Resolve list of images"""
-        return self.image_set.all()
+        images = get_prefetched(self, 'image_set')
+        if images is not None:
+            return images
+
+        return get_loader(info, ImagesByOfferLoader).load(self.id)
 
     def resolve_materials(self, info, **kwargs):
         """Resolve list of materials"""
-        return [offers_material.material for offers_material in self.offersmaterial_set.all()]
+        offers_materials = get_prefetched(self, 'offersmaterial_set')
+        if offers_materials is not None:
+            return [offers_material.material for offers_material in offers_materials]
+
+        return get_loader(info, MaterialsByOfferLoader).load(self.id)
+
+    def resolve_subcategory(self, info, **kwargs):
+        """Resolve subcategory"""
+        if Offer.subcategory.is_cached(self):
+            return self.subcategory
+
+        subcategory = get_category_tree(info.context).get(id=self.subcategory_id)
+        if subcategory is not None:
+            return subcategory
+
+        return get_loader(info, CategoryLoader).load(self.subcategory_id)
 
     def resolve_title(self, info, **kwargs):
         """Resolve title"""
@@ -91,7 +126,61 @@ class OfferType(DjangoObjectType):
         return LanguageType(es=self.permalink_es, en=self.permalink_en)
 
 
-Offers = DjangoFilterConnectionField(OfferType, filterset_class=OfferFilter,
+class MaterialFacetType(graphene.ObjectType):
+    """Material of the offers of a list, with the number of offers made of it"""
+    cache_models = (Offer, OffersMaterial, Category)
+
+    material = graphene.Field(MaterialType)
+    count = graphene.Int(description='Number of offers with the material')
+
+
+def material_facets_field(description):
+    """Return a materialFacets field, taking the filter arguments of the offers connection"""
+    return graphene.List(MaterialFacetType, description=description,
+                         **get_filtering_args_from_filterset(OfferFilter, OfferType))
+
+
+def resolve_material_facets(queryset, kwargs):
+    """Return the MaterialFacetType list of the offers of a queryset matching the filter arguments"""
+    return [MaterialFacetType(material=material, count=material.offer_count)
+            for material in get_material_facets(queryset, kwargs)]
+
+
+class PriceBucketType(graphene.ObjectType):
+    """Price range of a histogram, with the number of offers priced in it"""
+
+    min = graphene.Float()
+    max = graphene.Float()
+    count = graphene.Int(description='Number of offers with a price in the range, the max included in the last one')
+
+
+class PriceFacetType(graphene.ObjectType):
+    """Price range and histogram of the offers in a currency"""
+
+    currency = graphene.String()
+    min = graphene.Float()
+    max = graphene.Float()
+    count = graphene.Int(description='Number of offers with a price in the currency')
+    buckets = graphene.List(PriceBucketType)
+
+    def resolve_buckets(self, info):
+        """Resolve buckets"""
+        return [PriceBucketType(**bucket) for bucket in self.buckets]
+
+
+class PriceFacetsType(graphene.ObjectType):
+    """Prices of the offers of a list"""
+    cache_models = (Offer, Category)
+
+    currencies = graphene.List(PriceFacetType)
+    without_price = graphene.Int(description='Number of offers without a price')
+
+    def resolve_currencies(self, info):
+        """Resolve currencies"""
+        return [PriceFacetType(**facet) for facet in self.currencies]
+
+
+Offers = KeysetFilterConnectionField(OfferType, filterset_class=OfferFilter,
                                      sort=graphene.Argument(graphene.List(SortChoices)),
                                      description='Category offers')
 
@@ -110,6 +199,8 @@ class CategoryType(DjangoObjectType):
     subcategories = graphene.List(lambda: CategoryType, description='Subcategories children of this category')
     offers = Offers
     materials = graphene.List(MaterialType, description='Offers materials list')
+    material_facets = material_facets_field('Materials of the category offers matching the filters, with their '
+                                            'number of offers. The materials filter is ignored')
     title = graphene.Field(LanguageType)
     description = graphene.Field(LanguageType)
     slug = graphene.Field(LanguageType)
@@ -119,18 +210,32 @@ class CategoryType(DjangoObjectType):
         Resolve all subcategories of a given category.
         :param info: Schema info
         """
-        return self.category_set.all().order_by('order')
+        return get_category_tree(info.context).get_children(self.id)
+
+    def resolve_parent_category(self, info, **kwargs):
+        """Resolve parent category"""
+        if self.parent_category_id is None:
+            return None
+
+        if Category.parent_category.is_cached(self):
+            return self.parent_category
+
+        parent_category = get_category_tree(info.context).get(id=self.parent_category_id)
+        if parent_category is not None:
+            return parent_category
+
+        return get_loader(info, CategoryLoader).load(self.parent_category_id)
 
     @classmethod
     def resolve_offers(cls, instance, info, sort=Offer.SortChoices.created_on, **kwargs):  # pylint: disable=W0102
         """Resolve offers"""
-        if not isinstance(sort, list):
-            sort = [sort]
+        sort = get_offer_ordering(sort, kwargs.get('search'))
 
-        if not instance.parent_category:
-            return Offer.objects.filter(on_sale=True).filter(subcategory__parent_category_id=instance.id)
+        offers = Offer.objects.filter(on_sale=True)
+        if not instance.parent_category_id:
+            return offers.filter(subcategory__parent_category_id=instance.id).order_by(*sort)
 
-        return Offer.objects.filter(on_sale=True).filter(subcategory_id=instance.id).order_by(*sort)
+        return offers.filter(subcategory_id=instance.id).order_by(*sort)
 
     def resolve_title(self, info, **kwargs):
         """Resolve title"""
@@ -147,12 +252,19 @@ class CategoryType(DjangoObjectType):
     def resolve_materials(self, info, **kwargs):
         """Resolve list of materials"""
 
-        if not self.parent_category:
-            return set([offers_material.material for offers_material in
-                        OffersMaterial.objects.filter(offer__subcategory__parent_category_id=self.id)])
+        if not self.parent_category_id:
+            return get_loader(info, MaterialsByParentCategoryLoader).load(self.id)
 
-        return set([offers_material.material for offers_material in
-                    OffersMaterial.objects.filter(offer__subcategory_id=self.id)])
+        return get_loader(info, MaterialsBySubcategoryLoader).load(self.id)
+
+    def resolve_material_facets(self, info, **kwargs):
+        """Resolve the material facets of the category offers"""
+        if not self.parent_category_id:
+            queryset = Offer.objects.filter(on_sale=True, subcategory__parent_category_id=self.id)
+        else:
+            queryset = Offer.objects.filter(on_sale=True, subcategory_id=self.id)
+
+        return resolve_material_facets(queryset, kwargs)
 
 
 class CategoryQuery:
@@ -171,7 +283,7 @@ class CategoryQuery:
         :param info: Schema info
         :return: All parent categories
         """
-        return Category.objects.filter(parent_category=None).order_by('order')
+        return get_category_tree(info.context).roots
 
     @classmethod
     def resolve_category(cls, instance, info, **kwargs):
@@ -195,22 +307,42 @@ class CategoryQuery:
         else:
             args = {'slug_en': kwargs['slug_en']}
 
-        return Category.objects.get(**args)
+        category = get_category_tree(info.context).get(**args)
+        if category is None:
+            raise Category.DoesNotExist('Category matching query does not exist.')
+
+        return category
 
 
 class OfferQuery:
     """Root class of the offer model queries"""
-    offer = graphene.Field(OfferType, id=graphene.Int(), description='Return a offer instance')
+    offer = graphene.Field(OfferType, id=graphene.Int(), permalink=graphene.String(), slug=graphene.String(),
+                           lang=LanguageChoices(description='Language of the slug or permalink, the permalinks match '
+                                                            'any language when it is not given'),
+                           description='Return a offer instance by id, permalink or slug')
     offers = Offers
+    material_facets = material_facets_field('Materials of the offers matching the filters, with their number of '
+                                            'offers. The materials filter is ignored')
+    price_facets = graphene.Field(PriceFacetsType, buckets=graphene.Int(default_value=10),
+                                  description='Price range and histogram by currency of the offers matching the '
+                                              'filters. The price filters are ignored',
+                                  **get_filtering_args_from_filterset(OfferFilter, OfferType))
 
     @classmethod
-    def resolve_offer(cls, instance, info, id, **kwargs):
+    def resolve_offer(cls, instance, info, id=None, permalink=None, slug=None, lang=None):  # pylint: disable=R0913
         """
-        Resolve single offer using id.
+        Resolve single offer using id, permalink or slug.
         :param instance: Query instance
         :param info: Schema info
         :return: OfferType node of Offer model.
         """
+        if [id, permalink, slug].count(None) != 2:
+            raise OfferDoesNotExist()
+
+        if permalink is not None:
+            return OFFER_LOOKUPS.get_by_permalink(permalink, lang)
+        if slug is not None:
+            return OFFER_LOOKUPS.get_by_slug(slug, lang or Offer.LanguageChoices.es)
 
         return Offer.objects.filter(on_sale=True).get(id=id)
 
@@ -218,11 +350,31 @@ class OfferQuery:
     def resolve_offers(cls, instance, info, sort=Offer.SortChoices.created_on, **kwargs):  # pylint: disable=W0102
         """Resolve offers"""
 
-        if not isinstance(sort, list):
-            sort = [sort]
+        sort = get_offer_ordering(sort, kwargs.get('search'))
 
         return Offer.objects.filter(on_sale=True).order_by(*sort)
 
+    @classmethod
+    def resolve_material_facets(cls, instance, info, **kwargs):
+        """
+        Resolve the material facets of the offers on sale
+        :param instance: Query instance
+        :param info: Schema info
+        :return: list of MaterialFacetType
+        """
+        return resolve_material_facets(Offer.objects.filter(on_sale=True), kwargs)
+
+    @classmethod
+    def resolve_price_facets(cls, instance, info, buckets, **kwargs):
+        """
+        Resolve the price facets of the offers on sale
+        :param instance: Query instance
+        :param info: Schema info
+        :param buckets: number of histogram buckets of each currency
+        :return: PriceFacetsType
+        """
+        return PriceFacetsType(**get_price_facets(Offer.objects.filter(on_sale=True), kwargs, buckets))
+
 
 class MaterialQuery:
     """
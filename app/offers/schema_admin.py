@@ -9,6 +9,7 @@ from offers.forms import AdminCreateOfferForm, AdminUpdateOfferForm, AdminContro
     AdminDeleteMaterialForm
 from offers.models import Offer, Category, Image, Material
 from offers.schema import OfferType, CategoryType, Offers, CategoryQuery, MaterialType
+from offers.search import get_offer_ordering
 
 
 class AdminCategoryType(CategoryType):
@@ -24,11 +25,10 @@ class AdminCategoryType(CategoryType):
     @classmethod
     def resolve_offers(cls, instance, info, sort=Offer.SortChoices.created_on, **kwargs):  # pylint: disable=W0102
         """Resolve offers"""
-        if not isinstance(sort, list):
-            sort = [sort]
+        sort = get_offer_ordering(sort, kwargs.get('search'))
 
-        if not instance.parent_category:
-            return Offer.objects.filter(subcategory__parent_category_id=instance.id)
+        if not instance.parent_category_id:
+            return Offer.objects.filter(subcategory__parent_category_id=instance.id).order_by(*sort)
 
         return Offer.objects.filter(subcategory_id=instance.id).order_by(*sort)
 
@@ -113,19 +113,7 @@ class AdminDeleteCategoryMutation(LoginRequiredMutation, BulkDjangoFormMutation)
         """Meta Class"""
         model = Category
         form_class = AdminDeleteCategoryForm
-
-    @classmethod
-    def perform_mutate(cls, form, info):
-        """
-        Factory method of this mutation
-        :type form: AdminDeleteCategoryForm
-        :param form: Django form
-        :param info: Schema info
-        :return: instance of this class
-        """
-        category_id = form.instance.id
-        form.delete()
-        return category_id
+        bulk_operation = 'bulk_delete'
 
 
 class AdminCreateOfferMutation(LoginRequiredMutation, DjangoModelFormMutation):
@@ -197,19 +185,7 @@ class AdminDeleteOfferMutation(LoginRequiredMutation, BulkDjangoFormMutation):
         """Meta Class"""
         model = Offer
         form_class = AdminControlOfferForm
-
-    @classmethod
-    def perform_mutate(cls, form, info):
-        """
-        Factory method of this mutation
-        :type form: AdminUpdateOfferForm
-        :param form: Django form
-        :param info: Schema info
-        :return: instance of this class
-        """
-        offer_id = form.instance.id
-        form.delete()
-        return offer_id
+        bulk_operation = 'bulk_delete'
 
 
 class AdminActivateOfferMutation(LoginRequiredMutation, BulkDjangoFormMutation):
@@ -219,19 +195,8 @@ class AdminActivateOfferMutation(LoginRequiredMutation, BulkDjangoFormMutation):
         """Meta Class"""
         model = Offer
         form_class = AdminControlOfferForm
-
-    @classmethod
-    def perform_mutate(cls, form, info):
-        """
-        Factory method of this mutation
-        :type form: AdminUpdateOfferForm
-        :param form: Django form
-        :param info: Schema info
-        :return: instance of this class
-        """
-        offer_id = form.instance.id
-        form.activate(True)
-        return offer_id
+        bulk_operation = 'bulk_activate'
+        bulk_arguments = (True,)
 
 
 class AdminDisableOfferMutation(LoginRequiredMutation, BulkDjangoFormMutation):
@@ -241,19 +206,8 @@ class AdminDisableOfferMutation(LoginRequiredMutation, BulkDjangoFormMutation):
         """Meta Class"""
         model = Offer
         form_class = AdminControlOfferForm
-
-    @classmethod
-    def perform_mutate(cls, form, info):
-        """
-        Factory method of this mutation
-        :type form: AdminUpdateOfferForm
-        :param form: Django form
-        :param info: Schema info
-        :return: instance of this class
-        """
-        offer_id = form.instance.id
-        form.activate(False)
-        return offer_id
+        bulk_operation = 'bulk_activate'
+        bulk_arguments = (False,)
 
 
 class AdminAddRecommendOfferMutation(LoginRequiredMutation, BulkDjangoFormMutation):
@@ -263,19 +217,8 @@ class AdminAddRecommendOfferMutation(LoginRequiredMutation, BulkDjangoFormMutati
         """Meta Class"""
         model = Offer
         form_class = AdminControlOfferForm
-
-    @classmethod
-    def perform_mutate(cls, form, info):
-        """
-        Factory method of this mutation
-        :type form: AdminUpdateOfferForm
-        :param form: Django form
-        :param info: Schema info
-        :return: instance of this class
-        """
-        offer_id = form.instance.id
-        form.recommend(True)
-        return offer_id
+        bulk_operation = 'bulk_recommend'
+        bulk_arguments = (True,)
 
 
 class AdminDeleteRecommendOfferMutation(LoginRequiredMutation, BulkDjangoFormMutation):
@@ -285,19 +228,8 @@ class AdminDeleteRecommendOfferMutation(LoginRequiredMutation, BulkDjangoFormMut
         """Meta Class"""
         model = Offer
         form_class = AdminControlOfferForm
-
-    @classmethod
-    def perform_mutate(cls, form, info):
-        """
-        Factory method of this mutation
-        :type form: AdminUpdateOfferForm
-        :param form: Django form
-        :param info: Schema info
-        :return: instance of this class
-        """
-        offer_id = form.instance.id
-        form.recommend(False)
-        return offer_id
+        bulk_operation = 'bulk_recommend'
+        bulk_arguments = (False,)
 
 
 class AdminDeleteImageMutation(Mutation):
@@ -376,19 +308,7 @@ class AdminDeleteMaterialMutation(LoginRequiredMutation, BulkDjangoFormMutation)
         """Meta Class"""
         model = Material
         form_class = AdminDeleteMaterialForm
-
-    @classmethod
-    def perform_mutate(cls, form, info):
-        """
-        Factory method of this mutation
-        :type form: AdminDeleteMaterialForm
-        :param form: Django form
-        :param info: Schema info
-        :return: instance of this class
-        """
-        material_id = form.instance.id
-        form.delete()
-        return material_id
+        bulk_operation = 'bulk_delete'
 
 
 class AdminCategoryQuery(CategoryQuery):
@@ -420,8 +340,7 @@ class AdminOfferQuery:
     def resolve_offers(cls, instance, info, sort=Offer.SortChoices.created_on, **kwargs):  # pylint: disable=W0102
         """Resolve offers"""
 
-        if not isinstance(sort, list):
-            sort = [sort]
+        sort = get_offer_ordering(sort, kwargs.get('search'))
 
         return Offer.objects.order_by(*sort)
 
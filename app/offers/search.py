@@ -0,0 +1,193 @@
+"""
+Full-text search of offers over the normalized texts kept in OfferSearch
+"""
+import re
+import unicodedata
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Case, FloatField, Func, IntegerField, Q, Value, When
+
+from offers.models import Offer, OfferSearch
+
+WORD_RE = re.compile(r'[^\W_]+')
+
+
+def normalize_search_text(*texts):
+    """
+    Join texts, lowercase them and strip their accents and punctuation
+    :return: space separated words
+    """
+    text = unicodedata.normalize('NFKD', ' '.join(text for text in texts if text))
+    text = ''.join(character for character in text if not unicodedata.combining(character)).casefold()
+    return ' '.join(WORD_RE.findall(text))
+
+
+def get_search_document(offer):
+    """
+    Return the normalized texts of an offer
+    :return: dict with the `title` and `body` of its OfferSearch
+    """
+    return {
+        'title': normalize_search_text(offer.title_es, offer.title_en),
+        'body': normalize_search_text(offer.description_es, offer.description_en),
+    }
+
+
+def get_search_terms(value):
+    """Return the distinct normalized words of a search"""
+    terms = []
+    for term in normalize_search_text(value).split():
+        if term not in terms:
+            terms.append(term)
+    return terms[:settings.OFFER_SEARCH_MAX_TERMS]
+
+
+def update_offer_search(offer):
+    """Index the current texts of an offer"""
+    document = get_search_document(offer)
+    if not OfferSearch.objects.filter(offer_id=offer.id).update(**document):
+        OfferSearch.objects.create(offer_id=offer.id, **document)
+
+
+# Offer fields the search texts are made of
+SEARCH_SOURCE_FIELDS = ('title_es', 'title_en', 'description_es', 'description_en')
+
+
+def index_offer(sender, instance, created=False, **kwargs):  # pylint: disable=W0613
+    """Signal receiver indexing a saved offer, when it is new or its texts changed"""
+    if created or instance.has_changed(*SEARCH_SOURCE_FIELDS):
+        update_offer_search(instance)
+
+
+class SimpleSearchBackend:
+    """
+    Portable backend matching every term as a substring of the normalized texts.
+    Used on databases without FULLTEXT indexes, like the SQLite databases of tests.
+    """
+    title_weight = 2
+
+    @staticmethod
+    def term_query(term):
+        """Return the condition of an offer containing a term"""
+        return Q(search__title__contains=term) | Q(search__body__contains=term)
+
+    def filter(self, queryset, terms):
+        """Keep the offers containing every term"""
+        query = Q()
+        for term in terms:
+            query &= self.term_query(term)
+        return queryset.filter(query)
+
+    def score(self, terms):
+        """Return the relevance expression of the offers: matches in titles weigh more"""
+        score = Value(0, output_field=IntegerField())
+        for term in terms:
+            score = score + Case(When(search__title__contains=term, then=Value(self.title_weight)),
+                                 When(search__body__contains=term, then=Value(1)),
+                                 default=Value(0), output_field=IntegerField())
+        return score
+
+
+class SearchMatch(Func):  # pylint: disable=W0223
+    """`MATCH (columns) AGAINST (query IN BOOLEAN MODE)` of MySQL"""
+    output_field = FloatField()
+
+    def __init__(self, *columns, query):
+        super(SearchMatch, self).__init__(*columns, Value(query))
+
+    def as_sql(self, compiler, connection, **extra_context):  # pylint: disable=W0221
+        sql_parts = []
+        params = []
+        for expression in self.source_expressions:
+            sql, expression_params = compiler.compile(expression)
+            sql_parts.append(sql)
+            params.extend(expression_params)
+
+        return 'MATCH ({columns}) AGAINST ({query} IN BOOLEAN MODE)'.format(
+            columns=', '.join(sql_parts[:-1]), query=sql_parts[-1]), params
+
+
+class MySQLSearchBackend(SimpleSearchBackend):
+    """
+    Backend using the FULLTEXT indexes of the search table. Terms shorter than the minimum token size of
+    InnoDB are not indexed, so they are matched as substrings.
+    """
+
+    @staticmethod
+    def split_terms(terms):
+        """Split terms into the indexed ones and the short ones"""
+        indexed = [term for term in terms if len(term) >= settings.OFFER_SEARCH_MIN_TOKEN_SIZE]
+        return indexed, [term for term in terms if term not in indexed]
+
+    @staticmethod
+    def boolean_query(terms):
+        """Return a boolean mode query requiring every term, as a word prefix"""
+        return ' '.join('+{term}*'.format(term=term) for term in terms)
+
+    def filter(self, queryset, terms):
+        indexed, short = self.split_terms(terms)
+        if indexed:
+            matches = OfferSearch.objects.annotate(
+                match=SearchMatch('title', 'body', query=self.boolean_query(indexed))
+            ).filter(match__gt=0).values('offer_id')
+            queryset = queryset.filter(id__in=matches)
+
+        return super(MySQLSearchBackend, self).filter(queryset, short) if short else queryset
+
+    def score(self, terms):
+        indexed, short = self.split_terms(terms)
+        if not indexed:
+            return super(MySQLSearchBackend, self).score(short)
+
+        query = self.boolean_query(indexed)
+        return SearchMatch('search__title', query=query) * self.title_weight + \
+            SearchMatch('search__title', 'search__body', query=query)
+
+
+def get_search_backend(using='default'):
+    """Return the search backend of a database"""
+    if connections[using].vendor == 'mysql':
+        return MySQLSearchBackend()
+    return SimpleSearchBackend()
+
+
+def search_offers(queryset, value, rank=False):
+    """
+    Filter offers containing every word of a search
+    :param queryset: offers queryset
+    :param value: search text
+    :param rank: annotate the relevance of each offer as `search_score`
+    :return: filtered queryset
+    """
+    terms = get_search_terms(value)
+    backend = get_search_backend(queryset.db)
+
+    if terms:
+        queryset = backend.filter(queryset, terms)
+
+    if rank:
+        score = backend.score(terms) if terms else Value(0, output_field=IntegerField())
+        queryset = queryset.annotate(search_score=score)
+
+    return queryset
+
+
+def get_offer_ordering(sort, search=None):
+    """
+    Return the order_by arguments of an offers sort. Sorting by relevance needs a search, it is ignored otherwise,
+    falling back to the default sort by creation when nothing else is left.
+    :param sort: SortChoices value or list of values
+    :param search: search text of the `search` filter
+    """
+    if not isinstance(sort, list):
+        sort = [sort]
+
+    ordering = []
+    for item in sort:
+        if item == Offer.SortChoices.relevance:
+            if search is not None:
+                ordering.append('-search_score')
+        else:
+            ordering.append(item)
+    return ordering or [Offer.SortChoices.created_on]
@@ -0,0 +1,709 @@
+"""Tests of the offers app"""
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from graphene_django.fields import DjangoConnectionField
+from graphql_relay.connection.arrayconnection import offset_to_cursor
+
+from accounts.exceptions import PermissionDenied
+from accounts.models import User
+from api.root_schema import ADMIN_SCHEMA, SCHEMA
+from api.utils.exceptions import InvalidCursor
+from api.utils.pagination import KeysetFilterConnectionField
+from offers.category_tree import get_category_tree
+from offers.exceptions import InvalidPriceBuckets
+from offers.forms import AdminControlOfferForm
+from offers.lookups import OfferLookupCache
+from offers.models import Category, Image, Material, Offer, OffersMaterial
+from offers.permalinks import regenerate_permalinks
+from offers.schema import OfferType
+from offers.search import SimpleSearchBackend, get_offer_ordering, get_search_backend, search_offers
+
+
+def create_catalog(offers_count):
+    """
+    Create two parent categories with two subcategories each, and offers with two images and two materials
+    :param offers_count: number of offers
+    :return: list of offers
+    """
+    materials = [Material.objects.create(title_es='Material {index}'.format(index=index),
+                                         title_en='Material {index}'.format(index=index)) for index in range(3)]
+    subcategories = []
+    for parent_index in range(2):
+        parent = Category.objects.create(title_es='Padre {index}'.format(index=parent_index),
+                                         title_en='Parent {index}'.format(index=parent_index), order=parent_index)
+        for index in range(2):
+            subcategories.append(Category.objects.create(
+                title_es='Sub {parent} {index}'.format(parent=parent_index, index=index),
+                title_en='Sub {parent} {index}'.format(parent=parent_index, index=index),
+                order=index, parent_category=parent))
+
+    offers = []
+    for index in range(offers_count):
+        offer = Offer.objects.create(title_es='Oferta {index}'.format(index=index),
+                                     title_en='Offer {index}'.format(index=index), price=index,
+                                     subcategory=subcategories[index % len(subcategories)])
+        for suffix in ('a', 'b'):
+            Image.objects.create(offer=offer, url='url', public_id='{index}{suffix}'.format(index=index, suffix=suffix))
+        for material_index in (index, index + 1):
+            OffersMaterial.objects.create(offer=offer, material=materials[material_index % len(materials)])
+        offers.append(offer)
+    return offers
+
+
+def get_request(user=None):
+    """Return a request to use as the context of the executed operations"""
+    request = RequestFactory().post('/graphql/')
+    request.user = user or AnonymousUser()
+    return request
+
+
+class OfferLoadersTest(TestCase):
+    """The relations of a page of offers are loaded with one query per relation, whatever the page size"""
+    query = '''query ($first: Int) {
+        offers(first: $first) {
+            edges { node {
+                id images { url } materials { id title { es } }
+                subcategory { id parentCategory { id } materials { id } }
+            } }
+        }
+    }'''
+
+    @classmethod
+    def setUpTestData(cls):
+        create_catalog(30)
+
+    def execute(self, first):
+        """Execute the offers query and check the size of the page"""
+        result = SCHEMA.execute(self.query, context_value=get_request(), variables={'first': first})
+        self.assertIsNone(result.errors)
+        self.assertEqual(len(result.data['offers']['edges']), first)
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        # the categories come from the category tree, built once by each worker
+        get_category_tree()
+
+        # the offers, their images, their materials and the materials of their subcategories
+
+        for first in (1, 10, 30):
+            with self.subTest(first=first), self.assertNumQueries(4):
+                self.execute(first)
+
+
+class CategoryOffersTest(TestCase):
+    """The offers of parent categories and of subcategories follow the requested sort"""
+    query = '''query ($id: Int) {
+        category(id: $id) { offers(sort: [PRICE]) { edges { node { price } } } }
+    }'''
+
+    @classmethod
+    def setUpTestData(cls):
+        # the prices decrease in the order the offers are created
+        for offer in create_catalog(8):
+            Offer.objects.filter(pk=offer.pk).update(price=100 - offer.price)
+
+    def test_sort(self):
+        for schema in (SCHEMA, ADMIN_SCHEMA):
+            for category in Category.objects.all():
+                with self.subTest(schema=schema, category=category.pk):
+                    result = schema.execute(self.query, context_value=get_request(), variables={'id': category.pk})
+                    self.assertIsNone(result.errors)
+
+                    prices = [edge['node']['price'] for edge in result.data['category']['offers']['edges']]
+                    self.assertTrue(prices)
+                    self.assertEqual(prices, sorted(prices))
+
+
+class SearchTest(TestCase):
+    """The portable search backend matches every word of a search, ignoring case and accents"""
+    query = '''query ($sort: [SortChoices], $search: String) {
+        offers(sort: $sort, search: $search) { edges { node { title { es } } } }
+    }'''
+
+    @classmethod
+    def setUpTestData(cls):
+        create_catalog(2)
+        subcategory = Category.objects.filter(parent_category__isnull=False).first()
+        Offer.objects.create(title_es='Canción española', title_en='Spanish song', price=1, subcategory=subcategory)
+        Offer.objects.create(title_es='Guitarra eléctrica', title_en='Electric guitar', price=2,
+                             description_es='Ideal para CANCIONES', subcategory=subcategory)
+
+    @staticmethod
+    def search(value, rank=False):
+        """Return the spanish titles of the offers found by a search"""
+        queryset = search_offers(Offer.objects.order_by('id'), value, rank=rank)
+        if rank:
+            queryset = queryset.order_by('-search_score', 'id')
+        return [offer.title_es for offer in queryset]
+
+    def test_backend(self):
+        self.assertIs(type(get_search_backend()), SimpleSearchBackend)
+
+    def test_case_and_accents(self):
+        for value in ('canción', 'CANCION', 'Cancion'):
+            with self.subTest(value=value):
+                self.assertEqual(self.search(value), ['Canción española', 'Guitarra eléctrica'])
+        self.assertEqual(self.search('ESPAÑOLA'), ['Canción española'])
+        self.assertEqual(self.search('electrica'), ['Guitarra eléctrica'])
+
+    def test_every_word(self):
+        self.assertEqual(self.search('cancion guitarra'), ['Guitarra eléctrica'])
+        self.assertEqual(self.search('guitar SONG'), [])
+        self.assertEqual(self.search('spanish, song!'), ['Canción española'])
+
+    def test_relevance(self):
+        # matches in titles weigh more than matches in descriptions
+        self.assertEqual(self.search('canción', rank=True), ['Canción española', 'Guitarra eléctrica'])
+
+    def test_ordering(self):
+        self.assertEqual(get_offer_ordering(Offer.SortChoices.relevance), [Offer.SortChoices.created_on])
+        self.assertEqual(get_offer_ordering([Offer.SortChoices.relevance]), [Offer.SortChoices.created_on])
+        self.assertEqual(get_offer_ordering([Offer.SortChoices.relevance, Offer.SortChoices.price]),
+                         [Offer.SortChoices.price])
+        self.assertEqual(get_offer_ordering(Offer.SortChoices.relevance, 'song'), ['-search_score'])
+
+    def test_relevance_without_search(self):
+        def get_titles(variables):
+            result = SCHEMA.execute(self.query, context_value=get_request(), variables=variables)
+            self.assertIsNone(result.errors)
+            return [edge['node']['title']['es'] for edge in result.data['offers']['edges']]
+
+        titles = get_titles({'sort': ['CREATED_ON']})
+        self.assertEqual(len(titles), 4)
+        self.assertEqual(get_titles({'sort': ['RELEVANCE']}), titles)
+        self.assertEqual(get_titles({'sort': ['RELEVANCE'], 'search': 'cancion'}),
+                         ['Canción española', 'Guitarra eléctrica'])
+
+
+class KeysetPaginationTest(TestCase):
+    """
+    Keyset pages follow the sort with the id as tiebreak, NULLs first, forwards and backwards,
+    and reject the cursors of other sorts or pagination modes
+    """
+    query = '''query ($sort: [SortChoices], $first: Int, $after: String, $last: Int, $before: String) {
+        offers(sort: $sort, keyset: true, first: $first, after: $after, last: $last, before: $before) {
+            edges { cursor node { title { en } } }
+            pageInfo { startCursor endCursor hasNextPage hasPreviousPage }
+        }
+    }'''
+    # ascending prices with NULLs first and ties broken by id
+    by_price = ['Offer 0', 'Offer 2', 'Offer 3', 'Offer 1', 'Offer 4', 'Offer 5']
+
+    @classmethod
+    def setUpTestData(cls):
+        for offer, price in zip(create_catalog(6), (None, 2, None, 1, 2, 2)):
+            Offer.objects.filter(pk=offer.pk).update(price=price)
+
+    def get_page(self, **variables):
+        """Return the titles and the page info of a page of offers sorted by price"""
+        variables.setdefault('sort', ['PRICE'])
+        result = SCHEMA.execute(self.query, context_value=get_request(), variables=variables)
+        self.assertIsNone(result.errors)
+        offers = result.data['offers']
+        return [edge['node']['title']['en'] for edge in offers['edges']], offers['pageInfo']
+
+    def assertPages(self, pages, expected):  # pylint: disable=C0103
+        """Check the titles and the next and previous page flags of pages"""
+        self.assertEqual([(titles, info['hasNextPage'], info['hasPreviousPage']) for titles, info in pages],
+                         expected)
+
+    def test_forwards(self):
+        pages = [self.get_page(first=2)]
+        while pages[-1][1]['hasNextPage']:
+            pages.append(self.get_page(first=2, after=pages[-1][1]['endCursor']))
+
+        self.assertPages(pages, [
+            (['Offer 0', 'Offer 2'], True, False),
+            (['Offer 3', 'Offer 1'], True, True),
+            (['Offer 4', 'Offer 5'], False, True),
+        ])
+
+    def test_backwards(self):
+        pages = [self.get_page(last=2)]
+        while pages[-1][1]['hasPreviousPage']:
+            pages.append(self.get_page(last=2, before=pages[-1][1]['startCursor']))
+
+        self.assertPages(pages, [
+            (['Offer 4', 'Offer 5'], False, True),
+            (['Offer 3', 'Offer 1'], True, True),
+            (['Offer 0', 'Offer 2'], True, False),
+        ])
+
+    def test_cursors_of_every_row(self):
+        titles, info = self.get_page(first=6)
+        self.assertEqual(titles, self.by_price)
+        self.assertFalse(info['hasNextPage'])
+
+        result = SCHEMA.execute(self.query, context_value=get_request(), variables={'sort': ['PRICE'], 'first': 6})
+        cursors = [edge['cursor'] for edge in result.data['offers']['edges']]
+        for index, cursor in enumerate(cursors):
+            with self.subTest(index=index):
+                self.assertEqual(self.get_page(first=6, after=cursor)[0], self.by_price[index + 1:])
+                self.assertEqual(self.get_page(last=6, before=cursor)[0], self.by_price[:index])
+
+    def test_descending_nulls(self):
+        """NULLs are placed after every value of a descending key"""
+        queryset = Offer.objects.order_by('-price')
+        titles = []
+        after = None
+        while True:
+            args = {'first': 2, 'after': after} if after else {'first': 2}
+            result = KeysetFilterConnectionField.resolve_keyset_connection(OfferType._meta.connection, args, queryset)
+            titles.append([edge.node.title_en for edge in result.edges])
+            if not result.page_info.has_next_page:
+                break
+            after = result.page_info.end_cursor
+
+        self.assertEqual(titles, [['Offer 1', 'Offer 4'], ['Offer 5', 'Offer 3'], ['Offer 0', 'Offer 2']])
+
+    def test_invalid_cursor(self):
+        created_on_cursor = SCHEMA.execute(self.query, context_value=get_request(),
+                                           variables={'sort': ['CREATED_ON'], 'first': 1})
+        offset_cursor = SCHEMA.execute(self.query.replace('keyset: true', 'keyset: false'),
+                                       context_value=get_request(), variables={'sort': ['PRICE'], 'first': 1})
+        cursors = {
+            'malformed': 'not a cursor',
+            'truncated': created_on_cursor.data['offers']['pageInfo']['endCursor'][:-4],
+            'other sort': created_on_cursor.data['offers']['pageInfo']['endCursor'],
+            'offset': offset_cursor.data['offers']['pageInfo']['endCursor'],
+        }
+        for name, cursor in cursors.items():
+            for variables in ({'first': 2, 'after': cursor}, {'last': 2, 'before': cursor}):
+                with self.subTest(cursor=name, variables=variables):
+                    variables['sort'] = ['PRICE']
+                    result = SCHEMA.execute(self.query, context_value=get_request(), variables=variables)
+                    self.assertEqual(len(result.errors), 1)
+                    self.assertIsInstance(result.errors[0].original_error, InvalidCursor)
+
+
+class OffsetPaginationTest(TestCase):
+    """Offset pages are the pages of DjangoConnectionField, without counting the rows unless needed"""
+    query = '''query ($first: Int, $after: String) {
+        offers(sort: [PRICE], first: $first, after: $after) {
+            %s edges { node { id } } pageInfo { hasNextPage hasPreviousPage }
+        }
+    }'''
+
+    @classmethod
+    def setUpTestData(cls):
+        create_catalog(7)
+
+    @staticmethod
+    def get_page(connection):
+        """Return the ids, the cursors and the page info of a connection"""
+        page_info = connection.page_info
+        return ([(edge.node.pk, edge.cursor) for edge in connection.edges], page_info.start_cursor,
+                page_info.end_cursor, page_info.has_next_page, page_info.has_previous_page)
+
+    def test_pages(self):
+        queryset = Offer.objects.order_by('price')
+        connection = OfferType._meta.connection
+        # DjangoConnectionField fails on empty ranges, compared separately
+        ranges = [(after, before) for after in (None, 0, 2, 6) for before in (None, 0, 2, 6)
+                  if after is None or before is None or after < before]
+        for max_limit in (None, 4):
+            for first in (None, 1, 3, 10):
+                for last in (None, 1, 3, 10):
+                    for after, before in ranges:
+                        if max_limit is not None and first is not None and first > max_limit:
+                            continue
+                        args = {name: value for name, value in (('first', first), ('last', last)) if value is not None}
+                        if after is not None:
+                            args['after'] = offset_to_cursor(after)
+                        if before is not None:
+                            args['before'] = offset_to_cursor(before)
+
+                        with self.subTest(first=first, last=last, after=after, before=before, max_limit=max_limit):
+                            self.assertEqual(
+                                self.get_page(KeysetFilterConnectionField.resolve_offset_connection(
+                                    connection, dict(args), queryset, max_limit)),
+                                self.get_page(DjangoConnectionField.resolve_connection(
+                                    connection, dict(args), queryset, max_limit)))
+
+    def test_out_of_range(self):
+        """Empty ranges are empty pages, and there is no next page after the last row"""
+        queryset = Offer.objects.order_by('price')
+        connection = OfferType._meta.connection
+        ids = list(queryset.values_list('id', flat=True))
+        for args, offsets, has_next_page, has_previous_page in (
+                ({'first': 3, 'after': offset_to_cursor(2), 'before': offset_to_cursor(2)}, [], False, False),
+                ({'last': 3, 'after': offset_to_cursor(4), 'before': offset_to_cursor(1)}, [], False, False),
+                ({'first': 3, 'after': offset_to_cursor(6)}, [], False, False),
+                ({'first': 3, 'after': offset_to_cursor(4), 'before': offset_to_cursor(9)}, [5, 6], False, False),
+                ({'last': 3, 'before': offset_to_cursor(9)}, [4, 5, 6], False, True)):
+            with self.subTest(args=args):
+                page = self.get_page(KeysetFilterConnectionField.resolve_offset_connection(connection, args, queryset))
+                self.assertEqual(([offer_id for offer_id, _ in page[0]], page[3], page[4]),
+                                 ([ids[offset] for offset in offsets], has_next_page, has_previous_page))
+
+    def test_offset(self):
+        queryset = Offer.objects.order_by('price')
+        connection = OfferType._meta.connection
+        for args in ({'offset': 2, 'first': 2}, {'offset': 2, 'after': offset_to_cursor(1), 'first': 3},
+                     {'offset': 3, 'last': 2}):
+            with self.subTest(args=args):
+                self.assertEqual(
+                    self.get_page(KeysetFilterConnectionField.resolve_offset_connection(
+                        connection, dict(args), queryset)),
+                    self.get_page(DjangoConnectionField.resolve_connection(connection, dict(args), queryset)))
+
+    def test_count_on_demand(self):
+        def get_queries(total_count, **variables):
+            with CaptureQueriesContext(connection) as context:
+                result = SCHEMA.execute(self.query % ('totalCount' if total_count else ''),
+                                        context_value=get_request(), variables=variables)
+            self.assertIsNone(result.errors)
+            return result.data['offers'], [query['sql'] for query in context.captured_queries]
+
+        for variables in ({'first': 3}, {'first': 3, 'after': offset_to_cursor(2)}, {'first': 10}):
+            with self.subTest(variables=variables):
+                cache.clear()
+                offers, queries = get_queries(False, **variables)
+                self.assertFalse([sql for sql in queries if 'COUNT(' in sql.upper()])
+                self.assertNotIn('totalCount', offers)
+
+                cache.clear()
+                offers, queries = get_queries(True, **variables)
+                self.assertEqual(len([sql for sql in queries if 'COUNT(' in sql.upper()]), 1)
+                self.assertEqual(offers['totalCount'], 7)
+
+
+class PermalinksTest(TestCase):
+    """The set-based regeneration writes the slugs and permalinks the per-row generation would"""
+
+    @classmethod
+    def setUpTestData(cls):
+        create_catalog(8)
+
+    def assertRegenerated(self, category):  # pylint: disable=C0103
+        """Regenerate the permalinks of a category and compare every slug and permalink with the per-row ones"""
+        regenerate_permalinks(category.id)
+
+        for subcategory in Category.objects.filter(parent_category__isnull=False):
+            expected = Category.objects.get(pk=subcategory.pk)
+            expected.generate_slug()
+            self.assertEqual((subcategory.slug_es, subcategory.slug_en), (expected.slug_es, expected.slug_en))
+
+        offers = Offer.objects.select_related('subcategory').order_by('id')
+        self.assertEqual(len(offers), 8)
+        for offer in offers:
+            expected = Offer.objects.get(pk=offer.pk)
+            expected.generate_slug_and_permalink()
+            self.assertEqual([getattr(offer, name) for name in Offer.SLUG_FIELDS],
+                             [getattr(expected, name) for name in Offer.SLUG_FIELDS])
+
+    def test_parent_rename(self):
+        parent = Category.objects.get(title_en='Parent 0')
+        parent.title_es = 'Padre renombrado'
+        parent.title_en = 'Renamed parent'
+        parent.save()
+        self.assertRegenerated(parent)
+
+        permalinks = Offer.objects.filter(subcategory__parent_category=parent).values_list('permalink_en', flat=True)
+        self.assertTrue(permalinks)
+        for permalink in permalinks:
+            self.assertTrue(permalink.startswith('/renamed-parent/'))
+
+    def test_subcategory_rename_and_move(self):
+        subcategory = Category.objects.get(title_en='Sub 0 1')
+        subcategory.title_es = 'Sub renombrada'
+        subcategory.title_en = 'Renamed sub'
+        subcategory.parent_category = Category.objects.get(title_en='Parent 1')
+        subcategory.save()
+        self.assertRegenerated(subcategory)
+
+        for permalink in Offer.objects.filter(subcategory=subcategory).values_list('permalink_en', flat=True):
+            self.assertTrue(permalink.startswith('/parent-1/renamed-sub/'))
+
+
+class PriceFacetsTest(TestCase):
+    """Price facets give the range and an histogram of equal buckets of each currency, with one query"""
+    query = '''query ($buckets: Int, $parentCategory: String, $priceGte: Decimal) {
+        priceFacets(buckets: $buckets, parentCategory: $parentCategory, priceGte: $priceGte) {
+            withoutPrice currencies { currency min max count buckets { min max count } }
+        }
+    }'''
+
+    @classmethod
+    def setUpTestData(cls):
+        create_catalog(0)
+        cls.parents = list(Category.objects.filter(parent_category__isnull=True).order_by('order'))
+        subcategories = [parent.category_set.first() for parent in cls.parents]
+
+        offers = [(price, Offer.CurrencyChoices.cuc, subcategories[0]) for price in (0, 1, 2, 4, 8)]
+        offers += [(10, Offer.CurrencyChoices.usd, subcategories[1]), (10, Offer.CurrencyChoices.usd, subcategories[1])]
+        offers += [(None, None, subcategories[0]), (None, None, subcategories[1])]
+        for index, (price, currency, subcategory) in enumerate(offers):
+            Offer.objects.create(title_es='Oferta {index}'.format(index=index),
+                                 title_en='Offer {index}'.format(index=index),
+                                 price=price, currency=currency, subcategory=subcategory)
+        Offer.objects.create(title_es='Retirada', title_en='Withdrawn', price=100, currency=Offer.CurrencyChoices.cuc,
+                             subcategory=subcategories[0], on_sale=False)
+
+    def setUp(self):
+        cache.clear()
+
+    def get_facets(self, **variables):
+        """Return the price facets of the offers on sale"""
+        result = SCHEMA.execute(self.query, context_value=get_request(), variables=variables)
+        self.assertIsNone(result.errors)
+        return result.data['priceFacets']
+
+    def test_currencies(self):
+        with self.assertNumQueries(1):
+            facets = self.get_facets(buckets=4)
+
+        self.assertEqual(facets, {'withoutPrice': 2, 'currencies': [
+            {'currency': 'CUC', 'min': 0, 'max': 8, 'count': 5, 'buckets': [
+                {'min': 0, 'max': 2, 'count': 2},
+                {'min': 2, 'max': 4, 'count': 1},
+                {'min': 4, 'max': 6, 'count': 1},
+                {'min': 6, 'max': 8, 'count': 1},
+            ]},
+            {'currency': 'USD', 'min': 10, 'max': 10, 'count': 2, 'buckets': [
+                {'min': 10, 'max': 10, 'count': 2},
+                {'min': 10, 'max': 10, 'count': 0},
+                {'min': 10, 'max': 10, 'count': 0},
+                {'min': 10, 'max': 10, 'count': 0},
+            ]},
+        ]})
+
+    def test_filters(self):
+        # the price filters are ignored, the others restrict the offers
+        self.assertEqual(self.get_facets(buckets=1, priceGte=5), self.get_facets(buckets=1))
+        self.assertEqual(self.get_facets(buckets=1, parentCategory=str(self.parents[1].pk)), {
+            'withoutPrice': 1,
+            'currencies': [{'currency': 'USD', 'min': 10, 'max': 10, 'count': 2,
+                            'buckets': [{'min': 10, 'max': 10, 'count': 2}]}],
+        })
+
+    def test_cached(self):
+        self.get_facets(buckets=4)
+        with self.assertNumQueries(0):
+            self.get_facets(buckets=4)
+        with self.assertNumQueries(1):
+            self.get_facets(buckets=2)
+
+    def test_invalid_buckets(self):
+        for buckets in (0, settings.OFFER_PRICE_FACETS_MAX_BUCKETS + 1):
+            with self.subTest(buckets=buckets):
+                result = SCHEMA.execute(self.query, context_value=get_request(), variables={'buckets': buckets})
+                self.assertIsInstance(result.errors[0].original_error, InvalidPriceBuckets)
+
+
+class OfferMutationsTest(TestCase):
+    """Admin offer mutations write each offer row once, and creates add one narrow write of the slugs"""
+    create_mutation = '''mutation ($input: AdminCreateOfferMutationInput!) {
+        createOffer(input: $input) { offer { id } errors { field messages } }
+    }'''
+    update_mutation = '''mutation ($input: AdminUpdateOfferMutationInput!) {
+        updateOffer(input: $input) { offer { id } errors { field messages } }
+    }'''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.offer = create_catalog(1)[0]
+        cls.user = User.objects.create(email='admin@example.com', fullname='Admin', is_staff=True)
+
+    def execute(self, mutation, queries, **input_fields):
+        """
+        Execute an offer mutation and check its number of queries
+        :return: list with the SQL of the writes of offer rows
+        """
+        with CaptureQueriesContext(connection) as context, self.assertNumQueries(queries):
+            result = ADMIN_SCHEMA.execute(mutation, context_value=get_request(self.user),
+                                          variables={'input': input_fields})
+
+        self.assertIsNone(result.errors)
+        self.assertFalse(list(result.data.values())[0]['errors'])
+        return [query['sql'] for query in context.captured_queries
+                if query['sql'].startswith(('INSERT INTO "offers_offer" ', 'UPDATE "offers_offer" '))]
+
+    def test_create(self):
+        writes = self.execute(self.create_mutation, 9, title={'es': 'Oferta', 'en': 'Offer'}, price=10,
+                              subcategory=self.offer.subcategory_id)
+
+        self.assertEqual(len(writes), 2)
+        self.assertTrue(writes[0].startswith('INSERT'))
+        self.assertNotIn('"title_es"', writes[1])
+        for field in Offer.SLUG_FIELDS:
+            self.assertIn('"{field}"'.format(field=field), writes[1])
+
+    def test_update(self):
+        images = [{'url': image.url, 'publicId': image.public_id} for image in self.offer.image_set.all()]
+        materials = [material.material_id for material in self.offer.offersmaterial_set.all()]
+
+        writes = self.execute(self.update_mutation, 10, id=self.offer.pk, title={'es': 'Oferta', 'en': 'Offer'},
+                              price=20, images=images, materials=materials)
+
+        self.assertEqual(len(writes), 1)
+        self.assertTrue(writes[0].startswith('UPDATE'))
+
+
+class OfferBulkMutationsTest(TestCase):
+    """Bulk offer mutations run the operation of their form class once for every id"""
+    mutation = '''mutation ($ids: [ID]!) {
+        %s(input: {ids: $ids}) { successIds errors { field messages } }
+    }'''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.offers = create_catalog(3)
+        cls.user = User.objects.create(email='admin@example.com', fullname='Admin', is_staff=True)
+
+    def execute(self, name, ids):
+        """Execute a bulk mutation and return its payload"""
+        result = ADMIN_SCHEMA.execute(self.mutation % name, context_value=get_request(self.user),
+                                      variables={'ids': ids})
+        self.assertIsNone(result.errors)
+        return result.data[name]
+
+    def test_bulk_operation(self):
+        ids = [offer.pk for offer in self.offers] + [0]
+        with CaptureQueriesContext(connection) as context:
+            payload = self.execute('deactivateOffer', ids)
+
+        # the ids that exist are selected, then updated at once
+        statements = [query['sql'] for query in context.captured_queries if 'SAVEPOINT' not in query['sql']]
+        self.assertEqual(len(statements), 2)
+        self.assertEqual(payload['successIds'], [str(offer.pk) for offer in self.offers])
+        self.assertFalse(Offer.objects.filter(on_sale=True).exists())
+
+    def test_bulk_operation_error(self):
+        with mock.patch.object(AdminControlOfferForm, 'bulk_delete', side_effect=PermissionDenied()):
+            payload = self.execute('deleteOffer', [offer.pk for offer in self.offers])
+
+        self.assertEqual(payload['successIds'], [])
+        self.assertEqual(payload['errors'], [{'field': '__all__', 'messages': [str(PermissionDenied.message)]}])
+        self.assertEqual(Offer.objects.count(), len(self.offers))
+
+    def test_delete_categories(self):
+        parent = Category.objects.get(title_en='Parent 0')
+        subcategory = Category.objects.get(title_en='Sub 1 0')
+        Category.objects.filter(pk=subcategory.pk).update(poster_public_id='poster')
+        images = set(Image.objects.filter(offer__subcategory__in=[subcategory, *parent.category_set.all()])
+                     .values_list('public_id', flat=True))
+
+        with mock.patch.object(Image, 'remove_many') as remove_many:
+            payload = self.execute('deleteCategory', [subcategory.pk, 0, parent.pk])
+
+        self.assertEqual(payload['successIds'], [str(subcategory.pk), str(parent.pk)])
+        self.assertEqual(set(remove_many.call_args[0][0]) - {None}, images | {'poster'})
+        self.assertEqual(list(Category.objects.order_by('title_en').values_list('title_en', flat=True)),
+                         ['Parent 1', 'Sub 1 1'])
+        self.assertEqual(Offer.objects.count(), 0)
+
+
+class CategoryTreeTest(TransactionTestCase):
+    """
+    Category queries read the category tree of the worker, built with one query whatever the number of categories and
+    rebuilt once a category change is committed
+    """
+    query = '''{
+        categories { id title { en } subcategories { id title { en } parentCategory { id } } }
+    }'''
+
+    def setUp(self):
+        cache.clear()
+        create_catalog(1)
+
+    def get_categories(self):
+        """Return the categories as (title, subcategory titles) pairs"""
+        result = SCHEMA.execute(self.query, context_value=get_request())
+        self.assertIsNone(result.errors)
+        return [(category['title']['en'], [subcategory['title']['en'] for subcategory in category['subcategories']])
+                for category in result.data['categories']]
+
+    def test_query_count(self):
+        with self.assertNumQueries(1):
+            self.get_categories()
+        with self.assertNumQueries(0):
+            self.get_categories()
+
+        for index in range(2, 5):
+            parent = Category.objects.create(title_es='Padre {index}'.format(index=index),
+                                             title_en='Parent {index}'.format(index=index), order=index)
+            Category.objects.create(title_es='Sub {index}'.format(index=index),
+                                    title_en='Sub {index}'.format(index=index), order=0, parent_category=parent)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(len(self.get_categories()), 5)
+
+    def test_rebuilt_after_save_and_delete(self):
+        self.assertEqual(self.get_categories(), [('Parent 0', ['Sub 0 0', 'Sub 0 1']),
+                                                 ('Parent 1', ['Sub 1 0', 'Sub 1 1'])])
+
+        category = Category.objects.get(title_en='Sub 1 0')
+        category.title_en = 'Renamed'
+        category.save()
+        Category.objects.get(title_en='Sub 0 1').delete()
+
+        self.assertEqual(self.get_categories(), [('Parent 0', ['Sub 0 0']), ('Parent 1', ['Renamed', 'Sub 1 1'])])
+
+
+class OfferLookupTest(TransactionTestCase):
+    """Slug and permalink lookups are answered by the LRU until an offer is saved"""
+
+    def setUp(self):
+        cache.clear()
+        self.offers = create_catalog(2)
+        self.lookups = OfferLookupCache(max_size=10)
+
+    def test_lookups(self):
+        offer = self.offers[0]
+        lookups = [
+            lambda: self.lookups.get_by_slug(offer.slug_es, Offer.LanguageChoices.es),
+            lambda: self.lookups.get_by_slug(offer.slug_en, Offer.LanguageChoices.en),
+            lambda: self.lookups.get_by_permalink(offer.permalink_es, Offer.LanguageChoices.es),
+            lambda: self.lookups.get_by_permalink(offer.permalink_en),
+        ]
+        for lookup in lookups:
+            with self.assertNumQueries(1):
+                self.assertEqual(lookup().pk, offer.pk)
+            with self.assertNumQueries(0):
+                self.assertEqual(lookup().pk, offer.pk)
+
+        # slugs and permalinks only match in their language
+        with self.assertRaises(Offer.DoesNotExist):
+            self.lookups.get_by_slug(offer.slug_es, Offer.LanguageChoices.en)
+        with self.assertRaises(Offer.DoesNotExist):
+            self.lookups.get_by_permalink(offer.permalink_en, Offer.LanguageChoices.es)
+
+    def test_not_on_sale(self):
+        offer = self.offers[1]
+        offer.on_sale = False
+        offer.save()
+        with self.assertRaises(Offer.DoesNotExist):
+            self.lookups.get_by_slug(offer.slug_es, Offer.LanguageChoices.es)
+
+    def test_invalidation(self):
+        offer, other = self.offers
+        permalink = offer.permalink_es
+        self.lookups.get_by_permalink(permalink)
+        self.lookups.get_by_slug(other.slug_es, Offer.LanguageChoices.es)
+
+        offer.title_es = 'Oferta renombrada'
+        offer.save()
+        self.assertNotEqual(offer.permalink_es, permalink)
+
+        with self.assertRaises(Offer.DoesNotExist):
+            self.lookups.get_by_permalink(permalink)
+        self.assertEqual(self.lookups.get_by_permalink(offer.permalink_es).title_es, 'Oferta renombrada')
+
+        # every offer save drops the entries of the other offers too
+        with self.assertNumQueries(1):
+            self.lookups.get_by_slug(other.slug_es, Offer.LanguageChoices.es)
+
+    def test_max_size(self):
+        self.lookups = OfferLookupCache(max_size=1)
+        first, second = self.offers
+        for offer in (first, second, first):
+            with self.assertNumQueries(1):
+                self.lookups.get_by_slug(offer.slug_es, Offer.LanguageChoices.es)
+        with self.assertNumQueries(0):
+            self.lookups.get_by_slug(first.slug_es, Offer.LanguageChoices.es)